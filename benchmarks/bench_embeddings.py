@@ -0,0 +1,147 @@
+"""
+Compares embedding backends (src/embeddings.py) on the symptom corpus.
+
+Each backend runs in a fresh process so load time and memory are measured
+in isolation. Conditions are embedded like ingest_data.py does; queries are
+random 1-3 symptom subsets of a condition (a share of them with a typo),
+searched exactly by squared L2 distance like the vector index. Reports:
+- recall@1 / recall@5: the source condition is the top / a top-5 result
+- confident: share of queries whose top score passes the backend's
+  min_score (otherwise the vector tier falls through to the ML tier), and
+  precision@1 among those
+- load_s, rss_delta_mb: backend load (incl. imports) and memory it adds
+- embed_us, search_us: single-query latency (p50 / p99)
+
+Usage:
+    python benchmarks/bench_embeddings.py --backends minilm hashed-ngram --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+
+DATA_PATH = os.path.join(ROOT_DIR, 'data', 'symptoms.json')
+
+
+def add_typo(text, rng):
+    positions = [i for i, ch in enumerate(text) if ch.isalpha()]
+    if len(positions) < 4:
+        return text
+    i = rng.choice(positions)
+    if rng.random() < 0.5:
+        return text[:i] + text[i + 1:]
+    return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1:]
+
+
+def make_queries(conditions, n, typo_rate, rng):
+    queries = []
+    for _ in range(n):
+        idx = rng.randrange(len(conditions))
+        symptoms = conditions[idx]["symptoms"]
+        parts = rng.sample(symptoms, min(len(symptoms), rng.randint(1, 3)))
+        text = " ".join(parts)
+        if rng.random() < typo_rate:
+            text = add_typo(text, rng)
+        queries.append((text, idx))
+    return queries
+
+
+def percentile(sorted_values, pct):
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_backend(spec, args):
+    import numpy as np
+
+    from embeddings import backend_available, get_embedder
+    from knowledge_base import load_knowledge_base
+    from process_stats import memory_usage
+
+    if not backend_available(spec):
+        return {"backend": spec, "skipped": "dependencies not installed"}
+
+    conditions = load_knowledge_base(DATA_PATH).conditions
+    rss_before = memory_usage().get("rss_kb", 0)
+    started = time.perf_counter()
+    embedder = get_embedder(spec)
+    embedder(["warm up"])
+    load_s = time.perf_counter() - started
+    rss_after = memory_usage().get("rss_kb", 0)
+
+    documents = np.asarray(embedder([", ".join(c["symptoms"]) for c in conditions]), dtype=np.float32)
+    doc_sq_norms = np.einsum("ij,ij->i", documents, documents)
+
+    rng = random.Random(args.seed)
+    queries = make_queries(conditions, args.queries, args.typo_rate, rng)
+    hits1 = hits5 = confident = confident_hits = 0
+    embed_us, search_us = [], []
+    for text, expected in queries:
+        t0 = time.perf_counter()
+        vector = np.asarray(embedder([text])[0], dtype=np.float32)
+        t1 = time.perf_counter()
+        distances = doc_sq_norms + vector @ vector - 2.0 * (documents @ vector)
+        top = np.argsort(distances, kind="stable")[:5]
+        t2 = time.perf_counter()
+        embed_us.append((t1 - t0) * 1e6)
+        search_us.append((t2 - t1) * 1e6)
+
+        hits1 += top[0] == expected
+        hits5 += expected in top
+        if 1 - distances[top[0]] > embedder.min_score:
+            confident += 1
+            confident_hits += top[0] == expected
+
+    embed_us.sort()
+    search_us.sort()
+    n = len(queries)
+    return {
+        "backend": embedder.spec,
+        "conditions": len(conditions),
+        "queries": n,
+        "recall_at_1": round(hits1 / n, 4),
+        "recall_at_5": round(hits5 / n, 4),
+        "confident": round(confident / n, 4),
+        "precision_at_1_confident": round(confident_hits / confident, 4) if confident else None,
+        "load_s": round(load_s, 3),
+        "rss_delta_mb": round((rss_after - rss_before) / 1024, 1),
+        "dim": int(documents.shape[1]),
+        "embed_us": {"p50": round(percentile(embed_us, 50), 1), "p99": round(percentile(embed_us, 99), 1)},
+        "search_us": {"p50": round(percentile(search_us, 50), 1), "p99": round(percentile(search_us, 99), 1)}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend recall/latency/memory comparison.")
+    parser.add_argument('--backends', nargs='+', default=["minilm", "hashed-ngram"],
+                        help="Embedding specs (specs contain commas, so separate them with spaces).")
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--typo-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args)))
+        return
+
+    for spec in args.backends:
+        # One process per backend: isolates import time and memory
+        cmd = [sys.executable, os.path.abspath(__file__), '--child', spec,
+               '--queries', str(args.queries), '--typo-rate', str(args.typo_rate), '--seed', str(args.seed)]
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        lines = out.stdout.strip().splitlines()
+        if out.returncode != 0 or not lines:
+            print(json.dumps({"backend": spec, "error": out.stderr.strip().splitlines()[-1:]}))
+        else:
+            print(lines[-1])
+
+
+if __name__ == '__main__':
+    main()
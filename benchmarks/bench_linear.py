@@ -0,0 +1,141 @@
+"""
+Parity check and micro-benchmark for the compact ML inference path.
+
+Trains the standard pipeline (train_model.build_pipeline) on a knowledge
+base, exports it with train_model.export_linear_model and compares
+diagnosis.LinearPredictor against Pipeline.predict on random symptom
+queries:
+- parity: every prediction must be identical (exit code 1 otherwise); the
+  largest decision-score difference is reported too
+- latency: single-query predict() for both, as the ML tier calls it
+- serving import: loading the compact model must not import sklearn
+
+Usage:
+    python benchmarks/bench_linear.py --sizes 0,1000 --queries 2000
+(size 0 is the repository knowledge base; other sizes are generated)
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from diagnosis import LinearPredictor
+from kb_generator import write_kb
+from knowledge_base import load_knowledge_base
+from train_model import build_pipeline, build_training_set, export_linear_model
+
+EXTRA_WORDS = ["the", "and", "severe", "mild", "since", "yesterday", "very", "painful", "xyzzy"]
+
+
+def make_queries(conditions, n, rng):
+    vocab = sorted({s for c in conditions for s in c["symptoms"]})
+    queries = []
+    for _ in range(n):
+        parts = rng.sample(vocab, min(len(vocab), rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            parts.append(rng.choice(EXTRA_WORDS))
+        queries.append(" ".join(parts))
+    return queries
+
+
+def time_calls(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter_ns()
+            fn([query])
+            samples.append(time.perf_counter_ns() - started)
+    samples.sort()
+    return {
+        "mean_us": sum(samples) / len(samples) / 1000.0,
+        "p50_us": samples[len(samples) // 2] / 1000.0,
+        "p99_us": samples[int(len(samples) * 0.99)] / 1000.0
+    }
+
+
+def serving_imports_sklearn(linear_path):
+    code = (
+        "import sys; sys.path.append(%r)\n"
+        "from diagnosis import LinearPredictor\n"
+        "LinearPredictor(%r).predict(['headache fever'])\n"
+        "print('sklearn' in sys.modules)\n"
+    ) % (os.path.join(ROOT_DIR, 'src'), linear_path)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1] == "True"
+
+
+def run(size, args, workdir):
+    if size:
+        write_kb(os.path.join(workdir, str(size)), size, seed=args.seed)
+        data_path = os.path.join(workdir, str(size), 'data', 'symptoms.json')
+    else:
+        data_path = os.path.join(ROOT_DIR, 'data', 'symptoms.json')
+    conditions = load_knowledge_base(data_path, use_snapshot=False).conditions
+
+    X, y = build_training_set(conditions)
+    pipeline = build_pipeline()
+    pipeline.fit(X, y)
+    linear_path = os.path.join(workdir, f"model_{size}.linear.json")
+    if not export_linear_model(pipeline, linear_path):
+        raise SystemExit("Pipeline could not be exported")
+    predictor = LinearPredictor(linear_path)
+
+    rng = random.Random(args.seed)
+    queries = make_queries(conditions, args.queries, rng)
+    expected = [str(p) for p in pipeline.predict(queries)]
+    actual = predictor.predict(queries)
+    mismatches = sum(1 for e, a in zip(expected, actual) if e != a)
+
+    reference_scores = pipeline.decision_function(queries)
+    if reference_scores.ndim == 1:
+        reference_scores = [[-s, s] for s in reference_scores]
+    max_score_diff = max(
+        abs(r - a)
+        for query, ref_row in zip(queries, reference_scores)
+        for r, a in zip(ref_row, predictor.decision_function(query))
+    )
+
+    timing_queries = queries[:args.timing_queries]
+    return {
+        "kb_size": len(conditions),
+        "classes": len(predictor.classes),
+        "features": len(predictor.vocabulary),
+        "artifact_kb": round(os.path.getsize(linear_path) / 1024, 1),
+        "queries": len(queries),
+        "mismatches": mismatches,
+        "max_score_diff": max_score_diff,
+        "sklearn_predict": time_calls(pipeline.predict, timing_queries, args.repeat),
+        "linear_predict": time_calls(predictor.predict, timing_queries, args.repeat),
+        "serving_imports_sklearn": serving_imports_sklearn(linear_path)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact linear model parity check and micro-benchmark.")
+    parser.add_argument('--sizes', default="0,1000", help="Comma-separated KB sizes (0 = repository KB).")
+    parser.add_argument('--queries', type=int, default=2000, help="Queries for the parity check.")
+    parser.add_argument('--timing-queries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(',')):
+            result = run(size, args, workdir)
+            result["speedup"] = round(result["sklearn_predict"]["mean_us"] / result["linear_predict"]["mean_us"], 1)
+            print(json.dumps(result))
+            failed = failed or result["mismatches"] > 0 or result["serving_imports_sklearn"]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
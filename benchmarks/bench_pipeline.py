@@ -0,0 +1,263 @@
+"""
+Benchmark suite for the diagnosis pipeline.
+
+For each knowledge-base size it generates a synthetic KB (kb_generator.py)
+and times every stage separately:
+- diagnose.vector / diagnose.ml / diagnose.rule_based: SymptomAnalyzer.diagnose
+  with only that tier enabled
+- emergency.check: EmergencyDetector.check_emergency
+- remedies.get: RemedyRecommender.get_remedies_for_condition (with a profile)
+- analyze.e2e: the /analyze pipeline (parsing, canonicalization, emergency
+  screen, diagnosis, remedies, JSON body) on the same synthetic components,
+  without the web app, so the repository's data and models are never opened
+- kb.load: building the analyzer and detector from the JSON files
+
+Tiers whose dependencies are missing or fail to load (e.g. the MiniLM model
+offline; --embedding-backend hashed-ngram needs neither), or that would be too
+slow to build at a given size (see --max-embed / --max-train), are reported as
+"skipped".
+Results are written as JSON lines so runs can be diffed and compared.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 100,10000,1000000 --output results.jsonl
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from diagnosis import SymptomAnalyzer
+from emergency import EmergencyDetector
+from remedies import RemedyRecommender
+from kb_generator import write_kb
+
+PROFILES = [
+    {"age": 30, "body_type": "neutral"},
+    {"age": 8, "body_type": "heat"},
+    {"age": 70, "body_type": "cold"},
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(samples_ns):
+    samples = sorted(ns / 1000.0 for ns in samples_ns)
+    total_s = sum(samples) / 1e6
+    return {
+        "calls": len(samples),
+        "mean_us": sum(samples) / len(samples),
+        "p50_us": percentile(samples, 50),
+        "p95_us": percentile(samples, 95),
+        "p99_us": percentile(samples, 99),
+        "max_us": samples[-1],
+        "ops_per_sec": len(samples) / total_s if total_s else 0.0
+    }
+
+
+def time_calls(fn, inputs, warmup=5):
+    for item in inputs[:warmup]:
+        fn(item)
+    samples = []
+    clock = time.perf_counter_ns
+    for item in inputs:
+        start = clock()
+        fn(item)
+        samples.append(clock() - start)
+    return samples
+
+
+def sample_queries(symptoms_path, n, seed, emergency_ratio=0.1):
+    with open(symptoms_path, "r") as f:
+        data = json.load(f)
+    rng = random.Random(seed)
+    condition_symptoms = list(data["disease_symptoms"].values())
+    emergency = data.get("emergency_symptoms", [])
+
+    queries = []
+    for _ in range(n):
+        symptoms = rng.choice(condition_symptoms)
+        query = rng.sample(symptoms, min(len(symptoms), rng.randint(1, 3)))
+        if emergency and rng.random() < emergency_ratio:
+            query.append(rng.choice(emergency))
+        queries.append(query)
+    return queries
+
+
+def build_ml_tier(analyzer):
+    from train_model import build_pipeline, build_training_set
+
+    X, y = build_training_set(analyzer.conditions)
+    model = build_pipeline()
+    model.fit(X, y)
+    return model
+
+
+def build_vector_tier(analyzer, workdir, spec=None):
+    import numpy as np
+    from embeddings import get_embedder
+    from vector_index import NumpyVectorIndex
+
+    embedder = get_embedder(spec)
+    documents = [", ".join(c["symptoms"]) for c in analyzer.conditions]
+    embeddings = np.asarray(embedder(documents), dtype=np.float32)
+
+    embeddings_path = os.path.join(workdir, "condition_embeddings.npy")
+    table_path = os.path.join(workdir, "condition_index.json")
+    np.save(embeddings_path, embeddings)
+    with open(table_path, "w") as f:
+        json.dump({
+            "ids": [f"condition_{i}" for i in range(len(documents))],
+            "metadatas": [{
+                "name": c["name"],
+                "severity": c.get("severity", "Unknown"),
+                "remedies": json.dumps(c.get("remedies", []))
+            } for c in analyzer.conditions],
+            "embedding_backend": embedder.spec
+        }, f)
+    analyzer.embedding_backend = embedder.spec
+    analyzer.vector_min_score = embedder.min_score
+    return embedder, NumpyVectorIndex(embeddings_path, table_path)
+
+
+def bench_size(size, args, record):
+    workdir = tempfile.mkdtemp(prefix=f"sprout_bench_{size}_")
+    try:
+        started = time.perf_counter()
+        symptoms_path = write_kb(workdir, size, seed=args.seed)
+        record("kb.generate", size, {"seconds": time.perf_counter() - started})
+
+        started = time.perf_counter()
+        analyzer = SymptomAnalyzer(symptoms_path, embedding_cache_size=0, load_models=False)
+        detector = EmergencyDetector(symptoms_path)
+        record("kb.load", size, {"seconds": time.perf_counter() - started, "conditions": len(analyzer.conditions)})
+
+        queries = sample_queries(symptoms_path, args.queries, args.seed)
+        recommender = RemedyRecommender(symptoms_path)
+
+        # Build the optional tiers (bounded by size, they are expensive to fit)
+        tiers = {"rule_based": (None, None, None)}
+        if size <= args.max_train:
+            try:
+                tiers["ml"] = (None, None, build_ml_tier(analyzer))
+            except ImportError as e:
+                record("diagnose.ml", size, None, skipped=f"missing dependency: {e.name}")
+        else:
+            record("diagnose.ml", size, None, skipped=f"size > --max-train ({args.max_train})")
+        if size <= args.max_embed:
+            try:
+                ef, index = build_vector_tier(analyzer, workdir, args.embedding_backend)
+                tiers["vector"] = (ef, index, None)
+            except ImportError as e:
+                record("diagnose.vector", size, None, skipped=f"missing dependency: {e.name}")
+            except Exception as e:
+                # e.g. offline, so the MiniLM weights cannot be downloaded
+                record("diagnose.vector", size, None, skipped=f"embedding backend failed to load: {e}")
+        else:
+            record("diagnose.vector", size, None, skipped=f"size > --max-embed ({args.max_embed})")
+
+        for tier, (ef, index, model) in tiers.items():
+            analyzer.embedding_fn, analyzer.collection, analyzer.ml_model = ef, index, model
+            record(f"diagnose.{tier}", size, summarize(time_calls(analyzer.diagnose, queries)))
+
+        record("emergency.check", size, summarize(time_calls(detector.check_emergency, queries)))
+
+        # Personalize the remedies of realistic predictions
+        analyzer.embedding_fn = analyzer.collection = analyzer.ml_model = None
+        predictions = [(p[0], PROFILES[i % len(PROFILES)])
+                       for i, p in enumerate(analyzer.diagnose_many(queries)) if p]
+        if predictions:
+            samples = time_calls(lambda item: recommender.get_remedies_for_condition(*item), predictions)
+            record("remedies.get", size, summarize(samples))
+
+        # End to end, with every tier that was built for this size
+        for ef, index, model in tiers.values():
+            analyzer.embedding_fn = analyzer.embedding_fn or ef
+            analyzer.collection = analyzer.collection or index
+            analyzer.ml_model = analyzer.ml_model or model
+        bench_e2e(size, analyzer, detector, recommender, queries, record)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_e2e(size, analyzer, detector, recommender, queries, record):
+    """
+    The /analyze handler's pipeline on this size's components: request
+    parsing, canonicalization, emergency screen, diagnosis, remedies and
+    the JSON body. The web app itself is not imported, so nothing here
+    loads the repository's data, models or event store; HTTP routing,
+    the response cache and notifications are left out.
+    """
+    from responses import canonical_symptoms, diagnosis_response, emergency_body, parse_request
+
+    def analyze(payload):
+        user_input, profile, _ = parse_request(payload)
+        symptoms = canonical_symptoms(user_input, analyzer.canonicalizer)
+        emergencies = detector.check_emergency(symptoms)
+        if emergencies:
+            body = emergency_body(emergencies)
+        else:
+            body = diagnosis_response(analyzer.diagnose(symptoms, profile), profile, recommender)
+        return json.dumps(body)
+
+    payloads = [{"symptoms": ", ".join(q), "profile": PROFILES[i % len(PROFILES)]}
+                for i, q in enumerate(queries)]
+    record("analyze.e2e", size, summarize(time_calls(analyze, payloads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the Sprout AI pipeline.")
+    parser.add_argument("--sizes", default="100,10000", help="Comma-separated KB sizes, e.g. 100,10000,1000000")
+    parser.add_argument("--queries", type=int, default=500, help="Timed calls per stage.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-embed", type=int, default=10000, help="Largest KB to embed for the vector tier.")
+    parser.add_argument("--max-train", type=int, default=100000, help="Largest KB to train the ML tier on.")
+    parser.add_argument("--embedding-backend", default=None,
+                        help="Embedding spec for the vector tier (default: SPROUT_EMBEDDING_BACKEND or minilm), "
+                             "e.g. hashed-ngram to run without torch or network access.")
+    parser.add_argument("--output", default="-", help="JSON lines output file ('-' for stdout).")
+    args = parser.parse_args()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    run = {
+        "run_id": datetime.datetime.now().strftime("%Y%m%dT%H%M%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform()
+    }
+    out.write(json.dumps(dict(run, benchmark="meta", argv=sys.argv[1:])) + "\n")
+
+    def record(benchmark, size, stats, skipped=None):
+        entry = dict(run, benchmark=benchmark, size=size)
+        if skipped:
+            entry["status"] = "skipped"
+            entry["reason"] = skipped
+        else:
+            entry["status"] = "ok"
+            entry.update(stats)
+        out.write(json.dumps(entry) + "\n")
+        out.flush()
+
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            bench_size(size, args, record)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
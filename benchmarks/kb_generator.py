@@ -0,0 +1,166 @@
+"""
+Synthetic knowledge-base generator.
+
+Writes data/symptoms.json and data/remedies.json under an output directory,
+shaped like the real files, with any number of conditions. Symptom phrases
+are drawn from a combinatorial vocabulary with a skewed (Zipf-like)
+distribution, so common symptoms are shared by many conditions as in the
+real catalogue.
+
+Usage:
+    python benchmarks/kb_generator.py --conditions 10000 --output /tmp/kb_10k
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+
+MODIFIERS = [
+    "mild", "severe", "chronic", "sudden", "persistent", "intermittent", "sharp",
+    "dull", "burning", "throbbing", "recurring", "acute", "painful", "swollen",
+    "itchy", "red", "dry", "excessive", "loss of", "increased", "reduced",
+    "continuous", "nocturnal", "morning", "localized", "spreading", "blurred",
+    "irregular", "abnormal", "frequent"
+]
+BODY_PARTS = [
+    "head", "neck", "chest", "abdomen", "back", "joint", "knee", "ankle", "wrist",
+    "shoulder", "eye", "ear", "nose", "throat", "tongue", "skin", "scalp", "stomach",
+    "bladder", "muscle", "foot", "hand", "lip", "gum", "tooth", "hip", "elbow",
+    "jaw", "sinus", "lung", "heart", "liver", "kidney", "bowel", "finger", "toe",
+    "forehead", "spine", "groin", "armpit"
+]
+SENSATIONS = [
+    "pain", "ache", "swelling", "rash", "itching", "cramps", "stiffness", "numbness",
+    "tingling", "bleeding", "discharge", "redness", "tenderness", "weakness",
+    "spasm", "burning", "pressure", "irritation", "inflammation", "dryness"
+]
+GENERAL_SYMPTOMS = [
+    "fever", "high fever", "fatigue", "nausea", "vomiting", "dizziness", "cough",
+    "chills", "headache", "sweating", "weight loss", "loss of appetite", "insomnia",
+    "anxiety", "diarrhoea", "constipation", "runny nose", "sneezing", "sore throat",
+    "shortness of breath"
+]
+REMEDY_POOL = [
+    "Rest", "Hydration", "Ginger tea", "Honey and lemon", "Steam inhalation",
+    "Cold compress", "Ice pack", "Probiotics", "Aloe vera gel", "Cool bath",
+    "Light diet", "Stretching exercises", "Warm salt water gargle", "Turmeric milk",
+    "Avoid spicy foods", "Consult a doctor", "Peppermint tea", "Garlic",
+    "Elevate the affected area", "Breathing exercises", "Avoid strenuous activity",
+    "Essential oil massage", "Aspirin (consult doctor)", "Sauna session"
+]
+EMERGENCY_BASE = [
+    "chest pain", "difficulty breathing", "heart attack", "severe fever",
+    "unconsciousness", "severe bleeding", "sudden severe headache"
+]
+SEVERITIES = ["Mild", "Moderate", "Severe", "Unknown"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "vo", "sul", "pha", "ni", "gre", "dor", "bel", "xi", "tra", "mun"]
+
+
+def symptom_vocabulary():
+    vocab = list(GENERAL_SYMPTOMS)
+    vocab.extend(f"{part} {sensation}" for part in BODY_PARTS for sensation in SENSATIONS)
+    vocab.extend(
+        f"{modifier} {part} {sensation}"
+        for modifier in MODIFIERS for part in BODY_PARTS for sensation in SENSATIONS
+    )
+    return vocab
+
+
+def condition_name(rng, idx):
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    # The index keeps names unique at any size
+    return f"{word} syndrome {idx}"
+
+
+def generate_kb(n_conditions, seed=42, min_symptoms=3, max_symptoms=8, n_emergency=None):
+    """
+    Returns (symptoms_data, remedies_data) dicts shaped like data/symptoms.json
+    and data/remedies.json.
+    """
+    rng = random.Random(seed)
+    vocab = symptom_vocabulary()
+    # Zipf-like weights: the first phrases (general symptoms) are the most common
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(vocab))]
+    shuffled = vocab[len(GENERAL_SYMPTOMS):]
+    rng.shuffle(shuffled)
+    vocab = vocab[:len(GENERAL_SYMPTOMS)] + shuffled
+    cum_weights = list(itertools.accumulate(weights))
+
+    def sample_symptoms(k):
+        return list(dict.fromkeys(rng.choices(vocab, cum_weights=cum_weights, k=k)))
+
+    disease_symptoms = {}
+    disease_remedies = {}
+    for idx in range(n_conditions):
+        name = condition_name(rng, idx)
+        k = rng.randint(min_symptoms, max_symptoms)
+        symptoms = sample_symptoms(k)
+        disease_symptoms[name] = symptoms
+        disease_remedies[name] = rng.sample(REMEDY_POOL, rng.randint(2, 5))
+
+    # A few conditions with explicit severity, like "additional_conditions"
+    additional = []
+    for idx in range(max(1, n_conditions // 50)):
+        additional.append({
+            "name": f"Acute {condition_name(rng, n_conditions + idx).title()}",
+            "symptoms": sample_symptoms(rng.randint(min_symptoms, max_symptoms)),
+            "remedies": rng.sample(REMEDY_POOL, rng.randint(2, 5)),
+            "severity": rng.choice(SEVERITIES)
+        })
+
+    # Emergency phrase list grows with the catalogue (synonyms/translations)
+    if n_emergency is None:
+        n_emergency = max(len(EMERGENCY_BASE), n_conditions // 100)
+    emergency = list(EMERGENCY_BASE)
+    while len(emergency) < n_emergency:
+        emergency.append(f"{rng.choice(['severe', 'sudden', 'acute', 'extreme'])} {rng.choice(vocab)} {len(emergency)}")
+
+    symptom_map = {}
+    for name, symptoms in disease_symptoms.items():
+        for symptom in symptoms:
+            symptom_map.setdefault(symptom, name)
+
+    symptoms_data = {
+        "symptom_map": symptom_map,
+        "disease_symptoms": disease_symptoms,
+        "emergency_symptoms": emergency,
+        "total_diseases": len(disease_symptoms)
+    }
+    remedies_data = {
+        "disease_remedies": disease_remedies,
+        "additional_conditions": additional
+    }
+    return symptoms_data, remedies_data
+
+
+def write_kb(output_dir, n_conditions, seed=42):
+    """
+    Writes <output_dir>/data/{symptoms,remedies}.json (the layout SymptomAnalyzer
+    expects) and returns the symptoms.json path.
+    """
+    data_dir = os.path.join(output_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    symptoms_data, remedies_data = generate_kb(n_conditions, seed=seed)
+
+    symptoms_path = os.path.join(data_dir, "symptoms.json")
+    with open(symptoms_path, "w") as f:
+        json.dump(symptoms_data, f)
+    with open(os.path.join(data_dir, "remedies.json"), "w") as f:
+        json.dump(remedies_data, f)
+    return symptoms_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Sprout AI knowledge base.")
+    parser.add_argument("--conditions", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", required=True, help="Directory to write data/symptoms.json and data/remedies.json into.")
+    args = parser.parse_args()
+
+    path = write_kb(args.output, args.conditions, seed=args.seed)
+    print(f"Wrote {args.conditions} conditions to {path}")
+
+
+if __name__ == "__main__":
+    main()
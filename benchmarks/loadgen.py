@@ -0,0 +1,356 @@
+"""
+Load generator for POST /analyze.
+
+Drives a running server (--url) or one it starts locally (--start flask |
+serve | asgi) with an asyncio HTTP/1.1 client (keep-alive connections, no
+third-party dependency) in one of two modes:
+- closed: --concurrency clients each send their next request as soon as
+  the previous one is answered (throughput at a given concurrency)
+- open: requests arrive at a fixed --rate per second whatever the server
+  does; latency is measured from the scheduled send time, so queueing in
+  front of a saturated server is included (no coordinated omission)
+
+Several comma-separated --concurrency or --rate values run as successive
+steps, one JSON line each, which shows where a worker saturates. Each step
+reports throughput and p50/p95/p99/max latency per response status
+(success / emergency / unknown; http_<code> and error for failures).
+
+Queries are 1-4 symptoms of a random condition from disease_symptoms, with
+an emergency phrase added to --emergency-rate of them. Repeated queries are
+answered from the response cache; --start ... --no-response-cache disables it.
+A started server sends no notifications (see --notify-sinks) and keeps its
+event store in a temporary directory, so synthetic emergencies never reach
+data/events.
+
+Usage:
+    python benchmarks/loadgen.py --start serve --threads 8 --mode open --rates 50,100,200,400 --duration 20
+    python benchmarks/loadgen.py --url http://127.0.0.1:8000 --mode closed --concurrency 1,8,32,64
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+sys.path.append(SRC_DIR)
+
+DATA_PATH = os.path.join(ROOT_DIR, 'data', 'symptoms.json')
+
+PROFILES = [
+    {"age": 30, "body_type": "neutral"},
+    {"age": 8, "body_type": "heat"},
+    {"age": 70, "body_type": "cold"},
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0
+    }
+
+
+def make_payloads(n, emergency_rate, seed):
+    from knowledge_base import load_knowledge_base
+
+    kb = load_knowledge_base(DATA_PATH)
+    symptom_lists = [list(c.symptoms) for c in kb.conditions if len(c.symptoms)]
+    emergencies = list(kb.emergency_symptoms)
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(n):
+        symptoms = rng.choice(symptom_lists)
+        parts = rng.sample(symptoms, min(len(symptoms), rng.randint(1, 4)))
+        if emergencies and rng.random() < emergency_rate:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(emergencies))
+        body = {"symptoms": ", ".join(parts), "profile": PROFILES[i % len(PROFILES)]}
+        payloads.append(json.dumps(body).encode("utf-8"))
+    return payloads
+
+
+class Connection:
+    """
+    One HTTP/1.1 connection, reused for as long as the server keeps it open.
+    """
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b""):
+        """
+        Returns (HTTP status, response body).
+        """
+        if self.writer is None:
+            await self._open()
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode("ascii") + body)
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        connection = headers.get("connection", "close" if version == b"HTTP/1.0" else "keep-alive")
+        if "content-length" in headers:
+            payload = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding") == "chunked":
+            payload = await self._read_chunked()
+        else:
+            # Body delimited by the server closing the connection
+            payload = await self.reader.read()
+            connection = "close"
+
+        if connection == "close":
+            self.close()
+        return int(status), payload
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+
+class Step:
+    """
+    Latencies per response status for one load step.
+    """
+    def __init__(self, warmup_until):
+        self.warmup_until = warmup_until
+        self.latencies = {}
+        self.first = None
+        self.last = None
+
+    def record(self, label, started, finished):
+        if started < self.warmup_until:
+            return
+        self.latencies.setdefault(label, []).append(finished - started)
+        self.first = started if self.first is None else min(self.first, started)
+        self.last = finished if self.last is None else max(self.last, finished)
+
+    def report(self, **extra):
+        completed = sum(len(v) for v in self.latencies.values())
+        elapsed = (self.last - self.first) if completed else 0.0
+        result = dict(extra)
+        result["completed"] = completed
+        result["throughput_rps"] = round(completed / elapsed, 1) if elapsed > 0 else 0.0
+        result["all"] = summarize([x for v in self.latencies.values() for x in v])
+        result["by_status"] = {label: summarize(v) for label, v in sorted(self.latencies.items())}
+        return result
+
+
+async def send(conn, path, payload, step, started):
+    try:
+        status, body = await conn.request("POST", path, payload)
+        if status == 200:
+            label = json.loads(body).get("status", "unknown")
+        else:
+            label = f"http_{status}"
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+        conn.close()
+        label = "error"
+    step.record(label, started, time.perf_counter())
+
+
+async def run_closed(host, port, path, payloads, concurrency, duration, warmup):
+    loop_start = time.perf_counter()
+    deadline = loop_start + warmup + duration
+    step = Step(loop_start + warmup)
+
+    async def client(offset):
+        conn = Connection(host, port)
+        i = offset
+        while time.perf_counter() < deadline:
+            await send(conn, path, payloads[i % len(payloads)], step, time.perf_counter())
+            i += concurrency
+        conn.close()
+
+    await asyncio.gather(*(client(k) for k in range(concurrency)))
+    return step.report(mode="closed", concurrency=concurrency)
+
+
+async def run_open(host, port, path, payloads, rate, duration, warmup, max_connections):
+    """
+    Arrival i is due at start + i / rate. Each arrival takes an idle
+    connection (or opens one, up to max_connections) and its latency counts
+    from the due time, including any wait for a connection.
+    """
+    idle = []
+    available = asyncio.Semaphore(max_connections)
+    tasks = set()
+    start = time.perf_counter()
+    step = Step(start + warmup)
+    total = int((warmup + duration) * rate)
+
+    async def arrival(i, due):
+        async with available:
+            conn = idle.pop() if idle else Connection(host, port)
+            await send(conn, path, payloads[i % len(payloads)], step, due)
+            idle.append(conn)
+
+    for i in range(total):
+        due = start + i / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(arrival(i, due))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    for conn in idle:
+        conn.close()
+    return step.report(mode="open", offered_rps=rate)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, args, workdir):
+    env = dict(os.environ)
+    # Synthetic emergencies must not reach real sinks or the repository's
+    # event store (data/events), where they would count as real events
+    env["SPROUT_NOTIFY_SINKS"] = args.notify_sinks
+    env["SPROUT_EVENT_DIR"] = os.path.join(workdir, "events")
+    env["SPROUT_NOTIFY_LOG"] = os.path.join(workdir, "emergency_logs.txt")
+    env["SPROUT_NOTIFY_FALLBACK_LOG"] = os.path.join(workdir, "emergency_fallback.log")
+    if args.no_response_cache:
+        env["SPROUT_RESPONSE_CACHE_SIZE"] = "0"
+    if kind == "flask":
+        cmd = [sys.executable, "-c",
+               f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    elif kind == "serve":
+        cmd = [sys.executable, os.path.join(SRC_DIR, "serve.py"), "--workers", "1",
+               "--threads", str(args.threads), "--bind", f"127.0.0.1:{port}"]
+    else:
+        cmd = [sys.executable, os.path.join(SRC_DIR, "asgi.py"), "--host", "127.0.0.1", "--port", str(port)]
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen(cmd, cwd=SRC_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(host, port, prefix, timeout, process=None):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode} (see --server-log)")
+        conn = Connection(host, port)
+        try:
+            status, _ = await conn.request("GET", prefix + "/readyz")
+            if status == 200:
+                return
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"Server at {host}:{port} not ready after {timeout}s")
+
+
+async def run(args, host, port, prefix, process=None):
+    await wait_ready(host, port, prefix, args.ready_timeout, process)
+    path = prefix + "/analyze"
+    payloads = make_payloads(args.distinct, args.emergency_rate, args.seed)
+    if args.mode == "closed":
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            result = await run_closed(host, port, path, payloads, concurrency, args.duration, args.warmup)
+            print(json.dumps(result), flush=True)
+    else:
+        for rate in (float(r) for r in args.rates.split(",")):
+            result = await run_open(host, port, path, payloads, rate, args.duration, args.warmup,
+                                    args.max_connections)
+            print(json.dumps(result), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed/open-loop load generator for /analyze.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server, e.g. http://127.0.0.1:8000")
+    target.add_argument("--start", choices=["flask", "serve", "asgi"],
+                        help="Start the app locally: Flask dev server, serve.py with one worker, or asgi.py.")
+    parser.add_argument("--threads", type=int, default=4, help="Threads of the serve.py worker (--start serve).")
+    parser.add_argument("--no-response-cache", action="store_true",
+                        help="Start the app with the /analyze response cache disabled.")
+    parser.add_argument("--server-log", help="File for the started server's output.")
+    parser.add_argument("--notify-sinks", default="",
+                        help="SPROUT_NOTIFY_SINKS of the started server (default: none). Its event store and "
+                             "notification logs are in a temporary directory either way.")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", default="1,8,32", help="Closed loop: comma-separated client counts.")
+    parser.add_argument("--rates", default="50,100,200", help="Open loop: comma-separated requests/s.")
+    parser.add_argument("--max-connections", type=int, default=512, help="Open loop: connection limit.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per step.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each step.")
+    parser.add_argument("--emergency-rate", type=float, default=0.05)
+    parser.add_argument("--distinct", type=int, default=5000, help="Distinct payloads to cycle through.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    process = workdir = None
+    if args.start:
+        host, port, prefix = "127.0.0.1", free_port(), ""
+        workdir = tempfile.mkdtemp(prefix="sprout_loadgen_")
+        process = start_server(args.start, port, args, workdir)
+    else:
+        parsed = urllib.parse.urlsplit(args.url)
+        host, port, prefix = parsed.hostname, parsed.port or 80, parsed.path.rstrip("/")
+    try:
+        asyncio.run(run(args, host, port, prefix, process))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
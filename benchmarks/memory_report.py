@@ -0,0 +1,123 @@
+"""
+tracemalloc memory report for the in-memory knowledge base.
+
+For each knowledge-base size it generates a synthetic KB (kb_generator.py)
+and, in a fresh process, measures the Python heap retained by each
+component as it is built:
+- kb: the compiled KnowledgeBase (columnar ConditionTable + shared
+  symptom vocabulary)
+- analyzer: SymptomAnalyzer rule index (no vector/ML tiers)
+- detector: EmergencyDetector (shares the knowledge base's phrases)
+- remedies: RemedyRecommender personalization/explanation tables
+- dict_records: what the same conditions cost as the former
+  {"name", "symptoms", "remedies", "severity"} dicts, for comparison
+Bytes per condition should stay flat as the catalogue grows.
+
+Usage:
+    python benchmarks/memory_report.py --sizes 1000,10000,100000 --top 5
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _retained():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def measure(data_path, top):
+    from diagnosis import SymptomAnalyzer
+    from emergency import EmergencyDetector
+    from knowledge_base import load_knowledge_base
+    from remedies import RemedyRecommender
+
+    tracemalloc.start()
+    report = {}
+    base = _retained()
+
+    kb = load_knowledge_base(data_path, use_snapshot=False)
+    report["kb"] = _retained() - base
+
+    base = _retained()
+    analyzer = SymptomAnalyzer(data_path, load_models=False)
+    report["analyzer"] = _retained() - base
+
+    base = _retained()
+    detector = EmergencyDetector(data_path)
+    report["detector"] = _retained() - base
+
+    base = _retained()
+    recommender = RemedyRecommender(data_path)
+    report["remedies"] = _retained() - base
+
+    snapshot = tracemalloc.take_snapshot()
+    sites = [
+        {"site": str(stat.traceback[0]), "kb": round(stat.size / 1024, 1), "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:top]
+    ]
+
+    base = _retained()
+    dict_records = [{
+        "name": c.name,
+        "symptoms": list(c.symptoms),
+        "remedies": list(c.remedies),
+        "severity": c.severity
+    } for c in kb.conditions]
+    report["dict_records"] = _retained() - base
+    report["peak"] = tracemalloc.get_traced_memory()[1]
+
+    n = len(kb.conditions)
+    result = {
+        "conditions": n,
+        "vocabulary": len(kb.vocabulary),
+        "total_kb": round(sum(report[k] for k in ("kb", "analyzer", "detector", "remedies")) / 1024, 1)
+    }
+    for key, size in report.items():
+        result[f"{key}_kb"] = round(size / 1024, 1)
+        result[f"{key}_bytes_per_condition"] = round(size / n, 1) if n else None
+    result["top_sites"] = sites
+    # Keep everything alive until measured
+    del analyzer, detector, recommender, dict_records
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tracemalloc memory report per knowledge-base size.")
+    parser.add_argument('--sizes', default="1000,10000,100000")
+    parser.add_argument('--top', type=int, default=5, help="Top allocation sites to list.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.top)))
+        return
+
+    from kb_generator import write_kb
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(',')):
+            write_kb(os.path.join(workdir, str(size)), size, seed=args.seed)
+            data_path = os.path.join(workdir, str(size), 'data', 'symptoms.json')
+            # Fresh process per size, so earlier sizes do not skew the heap
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', data_path,
+                                  '--top', str(args.top)], capture_output=True, text=True)
+            lines = out.stdout.strip().splitlines()
+            if out.returncode != 0 or not lines:
+                print(json.dumps({"conditions": size, "error": out.stderr.strip().splitlines()[-1:]}))
+            else:
+                print(lines[-1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Startup-time benchmark for the Flask app.
+
+Spawns fresh interpreters that import src/app.py in each startup mode and
+records how long the import takes (time until the server could bind a port)
+and how long until every diagnosis tier has finished warming up.
+
+Usage:
+    python benchmarks/startup.py --runs 5 --max-import-seconds 2.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+analyzer = app.reloader.current.analyzer
+while not analyzer.is_warm():
+    time.sleep(0.01)
+warm = time.perf_counter() - start
+print(json.dumps({"import_seconds": imported, "warm_seconds": warm, "tiers": analyzer.tier_status}))
+"""
+
+def run_once(mode):
+    env = dict(os.environ, SPROUT_STARTUP_MODE=mode)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+    # The app prints debug lines while loading; the result is the last line
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = wall
+    return result
+
+def summarize(values):
+    return {
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Sprout AI web app startup time.")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--modes', default='eager,lazy')
+    parser.add_argument('--max-import-seconds', type=float, default=None,
+                        help="Fail if the median lazy-mode import exceeds this budget.")
+    args = parser.parse_args()
+
+    report = {}
+    for mode in args.modes.split(','):
+        runs = [run_once(mode) for _ in range(args.runs)]
+        report[mode] = {
+            "import_seconds": summarize([r["import_seconds"] for r in runs]),
+            "warm_seconds": summarize([r["warm_seconds"] for r in runs]),
+            "process_seconds": summarize([r["process_seconds"] for r in runs]),
+            "tiers": runs[-1]["tiers"]
+        }
+
+    print(json.dumps(report, indent=2))
+
+    if args.max_import_seconds is not None and 'lazy' in report:
+        median = report['lazy']['import_seconds']['median']
+        if median > args.max_import_seconds:
+            print(f"REGRESSION: lazy import took {median:.3f}s (budget {args.max_import_seconds:.3f}s)", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Modules inside src/ import each other by bare name (e.g. "from matcher import ...");
+# make that work when the package is imported as "src.<module>" too.
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SRC_DIR not in sys.path:
+    sys.path.append(_SRC_DIR)
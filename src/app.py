@@ -1,9 +1,19 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
+import datetime
+import hmac
 import os
+import time
 from diagnosis import SymptomAnalyzer
 from emergency import EmergencyDetector
 from remedies import RemedyRecommender
-from notifications import NotificationManager
+from notifications import NotificationManager, sinks_from_env
+from event_store import event_store_from_env
+from process_stats import memory_usage
+from response_cache import ResponseCache
+from responses import canonical_symptoms, diagnosis_response, emergency_body, parse_request
+from reloader import Components, HotReloader
+import metrics
+from metrics import timed
 
 app = Flask(__name__)
 
@@ -12,68 +22,322 @@ print("Initializing modules...")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'symptoms.json')
 
-emergency_detector = EmergencyDetector(DATA_PATH)
-analyzer = SymptomAnalyzer(DATA_PATH)
-remedy_recommender = RemedyRecommender()
-notifier = NotificationManager()
+# "eager" loads every diagnosis tier before serving; "lazy" serves from the
+# rule-based tier right away and warms the vector/ML tiers in the background.
+STARTUP_MODE = os.environ.get("SPROUT_STARTUP_MODE", "eager").lower()
+
+def build_components():
+    """
+    Loads a complete, fully warmed set of serving components (used by reloads).
+    """
+    return (SymptomAnalyzer(DATA_PATH), EmergencyDetector(DATA_PATH), RemedyRecommender(DATA_PATH))
+
+_analyzer = SymptomAnalyzer(DATA_PATH, load_models=(STARTUP_MODE != "lazy"))
+if STARTUP_MODE == "lazy":
+    _analyzer.start_background_warmup()
+_initial = Components(_analyzer, EmergencyDetector(DATA_PATH), RemedyRecommender(DATA_PATH))
+# Structured emergency events (see event_store.py), also queried by /emergencies
+event_store = event_store_from_env()
+notifier = NotificationManager(sinks=sinks_from_env(event_store))
+
+# Data and model files that define a version of the serving components
+WATCHED_PATHS = [
+    DATA_PATH,
+    os.path.join(os.path.dirname(DATA_PATH), 'remedies.json'),
+    _initial.remedy_recommender.rules_path,
+    _analyzer.model_path,
+    _analyzer.linear_model_path,
+    os.path.splitext(_analyzer.model_path)[0] + ".meta.json",
+    _analyzer.embeddings_path,
+    _analyzer.index_table_path,
+    os.path.join(_analyzer.db_path, 'chroma.sqlite3')
+]
+
+def _on_reload(components):
+    # Responses and query embeddings of the old snapshot must not be served
+    # (the new analyzer starts with an empty embedding cache)
+    response_cache.clear()
+
+# The current analyzer, emergency detector and remedy tables. Each request
+# reads reloader.current once; reloads swap in a new snapshot atomically.
+# SPROUT_RELOAD_WATCH_INTERVAL > 0 reloads when the watched files change.
+reloader = HotReloader(
+    _initial,
+    build_components,
+    watched_paths=WATCHED_PATHS,
+    watch_interval=float(os.environ.get("SPROUT_RELOAD_WATCH_INTERVAL", "0")),
+    on_swap=_on_reload
+)
+
+# Admin endpoints (/admin/reload) are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("SPROUT_ADMIN_TOKEN")
+
+# Full /analyze responses, keyed on the symptom list, profile segment and
+# components generation. Dropped whenever the data/model files or the loaded
+# tiers change.
+response_cache = ResponseCache(
+    watched_paths=WATCHED_PATHS,
+    version_fn=lambda: (reloader.current.analyzer.kb_version,
+                        tuple(sorted(reloader.current.analyzer.tier_status.items()))),
+    maxsize=int(os.environ.get("SPROUT_RESPONSE_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("SPROUT_RESPONSE_CACHE_TTL", "300")),
+    check_interval=float(os.environ.get("SPROUT_RESPONSE_CACHE_CHECK_INTERVAL", "2"))
+)
+
+# Under serve.py the watcher is started in each worker after the fork
+if not os.environ.get("SPROUT_PREFORK"):
+    reloader.start_watching()
+
+metrics.registry.gauge("sprout_embedding_cache_hits", "Query embedding cache hits.",
+                       lambda: reloader.current.analyzer.embedding_cache.hits)
+metrics.registry.gauge("sprout_embedding_cache_misses", "Query embedding cache misses.",
+                       lambda: reloader.current.analyzer.embedding_cache.misses)
+metrics.registry.gauge("sprout_embedding_cache_size", "Entries in the query embedding cache.",
+                       lambda: len(reloader.current.analyzer.embedding_cache))
+metrics.registry.gauge("sprout_response_cache_hits", "Full /analyze response cache hits.",
+                       lambda: response_cache.stats()["hits"])
+metrics.registry.gauge("sprout_response_cache_misses", "Full /analyze response cache misses.",
+                       lambda: response_cache.stats()["misses"])
+metrics.registry.gauge("sprout_response_cache_size", "Entries in the /analyze response cache.",
+                       lambda: response_cache.stats()["size"])
+metrics.registry.gauge("sprout_response_cache_bytes", "Approximate bytes held by the /analyze response cache.",
+                       lambda: response_cache.stats()["bytes"])
+metrics.registry.gauge("sprout_components_generation", "Generation of the serving components (+1 per reload).",
+                       lambda: reloader.current.generation)
+metrics.registry.gauge("sprout_reload_duration_seconds", "Build time of the current serving components.",
+                       lambda: reloader.current.load_seconds or 0.0)
+metrics.registry.gauge("sprout_reload_failures", "Reloads rejected or failed since startup.",
+                       lambda: reloader.failures)
+metrics.register_notification_metrics(lambda: notifier.dispatcher)
 
 @app.route('/')
 def home():
     return render_template('index.html')
 
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and serving requests
+    return jsonify({'status': 'ok', 'memory': memory_usage()})
+
+def readiness():
+    # Readiness: the rule-based tier can answer; report the heavier tiers too
+    components = reloader.current
+    tiers = dict(components.analyzer.tier_status)
+    ready = tiers['rule_based'] == 'ready'
+    body = {
+        'ready': ready,
+        'warm': components.analyzer.is_warm(),
+        'startup_mode': STARTUP_MODE,
+        'tiers': tiers,
+        'version': components.version()
+    }
+    return body, (200 if ready else 503)
+
+@app.route('/readyz')
+def readyz():
+    body, status = readiness()
+    return jsonify(body), status
+
+@app.route('/cache/stats')
+def cache_stats():
+    # Per-process cache effectiveness and approximate memory use
+    return jsonify({
+        'response_cache': response_cache.stats(),
+        'embedding_cache': reloader.current.analyzer.embedding_cache.stats()
+    })
+
+def _admin_denied():
+    """
+    Error response for a request without a valid admin token, else None.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled (set SPROUT_ADMIN_TOKEN)'}), 404
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return None
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """
+    GET: reload status and the version being served.
+    POST: rebuilds the components in the background and swaps them in;
+    returns 202 at once, or waits for the result with ?wait=1.
+    Reloads only this process (under serve.py, use SPROUT_RELOAD_WATCH_INTERVAL
+    so that every worker picks up changes).
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'GET':
+        return jsonify(reloader.status())
+
+    wait = request.args.get('wait', '0').lower() in ('1', 'true', 'yes')
+    reloader.reload(wait=wait, reason="admin")
+    status = reloader.status()
+    if not wait:
+        return jsonify(status), 202
+    return jsonify(status), (500 if status['last_error'] else 200)
+
+# Upper bound on events returned by one /emergencies request
+MAX_EVENTS_PER_QUERY = 1000
+
+def _parse_time(value, default):
+    # Epoch seconds or ISO 8601 (naive times are server-local)
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+@app.route('/emergencies')
+def emergency_events():
+    """
+    Emergency events with start <= ts < end (default: the last hour),
+    oldest first. Query parameters: start, end (epoch seconds or ISO 8601),
+    limit (default 100). count covers the whole range, even past limit.
+    Requires the admin token (the events are health data).
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    try:
+        end = _parse_time(request.args.get('end'), time.time())
+        start = _parse_time(request.args.get('start'), end - 3600)
+        limit = max(0, min(int(request.args.get('limit', '100')), MAX_EVENTS_PER_QUERY))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query: {e}'}), 400
+
+    events = list(event_store.query(start, end, kind='emergency', limit=limit))
+    count = event_store.count(start, end, kind='emergency')
+    return jsonify({
+        'start': start,
+        'end': end,
+        'count': count,
+        'truncated': count > len(events),
+        'events': events
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({'error': 'Metrics are disabled (set SPROUT_METRICS=1)'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# Upper bound on items accepted by /analyze/batch in a single request
+MAX_BATCH_SIZE = 100
+
+def notify_emergency(emergencies):
+    msg = f"Emergency detected: {', '.join(emergencies)}"
+    notifier.send_notification(msg, level="critical", kind="emergency", emergencies=emergencies)
+
+def emergency_response(emergencies):
+    # Log and Notify
+    notify_emergency(emergencies)
+    return emergency_body(emergencies)
+
+def cached_response(key):
+    """
+    Returns the cached response for key, or None. Emergency side effects
+    are replayed on a hit so every high-risk request is still notified.
+    """
+    cached = response_cache.get(key)
+    if cached is not None and cached.get('status') == 'emergency':
+        notify_emergency(cached['emergencies'])
+    return cached
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
-    data = request.json
-    user_input = data.get('symptoms', '')
-    user_profile = data.get('profile', {})  # Get user profile
-    
-    if not user_input:
+    data = request.get_json(silent=True)
+    user_input, user_profile, error = parse_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    # One snapshot for the whole request, even if a reload swaps it meanwhile
+    components = reloader.current
+    # Canonical spellings from here on: cache key, emergency screen, every tier
+    symptoms = canonical_symptoms(user_input, components.canonicalizer)
+    if not symptoms:
         return jsonify({'error': 'No symptoms provided'}), 400
+    cache_key = response_cache.make_key(
+        symptoms, components.remedy_recommender.personalization_key(user_profile), components.generation)
 
-    symptoms = [s.strip() for s in user_input.split(',')]
-    
-    # 1. Check for Emergency
-    emergencies = emergency_detector.check_emergency(symptoms)
-    if emergencies:
-        # Log and Notify
-        msg = f"Emergency detected: {', '.join(emergencies)}"
-        notifier.send_notification(msg, level="critical")
-        
-        return jsonify({
-            'status': 'emergency',
-            'emergencies': emergencies,
-            'message': 'CRITICAL WARNING: High-risk symptoms detected. Seek immediate medical attention. Chat has been disabled for safety.',
-            'lockdown': True
-        })
-
-    # 2. Diagnosis
-    # Pass full profile to diagnosis for reranking
-    predictions = analyzer.diagnose(symptoms, user_profile)
-    
-    if not predictions:
-        return jsonify({
-            'status': 'unknown',
-            'message': 'Could not identify a specific condition. Please consult a doctor.'
-        })
-
-    top_prediction = predictions[0]
-    # Pass profile to remedies
-    remedies = remedy_recommender.get_remedies_for_condition(top_prediction, user_profile)
-    remedy_details = []
-    
-    for remedy in remedies:
-        # Clean remedy name for explanation lookup (remove warnings/details in brackets)
-        # e.g. "Rest (Consult Doctor)" -> "Rest"
-        clean_name = remedy.split(" (")[0]
-        explanation = remedy_recommender.explain_remedy(clean_name)
-        remedy_details.append({'name': remedy, 'explanation': explanation})
+    with timed("analyze_total"):
+        cached = cached_response(cache_key)
+        if cached is not None:
+            return jsonify(cached)
 
-    return jsonify({
-        'status': 'success',
-        'condition': top_prediction['name'],
-        'severity': top_prediction['severity'],
-        'remedies': remedy_details
-    })
+        # 1. Check for Emergency
+        with timed("emergency_check"):
+            emergencies = components.emergency_detector.check_emergency(symptoms)
+        if emergencies:
+            body = emergency_response(emergencies)
+        else:
+            # 2. Diagnosis
+            # Pass full profile to diagnosis for reranking
+            predictions = components.analyzer.diagnose(symptoms, user_profile)
+            body = diagnosis_response(predictions, user_profile, components.remedy_recommender)
+
+        response_cache.put(cache_key, body)
+        return jsonify(body)
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Bulk variant of /analyze.
+    Expects {"items": [{"symptoms": "...", "profile": {...}}, ...]} and returns
+    {"results": [...]} with one /analyze-shaped entry per item, in order.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items', []) if isinstance(data, dict) else None
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'No items provided'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE} items)'}), 400
+
+    components = reloader.current
+    results = [None] * len(items)
+    to_diagnose = []
+
+    # 1. Check for Emergency (per item)
+    for i, item in enumerate(items):
+        user_input, profile, error = parse_request(item)
+        if error:
+            results[i] = {'error': error}
+            continue
+
+        symptoms = canonical_symptoms(user_input, components.canonicalizer)
+        if not symptoms:
+            results[i] = {'error': 'No symptoms provided'}
+            continue
+        cache_key = response_cache.make_key(
+            symptoms, components.remedy_recommender.personalization_key(profile), components.generation)
+        cached = cached_response(cache_key)
+        if cached is not None:
+            results[i] = cached
+            continue
+
+        with timed("emergency_check"):
+            emergencies = components.emergency_detector.check_emergency(symptoms)
+        if emergencies:
+            results[i] = emergency_response(emergencies)
+            response_cache.put(cache_key, results[i])
+        else:
+            to_diagnose.append((i, symptoms, profile, cache_key))
+
+    # 2. Diagnosis (one batched pass through every tier)
+    if to_diagnose:
+        batch_predictions = components.analyzer.diagnose_many(
+            [symptoms for _, symptoms, _, _ in to_diagnose],
+            [profile for _, _, profile, _ in to_diagnose]
+        )
+        for (i, _, profile, cache_key), predictions in zip(to_diagnose, batch_predictions):
+            results[i] = diagnosis_response(predictions, profile, components.remedy_recommender)
+            response_cache.put(cache_key, results[i])
+
+    return jsonify({'results': results})
 
 if __name__ == '__main__':
     print("Starting Flask server...")
@@ -0,0 +1,259 @@
+"""
+Async (ASGI) entry point for the Sprout AI web app.
+
+Serves the same /analyze contract as the Flask app, but runs the diagnosis
+tiers concurrently in per-tier thread pools under a per-request deadline.
+The answer is the highest-priority tier (vector > ML > rule-based) that
+finished with a confident prediction; the remaining tiers are cancelled.
+A slow vector query therefore costs at most the deadline, after which the
+best answer already available (usually the rule-based one) is returned.
+
+Shares the loaded components and the response cache with app.py.
+
+Usage:
+    python src/asgi.py --host 0.0.0.0 --port 8000
+    uvicorn asgi:app --app-dir src
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add src to path so imports work if run from project root
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import reloader, response_cache, notify_emergency, readiness
+from metrics import record_fallback, record_tier, timed
+from process_stats import memory_usage
+from responses import canonical_symptoms, diagnosis_response, emergency_body, parse_request
+
+# Highest priority first
+TIER_PRIORITY = ("vector", "ml", "rule_based")
+
+# Time budget for the diagnosis tiers of one request
+DEADLINE_SECONDS = float(os.environ.get("SPROUT_ASYNC_DEADLINE_MS", "500")) / 1000.0
+
+# One pool per tier, so slow or abandoned vector queries cannot starve the
+# fast tiers of threads
+TIER_WORKERS = int(os.environ.get("SPROUT_ASYNC_TIER_WORKERS", "4"))
+_executors = {
+    tier: ThreadPoolExecutor(max_workers=TIER_WORKERS, thread_name_prefix=f"sprout-{tier}")
+    for tier in TIER_PRIORITY
+}
+# Enqueueing a notification can block (a full queue waits, then spills
+# critical entries to a file synchronously): never on the event loop
+_notify_executor = ThreadPoolExecutor(max_workers=TIER_WORKERS, thread_name_prefix="sprout-notify")
+
+
+def _tier_result(future):
+    """
+    Prediction list of a finished tier, or None if it failed or had no answer.
+    """
+    if future.cancelled():
+        return None
+    error = future.exception()
+    if error is not None:
+        print(f"Tier error: {error}")
+        return None
+    return future.result() or None
+
+
+def _decide(futures):
+    """
+    Walks the tiers in priority order.
+    Returns (decided, tier, predictions): decided is False while a
+    higher-priority tier is still running, since it could still win.
+    """
+    for tier in TIER_PRIORITY:
+        future = futures.get(tier)
+        if future is None:
+            continue
+        if not future.done():
+            return False, None, None
+        predictions = _tier_result(future)
+        if predictions:
+            return True, tier, predictions
+    return True, None, None
+
+
+def _best_finished(futures):
+    """
+    Deadline fallback: the highest-priority tier that has already answered.
+    """
+    for tier in TIER_PRIORITY:
+        future = futures.get(tier)
+        if future is not None and future.done():
+            predictions = _tier_result(future)
+            if predictions:
+                return tier, predictions
+    return None, None
+
+
+async def diagnose_concurrently(analyzer, symptoms, profile, deadline=DEADLINE_SECONDS):
+    """
+    Runs every loaded tier of analyzer at once and returns (predictions, complete).
+    complete is False when the deadline cut off a higher-priority tier, so
+    the answer may differ from the sequential cascade.
+    """
+    loop = asyncio.get_running_loop()
+    futures = {}
+    for tier in TIER_PRIORITY:
+        if analyzer.tier_available(tier):
+            futures[tier] = loop.run_in_executor(
+                _executors[tier], analyzer.diagnose_tier, tier, symptoms, profile)
+        else:
+            record_fallback(tier, "not_loaded")
+
+    expires_at = loop.time() + deadline
+    complete = True
+    try:
+        while True:
+            decided, tier, predictions = _decide(futures)
+            if decided:
+                break
+            remaining = expires_at - loop.time()
+            if remaining <= 0:
+                complete = False
+                for name, future in futures.items():
+                    if not future.done():
+                        record_fallback(name, "deadline")
+                tier, predictions = _best_finished(futures)
+                break
+            running = [f for f in futures.values() if not f.done()]
+            await asyncio.wait(running, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Queued work is dropped; a tier already running finishes in its
+        # thread and its result is discarded
+        for future in futures.values():
+            future.cancel()
+
+    record_tier(tier or "none")
+    return predictions or [], complete
+
+
+async def _notify_emergency(emergencies):
+    await asyncio.get_running_loop().run_in_executor(_notify_executor, notify_emergency, emergencies)
+
+
+async def analyze(data):
+    user_input, user_profile, error = parse_request(data)
+    if error:
+        return {'error': error}, 400
+
+    # One snapshot for the whole request, even if a reload swaps it meanwhile
+    components = reloader.current
+    # Canonical spellings from here on: cache key, emergency screen, every tier
+    symptoms = canonical_symptoms(user_input, components.canonicalizer)
+    if not symptoms:
+        return {'error': 'No symptoms provided'}, 400
+    cache_key = response_cache.make_key(
+        symptoms, components.remedy_recommender.personalization_key(user_profile), components.generation)
+
+    with timed("analyze_total"):
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            # Every high-risk request is notified, cached or not
+            if cached.get('status') == 'emergency':
+                await _notify_emergency(cached['emergencies'])
+            return cached, 200
+
+        with timed("emergency_check"):
+            emergencies = components.emergency_detector.check_emergency(symptoms)
+        if emergencies:
+            await _notify_emergency(emergencies)
+            body = emergency_body(emergencies)
+            response_cache.put(cache_key, body)
+            return body, 200
+
+        predictions, complete = await diagnose_concurrently(components.analyzer, symptoms, user_profile)
+        body = diagnosis_response(predictions, user_profile, components.remedy_recommender)
+        # A deadline-degraded answer must not be served to later requests
+        if complete:
+            response_cache.put(cache_key, body)
+        return body, 200
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send_json(send, body, status=200):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode('ascii'))
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for executor in _executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            # Pending notifications are still delivered
+            _notify_executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    if path == '/healthz' and method == 'GET':
+        await _send_json(send, {'status': 'ok', 'memory': memory_usage()})
+    elif path == '/readyz' and method == 'GET':
+        body, status = readiness()
+        await _send_json(send, body, status)
+    elif path == '/analyze' and method == 'POST':
+        try:
+            data = json.loads(await _read_body(receive) or b'{}')
+        except ValueError:
+            await _send_json(send, {'error': 'Invalid JSON'}, 400)
+            return
+        try:
+            body, status = await analyze(data)
+        except Exception as e:
+            # Always answer: an escaping exception would leave the client hanging
+            print(f"Error handling /analyze: {e!r}")
+            body, status = {'error': 'Internal server error'}, 500
+        await _send_json(send, body, status)
+    else:
+        await _send_json(send, {'error': 'Not found'}, 404)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Sprout AI async API with uvicorn.")
+    parser.add_argument('--host', default=os.environ.get("SPROUT_HOST", "127.0.0.1"))
+    parser.add_argument('--port', type=int, default=int(os.environ.get("SPROUT_PORT", "8000")))
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is not installed. Run: pip install uvicorn")
+        sys.exit(1)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded mapping with least-recently-used eviction.
+    Keeps hit/miss counters so callers can report cache effectiveness.
+
+    Optional extras:
+    - ttl: entries older than this many seconds are treated as misses.
+    - sizeof: callable returning the approximate size in bytes of a value;
+      the running total is reported as "bytes" in stats().
+    """
+    def __init__(self, maxsize=1024, ttl=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires_at, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = (value, expires_at, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize:
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def _discard(self, key):
+        _, _, size = self._data.pop(key)
+        self.nbytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "bytes": self.nbytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,107 +1,404 @@
+import hashlib
+import heapq
+import importlib.util
 import json
+import math
 import os
+import re
 import sys
+import threading
+from array import array
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+from cache import LRUCache
+from embeddings import LEGACY_BACKEND, backend_available, get_embedder, parse_spec
+from knowledge_base import ConditionTable, SymptomVocabulary, load_knowledge_base
+from matcher import PhraseMatcher
+from metrics import record_fallback, record_tier, timed
+from normalizer import SymptomCanonicalizer
 
 # Disable ChromaDB Telemetry
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 os.environ["CHROMA_ANONYMIZED_TELEMETRY"] = "False"
 
-# Try imports for advanced features, handle failure gracefully
-try:
-    import chromadb
-    from chromadb.utils import embedding_functions
-    from chromadb.config import Settings
-    VECTOR_DB_AVAILABLE = True
-except ImportError:
-    VECTOR_DB_AVAILABLE = False
-
-try:
-    import joblib
-    ML_MODEL_AVAILABLE = True
-except ImportError:
-    ML_MODEL_AVAILABLE = False
+# Advanced features are optional. Their imports (chromadb pulls in
+# sentence-transformers and torch) are deferred until the tier is loaded;
+# at import time we only check that they are installed.
+VECTOR_DB_AVAILABLE = importlib.util.find_spec("chromadb") is not None
+ML_MODEL_AVAILABLE = importlib.util.find_spec("joblib") is not None
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# Vector search backend: "chroma" (PersistentClient) or "numpy" (memory-mapped
+# exact search over the matrix exported by ingest_data.py)
+VECTOR_BACKEND = os.environ.get("SPROUT_VECTOR_BACKEND", "chroma").lower()
+
+# Layout version of the compact model written by train_model.export_linear_model;
+# bump when that layout changes
+LINEAR_MODEL_FORMAT = 1
+
+class LinearPredictor:
+    """
+    sklearn-free inference for the exported symptom classifier
+    (train_model.export_linear_model): word tokenization, stop words,
+    TF-IDF and the linear decision function, evaluated only over the few
+    terms present in the query. Mirrors Pipeline.predict, including the
+    order of floating-point operations, so predictions are identical.
+    Uses numpy for the score vector when installed.
+    """
+    def __init__(self, path):
+        with open(path, "r") as f:
+            model = json.load(f)
+        if model.get("format") != LINEAR_MODEL_FORMAT:
+            raise ValueError(f"Unsupported linear model format: {model.get('format')}")
+
+        self.classes = model["classes"]
+        self.model_sha256 = model.get("model_sha256")
+        self.vocabulary = model["vocabulary"]
+        self.lowercase = model["lowercase"]
+        self.stop_words = frozenset(model["stop_words"])
+        self.ngram_range = tuple(model["ngram_range"])
+        self.idf = model["idf"]
+        self.norm = model["norm"]
+        self.sublinear_tf = model["sublinear_tf"]
+        self._token_re = re.compile(model["token_pattern"])
+
+        # Feature-major weights: one row of per-class weights per term
+        coef, intercept = model["coef"], model["intercept"]
+        self._binary = len(coef) == 1
+        if NUMPY_AVAILABLE:
+            import numpy as np
+
+            self._np = np
+            self._columns = np.ascontiguousarray(np.asarray(coef, dtype=np.float64).T)
+            self._intercept = np.asarray(intercept, dtype=np.float64)
+        else:
+            self._np = None
+            self._columns = [list(column) for column in zip(*coef)]
+            self._intercept = intercept
+
+    def _terms(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self._token_re.findall(text) if t not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def features(self, text):
+        """
+        Non-zero TF-IDF features of text as (column, value) pairs in column order.
+        """
+        counts = {}
+        vocabulary = self.vocabulary
+        for term in self._terms(text):
+            col = vocabulary.get(term)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+
+        features = []
+        for col in sorted(counts):
+            value = float(counts[col])
+            if self.sublinear_tf:
+                value = math.log(value) + 1.0
+            if self.idf is not None:
+                value *= self.idf[col]
+            features.append((col, value))
+
+        if self.norm == "l2":
+            total = math.sqrt(sum(v * v for _, v in features))
+        elif self.norm == "l1":
+            total = sum(abs(v) for _, v in features)
+        else:
+            total = 0.0
+        if total > 0.0:
+            features = [(col, v / total) for col, v in features]
+        return features
+
+    def decision_function(self, text):
+        """
+        Per-class scores (one per entry of self.classes).
+        """
+        columns = self._columns
+        if self._np is not None:
+            scores = self._np.zeros(len(self._intercept))
+            for col, value in self.features(text):
+                scores += value * columns[col]
+            scores = (scores + self._intercept).tolist()
+        else:
+            scores = [0.0] * len(self._intercept)
+            for col, value in self.features(text):
+                weights = columns[col]
+                for k in range(len(scores)):
+                    scores[k] += value * weights[k]
+            scores = [score + b for score, b in zip(scores, self._intercept)]
+        if self._binary:
+            # A single score s for classes[1]; -s stands for classes[0]
+            return [-scores[0], scores[0]]
+        return scores
+
+    def top_k(self, text, k=5):
+        """
+        The k best (label, score) pairs, highest score first.
+        """
+        scores = self.decision_function(text)
+        best = heapq.nsmallest(k, range(len(scores)), key=lambda i: (-scores[i], i))
+        return [(self.classes[i], scores[i]) for i in best]
+
+    def predict(self, texts):
+        predictions = []
+        for text in texts:
+            scores = self.decision_function(text)
+            # First index wins ties, like numpy.argmax; for a binary model
+            # a zero score picks classes[0], like sklearn
+            best = max(range(len(scores)), key=scores.__getitem__)
+            predictions.append(self.classes[best])
+        return predictions
 
 class SymptomAnalyzer:
-    def __init__(self, data_path):
+    # Number of candidates returned by the rule-based fallback
+    RULE_TOP_K = 5
+    # Character n-gram size used by the rule-based inverted index
+    RULE_NGRAM = 3
+    # Postings more than this many times larger than the candidate set are
+    # not intersected; the candidates are verified directly instead
+    RULE_INTERSECT_RATIO = 4
+
+    def __init__(self, data_path, embedding_cache_size=1024, load_models=True, vector_backend=None):
         self.data_path = data_path
+        self.vector_backend = (vector_backend or VECTOR_BACKEND).lower()
         self.conditions = []
         self._load_data(data_path)
+
+        # Per-tier state: pending -> loading -> ready | unavailable | failed
+        self.tier_status = {
+            "vector": "pending",
+            "ml": "pending",
+            "rule_based": "ready" if self.conditions else "failed"
+        }
         
         # Paths
         base_dir = os.path.dirname(os.path.dirname(data_path)) # up from data/symptoms.json to root
         self.db_path = os.path.join(base_dir, "data", "chroma_db")
         self.model_path = os.path.join(base_dir, "data", "symptom_model.pkl")
+        self.linear_model_path = os.path.join(base_dir, "data", "symptom_model.linear.json")
+        self.embeddings_path = os.path.join(base_dir, "data", "condition_embeddings.npy")
+        self.index_table_path = os.path.join(base_dir, "data", "condition_index.json")
         
         self.vector_client = None
         self.collection = None
+        self.embedding_fn = None
+        self.embedding_backend = None
+        # Minimum vector-tier score for a confident match (set per backend)
+        self.vector_min_score = 0.2
         self.ml_model = None
+
+        # Query embeddings keyed on the normalized symptom text
+        self.embedding_cache = LRUCache(maxsize=embedding_cache_size)
         
         # Initialize Advanced Modules
+        if load_models:
+            self.load_models()
+
+    def load_models(self):
+        """
+        Loads the vector and ML tiers. Until a tier is ready, diagnose()
+        simply falls through to the next one (ultimately rule-based).
+        """
         self._init_vector_db()
         self._init_ml_model()
 
+    def start_background_warmup(self):
+        """
+        Loads the heavy tiers in a daemon thread so the caller (e.g. the web
+        server) can start serving immediately from the rule-based tier.
+        """
+        thread = threading.Thread(target=self.load_models, name="sprout-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def is_warm(self):
+        return all(state not in ("pending", "loading") for state in self.tier_status.values())
+
     def _load_data(self, data_path):
         try:
-            # 1. Load Main Data
-            with open(data_path, "r") as f:
-                data = json.load(f)
-                
-            # 2. Load Remedies & Additional Conditions
-            remedies_path = os.path.join(os.path.dirname(os.path.dirname(data_path)), 'data', 'remedies.json')
-            remedy_map = {}
-            additional_conditions = []
-            
-            try:
-                with open(remedies_path, 'r') as rf:
-                    rdata = json.load(rf)
-                    remedy_map = rdata.get("disease_remedies", {})
-                    additional_conditions = rdata.get("additional_conditions", [])
-            except:
-                pass
-
-            # Handle new structure
-            raw_conditions = data.get("disease_symptoms", {})
-            if raw_conditions:
-                    self.conditions = []
-                    for name, symptoms in raw_conditions.items():
-                        self.conditions.append({
-                            "name": name, 
-                            "symptoms": symptoms,
-                            "remedies": remedy_map.get(name.lower().strip(), ["Consult a doctor."]),
-                            "severity": "Unknown"
-                        })
-            else:
-                self.conditions = data.get("conditions", [])
-            
-            # 3. Append Additional Conditions (Nose Bleed, etc.)
-            self.conditions.extend(additional_conditions)
-                
+            # Compiled, merged symptoms.json + remedies.json (shared per process)
+            kb = load_knowledge_base(data_path)
+            self.kb_version = kb.content_hash
+            self.conditions = kb.conditions
+            self.vocabulary = kb.vocabulary
+            self.canonicalizer = kb.canonicalizer
         except Exception as e:
             print(f"Error loading data: {e}")
-            self.conditions = []
+            self.kb_version = None
+            self.vocabulary = SymptomVocabulary()
+            self.conditions = ConditionTable(self.vocabulary)
+            self.canonicalizer = SymptomCanonicalizer([])
+
+        # Condition name -> index, for the tiers that predict a name
+        self._condition_index = {}
+        for idx, name in enumerate(self.conditions.names):
+            self._condition_index.setdefault(name, idx)
+
+        self._build_rule_index()
+
+    def _build_rule_index(self):
+        """
+        Precomputes the lookup structures used by _diagnose_rule_based, all
+        keyed on the knowledge base's symptom IDs (condition symptoms are
+        already lower-cased, non-empty and unique per condition):
+        - symptom_postings: symptom ID -> condition indices
+        - symptom_matcher: finds every condition symptom contained in an input
+        - ngram_index: n-gram -> IDs of the condition symptoms containing it,
+          used to find every condition symptom that contains an input
+        - phrase_conditions: canonical dictionary phrase -> matching condition
+          indices, filled on first use, so canonicalized input resolves with
+          one dict lookup
+        """
+        postings = {}
+        for idx in range(len(self.conditions)):
+            for symptom_id in self.conditions.symptom_ids_of(idx):
+                posting = postings.get(symptom_id)
+                if posting is None:
+                    posting = postings[symptom_id] = array("I")
+                posting.append(idx)
+
+        phrases = self.vocabulary.phrases
+        self._symptom_ids = list(postings)
+        self._symptom_postings = postings
+        self._symptom_matcher = PhraseMatcher([phrases[i] for i in self._symptom_ids])
+
+        self._phrase_conditions = {}
+
+        n = self.RULE_NGRAM
+        self._ngram_index = {}
+        for symptom_id in self._symptom_ids:
+            symptom = phrases[symptom_id]
+            for gram in {symptom[i:i + n] for i in range(len(symptom) - n + 1)}:
+                posting = self._ngram_index.get(gram)
+                if posting is None:
+                    posting = self._ngram_index[gram] = array("I")
+                posting.append(symptom_id)
 
     def _init_vector_db(self):
-        if VECTOR_DB_AVAILABLE:
-            try:
-                # Check if DB exists
-                if os.path.exists(self.db_path):
-                    self.vector_client = chromadb.PersistentClient(path=self.db_path, settings=Settings(anonymized_telemetry=False))
-                    ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-                    self.collection = self.vector_client.get_collection(name="health_conditions", embedding_function=ef)
-                    print("Debug: Vector DB loaded successfully.")
-            except Exception as e:
-                print(f"Debug: Vector DB init failed: {e}")
-                # pass
+        if self.vector_backend == "numpy":
+            return self._init_numpy_index()
+
+        if not VECTOR_DB_AVAILABLE or not os.path.exists(self.db_path):
+            self.tier_status["vector"] = "unavailable"
+            return
+
+        self.tier_status["vector"] = "loading"
+        try:
+            import chromadb
+            from chromadb.config import Settings
+
+            self.vector_client = chromadb.PersistentClient(path=self.db_path, settings=Settings(anonymized_telemetry=False))
+            # Query embeddings are computed here and passed explicitly
+            collection = self.vector_client.get_collection(name="health_conditions", embedding_function=None)
+            # Publish the embedding function before the collection: request
+            # threads use the vector tier as soon as self.collection is set.
+            self._set_embedder((collection.metadata or {}).get("embedding_backend"))
+            self.collection = collection
+            self.tier_status["vector"] = "ready"
+            print("Debug: Vector DB loaded successfully.")
+        except Exception as e:
+            self.tier_status["vector"] = "failed"
+            print(f"Debug: Vector DB init failed: {e}")
+
+    def _init_numpy_index(self):
+        if not NUMPY_AVAILABLE or not os.path.exists(self.embeddings_path):
+            self.tier_status["vector"] = "unavailable"
+            return
+
+        self.tier_status["vector"] = "loading"
+        try:
+            from vector_index import NumpyVectorIndex
+
+            index = NumpyVectorIndex(self.embeddings_path, self.index_table_path)
+            backend = index.embedding_backend or LEGACY_BACKEND
+            if not backend_available(backend):
+                self.tier_status["vector"] = "unavailable"
+                print(f"Debug: embedding backend '{backend}' of the NumPy index is not installed.")
+                return
+            self._set_embedder(backend)
+            # Exposes the same query() interface as a Chroma collection
+            self.collection = index
+            self.tier_status["vector"] = "ready"
+            print(f"Debug: NumPy vector index loaded ({index.count()} conditions).")
+        except Exception as e:
+            self.tier_status["vector"] = "failed"
+            print(f"Debug: NumPy vector index init failed: {e}")
+
+    def _set_embedder(self, recorded_spec):
+        """
+        Loads the query embedder for the backend the index was built with,
+        so queries and documents share one embedding space.
+        """
+        embedder = get_embedder(recorded_spec or LEGACY_BACKEND)
+        configured = os.environ.get("SPROUT_EMBEDDING_BACKEND")
+        if configured and parse_spec(configured)[0] != parse_spec(embedder.spec)[0]:
+            print(f"Warning: the vector index was built with '{embedder.spec}', not '{configured}'; "
+                  "queries use the index's backend. Re-run ingest_data.py to switch.")
+        self.embedding_backend = embedder.spec
+        self.vector_min_score = embedder.min_score
+        self.embedding_fn = embedder
 
     def _init_ml_model(self):
-        if ML_MODEL_AVAILABLE:
+        # Prefer the compact export (no sklearn import) if it matches the pickle
+        if os.path.exists(self.linear_model_path):
+            self.tier_status["ml"] = "loading"
             try:
-                if os.path.exists(self.model_path):
-                    self.ml_model = joblib.load(self.model_path)
-                    print("Debug: ML Model loaded successfully.")
+                predictor = LinearPredictor(self.linear_model_path)
+                if self._pickle_matches(predictor.model_sha256):
+                    self.ml_model = predictor
+                    self._check_model_version()
+                    self.tier_status["ml"] = "ready"
+                    print("Debug: Compact ML model loaded successfully.")
+                    return
+                print("Debug: Compact ML model is stale (pickle retrained); using the pickle.")
             except Exception as e:
-                # print(f"Debug: ML Model init failed: {e}")
-                pass
+                print(f"Debug: Compact ML model init failed, using the pickle: {e}")
+
+        if not ML_MODEL_AVAILABLE or not os.path.exists(self.model_path):
+            self.tier_status["ml"] = "unavailable"
+            return
+
+        self.tier_status["ml"] = "loading"
+        try:
+            import joblib
+
+            self.ml_model = joblib.load(self.model_path)
+            self._check_model_version()
+            self.tier_status["ml"] = "ready"
+            print("Debug: ML Model loaded successfully.")
+        except Exception as e:
+            self.tier_status["ml"] = "failed"
+            # print(f"Debug: ML Model init failed: {e}")
+
+    def _pickle_matches(self, model_sha256):
+        if not model_sha256 or not os.path.exists(self.model_path):
+            return True
+        digest = hashlib.sha256()
+        with open(self.model_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest() == model_sha256
+
+    def _check_model_version(self):
+        # train_model.py records the KB content hash it was trained on
+        meta_path = os.path.splitext(self.model_path)[0] + ".meta.json"
+        try:
+            with open(meta_path, "r") as f:
+                trained_on = json.load(f).get("kb_content_hash")
+        except (OSError, ValueError):
+            return
+        if trained_on and self.kb_version and trained_on != self.kb_version:
+            print("Warning: ML model was trained on a different knowledge base version; re-run train_model.py.")
 
     def diagnose(self, user_symptoms, user_profile=None):
         """
@@ -110,63 +407,187 @@ class SymptomAnalyzer:
         2. Semantic Similarity Re-ranking
         3. Business Logic / Safety Layer
         """
-        user_symptoms_str = " ".join(user_symptoms)
-        
-        # 1. Advanced Vector Search
-        if self.collection:
-            try:
-                # Query more results to allow for re-ranking/filtering
-                results = self.collection.query(
-                    query_texts=[user_symptoms_str],
-                    n_results=5 
+        return self.diagnose_many([user_symptoms], [user_profile])[0]
+
+    def diagnose_many(self, batch_symptoms, batch_profiles=None):
+        """
+        Batched variant of diagnose().
+        Runs one multi-query vector search and one ML predict call for the
+        whole batch; only the items a tier could not resolve fall through
+        to the next tier. Returns one prediction list per input item.
+        """
+        if batch_profiles is None:
+            batch_profiles = [None] * len(batch_symptoms)
+
+        results = [None] * len(batch_symptoms)
+        pending = list(range(len(batch_symptoms)))
+
+        # 1. Advanced Vector Search, 2. ML Model (Fall back if Vector fails)
+        for tier in ("vector", "ml"):
+            if not pending:
+                break
+            if not self.tier_available(tier):
+                record_fallback(tier, "not_loaded", count=len(pending))
+                continue
+            self._run_tier(tier, batch_symptoms, batch_profiles, pending, results)
+            resolved = len(pending)
+            pending = [i for i in pending if results[i] is None]
+            record_tier(tier, resolved - len(pending))
+
+        # 3. Fallback
+        self._rule_tier(batch_symptoms, batch_profiles, pending, results)
+        matched = sum(1 for i in pending if results[i])
+        record_tier("rule_based", matched)
+        record_tier("none", len(pending) - matched)
+
+        return results
+
+    def tier_available(self, tier):
+        """
+        True if the tier can answer right now (its model/index is loaded).
+        """
+        if tier == "vector":
+            return self.collection is not None
+        if tier == "ml":
+            return self.ml_model is not None
+        return tier == "rule_based"
+
+    def diagnose_tier(self, tier, user_symptoms, user_profile=None):
+        """
+        Runs a single tier for one symptom list.
+        Returns its prediction list, or None if the tier had no confident
+        answer. Used by the async API, which runs the tiers concurrently.
+        """
+        results = [None]
+        self._run_tier(tier, [user_symptoms], [user_profile], [0], results)
+        return results[0]
+
+    def _run_tier(self, tier, batch_symptoms, batch_profiles, pending, results):
+        run = {
+            "vector": self._vector_tier,
+            "ml": self._ml_tier,
+            "rule_based": self._rule_tier
+        }[tier]
+        run(batch_symptoms, batch_profiles, pending, results)
+
+    def _vector_tier(self, batch_symptoms, batch_profiles, pending, results):
+        """
+        Fills results[i] for the pending items the vector search resolves.
+        """
+        try:
+            query_embeddings = self._embed_queries([batch_symptoms[i] for i in pending])
+            # Query more results to allow for re-ranking/filtering
+            with timed("vector_query"):
+                vector_results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=5
                 )
-                
-                if results['metadatas'] and results['metadatas'][0]:
-                    candidates = []
-                    for i, meta in enumerate(results['metadatas'][0]):
-                        dist = results['distances'][0][i]
-                        
-                        # Parse complex fields
-                        import json
-                        try:
-                            remedies = json.loads(meta.get('remedies', '[]'))
-                        except:
-                            remedies = []
-                            
-                        candidate = {
-                            "name": meta['name'],
-                            "severity": meta['severity'],
-                            "remedies": remedies,
-                            "source": "Vector AI",
-                            "score": 1 - dist # Convert distance to similarity score
-                        }
-                        candidates.append(candidate)
-                    
+
+            with timed("rerank"):
+                for row, i in enumerate(pending):
+                    candidates = self._parse_vector_candidates(vector_results, row)
+                    if not candidates:
+                        record_fallback("vector", "no_results")
+                        continue
                     # Rerank / Filter candidates based on profile (Faang-style logic)
-                    best_match = self._rerank_candidates(candidates, user_profile)
+                    best_match = self._rerank_candidates(candidates, batch_profiles[i])
                     if best_match:
-                        return [best_match]
+                        results[i] = [best_match]
+                    else:
+                        record_fallback("vector", "low_confidence")
 
-            except Exception as e:
-                print(f"Vector search error: {e}")
+        except Exception as e:
+            print(f"Vector search error: {e}")
+            record_fallback("vector", "error", count=sum(1 for i in pending if results[i] is None))
+
+    def _ml_tier(self, batch_symptoms, batch_profiles, pending, results):
+        """
+        Fills results[i] for the pending items the ML model resolves.
+        """
+        try:
+            with timed("ml_predict"):
+                prediction_names = self.ml_model.predict([" ".join(batch_symptoms[i]) for i in pending])
+            for i, prediction_name in zip(pending, prediction_names):
+                idx = self._condition_index.get(prediction_name)
+                if idx is None:
+                    record_fallback("ml", "unknown_label")
+                    continue
+                cond = self.conditions[idx]
+                results[i] = [{
+                    "name": cond.name,
+                    "severity": cond.severity,
+                    "remedies": cond.remedies,
+                    "source": "ML Model"
+                }]
+        except Exception as e:
+            print(f"ML model error: {e}")
+            record_fallback("ml", "error", count=sum(1 for i in pending if results[i] is None))
+
+    def _rule_tier(self, batch_symptoms, batch_profiles, pending, results):
+        with timed("rule_match"):
+            for i in pending:
+                results[i] = self._diagnose_rule_based(batch_symptoms[i])
+
+    @staticmethod
+    def _normalize_query(user_symptoms):
+        """
+        Canonical query text for a symptom list: lower-cased, whitespace
+        collapsed, empty entries dropped. Every embedding backend is uncased
+        and ignores whitespace, so this does not change the embedding.
+        """
+        parts = (" ".join(s.lower().split()) for s in user_symptoms)
+        return " ".join(p for p in parts if p)
+
+    def _embed_queries(self, batch_symptoms):
+        """
+        Returns one query embedding per symptom list, encoding only the
+        distinct texts that are not already in the embedding cache.
+        """
+        keys = [self._normalize_query(symptoms) for symptoms in batch_symptoms]
+        embeddings = {}
+        missing = []
+        for key in keys:
+            if key in embeddings:
+                continue
+            cached = self.embedding_cache.get(key)
+            if cached is None:
+                missing.append(key)
+            embeddings[key] = cached
+
+        if missing:
+            with timed("embedding"):
+                computed = self.embedding_fn(missing)
+            for key, embedding in zip(missing, computed):
+                self.embedding_cache.put(key, embedding)
+                embeddings[key] = embedding
+
+        return [embeddings[key] for key in keys]
+
+    def _parse_vector_candidates(self, results, row):
+        """
+        Converts one row of a (multi-query) vector search result into candidates.
+        """
+        candidates = []
+        if not results['metadatas'] or not results['metadatas'][row]:
+            return candidates
+
+        for i, meta in enumerate(results['metadatas'][row]):
+            dist = results['distances'][row][i]
 
-        # 2. Try ML Model (Fall back if Vector fails)
-        if self.ml_model:
+            # Parse complex fields
             try:
-                prediction_name = self.ml_model.predict([user_symptoms_str])[0]
-                for cond in self.conditions:
-                    if cond["name"] == prediction_name:
-                        return [{
-                            "name": cond["name"],
-                            "severity": cond.get("severity", "unknown"),
-                            "remedies": cond.get("remedies", []),
-                            "source": "ML Model"
-                        }]
-            except Exception as e:
-                pass
+                remedies = json.loads(meta.get('remedies', '[]'))
+            except:
+                remedies = []
 
-        # 3. Fallback
-        return self._diagnose_rule_based(user_symptoms)
+            candidates.append({
+                "name": meta['name'],
+                "severity": meta['severity'],
+                "remedies": remedies,
+                "source": "Vector AI",
+                "score": 1 - dist # Convert distance to similarity score
+            })
+        return candidates
 
     def _rerank_candidates(self, candidates, profile):
         """
@@ -180,7 +601,7 @@ class SymptomAnalyzer:
         # or specific confidence thresholds.
         
         # Filter out low confidence
-        high_conf = [c for c in candidates if c['score'] > 0.2] # Adjust threshold
+        high_conf = [c for c in candidates if c['score'] > self.vector_min_score]
         
         if not high_conf:
             return None
@@ -188,29 +609,85 @@ class SymptomAnalyzer:
         return max(high_conf, key=lambda x: x['score'])
 
 
-    def _diagnose_rule_based(self, user_symptoms):
-        potential_conditions = []
+    def _find_containing_symptoms(self, user_symptom):
+        """
+        Returns the IDs of the condition symptoms that contain user_symptom
+        as a substring.
+        """
+        n = self.RULE_NGRAM
+        phrases = self.vocabulary.phrases
+        if len(user_symptom) < n:
+            # Too short to filter by n-grams; scan the (deduplicated) vocabulary
+            return [i for i in self._symptom_ids if user_symptom in phrases[i]]
+
+        grams = {user_symptom[i:i + n] for i in range(len(user_symptom) - n + 1)}
+        postings = []
+        for gram in grams:
+            posting = self._ngram_index.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(posting) > self.RULE_INTERSECT_RATIO * len(candidates):
+                # Verifying the remaining candidates is cheaper than this intersection
+                break
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        # Sharing all n-grams is necessary but not sufficient; verify
+        return [i for i in candidates if user_symptom in phrases[i]]
+
+    def _matching_conditions(self, user_symptom):
+        """
+        Indices of the conditions with a symptom that contains user_symptom
+        or is contained in it.
+        """
+        id_of = self.vocabulary.id_of
+        matched = {id_of(s) for s in self._symptom_matcher.find_all(user_symptom)}
+        matched.update(self._find_containing_symptoms(user_symptom))
+
+        condition_ids = set()
+        for symptom_id in matched:
+            condition_ids.update(self._symptom_postings[symptom_id])
+        return condition_ids
+
+    def _diagnose_rule_based(self, user_symptoms, top_k=None):
+        """
+        Counts, per condition, how many user symptoms match one of its symptoms
+        (either string contained in the other) and returns the top_k conditions
+        by match count. Only conditions sharing terms with the input are touched.
+        """
+        top_k = top_k or self.RULE_TOP_K
         user_symptoms_lower = [s.lower().strip() for s in user_symptoms]
+        phrase_conditions = self._phrase_conditions
+        matches = []
 
-        for condition in self.conditions:
-            match_count = 0
-            condition_symptoms = [s.lower() for s in condition.get("symptoms", [])]
-            
-            for user_symptom in user_symptoms_lower:
-                for cond_symptom in condition_symptoms:
-                    if cond_symptom in user_symptom or user_symptom in cond_symptom:
-                         match_count += 1
-                         break 
-            
-            if match_count > 0:
-                potential_conditions.append({
-                    "name": condition["name"],
-                    "match_count": match_count,
-                    "remedies": condition.get("remedies", []),
-                    "severity": condition.get("severity", "unknown"),
-                    "source": "Rule-Based"
-                })
-        
-        potential_conditions.sort(key=lambda x: x["match_count"], reverse=True)
-        return potential_conditions
+        for user_symptom in user_symptoms_lower:
+            condition_ids = phrase_conditions.get(user_symptom)
+            if condition_ids is None:
+                condition_ids = self._matching_conditions(user_symptom)
+                # Only dictionary phrases are memoized, which bounds the table
+                if user_symptom in self.canonicalizer:
+                    condition_ids = phrase_conditions[user_symptom] = tuple(condition_ids)
+            # Each user symptom counts at most once per condition
+            matches.append(condition_ids)
+
+        # Counted in condition order, so the stable top-k keeps knowledge-base
+        # order among equal match counts (sort and count both run in C)
+        match_counts = Counter(sorted(chain.from_iterable(matches)))
+        top = heapq.nlargest(top_k, match_counts.items(), key=itemgetter(1))
 
+        potential_conditions = []
+        for idx, match_count in top:
+            condition = self.conditions[idx]
+            potential_conditions.append({
+                "name": condition.name,
+                "match_count": match_count,
+                "remedies": condition.remedies,
+                "severity": condition.severity,
+                "source": "Rule-Based"
+            })
+        return potential_conditions
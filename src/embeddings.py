@@ -0,0 +1,145 @@
+"""
+Embedding backends for the vector tier.
+
+A backend is identified by a spec string, e.g. "minilm" or
+"hashed-ngram:dim=512,ngram=3-4". ingest_data.py embeds the conditions with
+the configured backend (SPROUT_EMBEDDING_BACKEND) and records its full spec
+in the index; SymptomAnalyzer builds its query embedder from the recorded
+spec, so documents and queries always share one embedding space.
+
+- minilm: all-MiniLM-L6-v2 through sentence-transformers (needs torch).
+- hashed-ngram: hashed character n-grams (crc32) of each word, stateless
+  and pure Python, so it loads instantly and adds almost no memory.
+"""
+import importlib.util
+import math
+import os
+import re
+import zlib
+
+EMBEDDING_BACKEND = os.environ.get("SPROUT_EMBEDDING_BACKEND", "minilm").lower()
+
+# Spec assumed for indexes written before the backend was recorded
+LEGACY_BACKEND = "minilm"
+
+
+class MiniLMEmbedder:
+    name = "minilm"
+    # Minimum vector-tier score (1 - squared L2 distance) for a confident match
+    min_score = 0.2
+
+    def __init__(self):
+        from chromadb.utils import embedding_functions
+
+        self.spec = self.spec_for()
+        self._fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+
+    @classmethod
+    def spec_for(cls):
+        return cls.name
+
+    @staticmethod
+    def available():
+        return (importlib.util.find_spec("chromadb") is not None
+                and importlib.util.find_spec("sentence_transformers") is not None)
+
+    def __call__(self, texts):
+        return self._fn(texts)
+
+
+class HashedNgramEmbedder:
+    """
+    Maps each word, padded with spaces, to its character n-grams and hashes
+    them into a fixed number of signed buckets (the hashing trick), with
+    sublinear counts and L2 normalization. Shared n-grams make it robust to
+    plural forms and typos; it has no notion of synonyms.
+    """
+    name = "hashed-ngram"
+    min_score = 0.2
+
+    _WORD_RE = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dim=512, ngram="3-4"):
+        self.dim = int(dim)
+        self.min_n, self.max_n = self._ngram_range(ngram)
+        self.spec = self.spec_for(dim, ngram)
+
+    @staticmethod
+    def _ngram_range(ngram):
+        min_n, _, max_n = str(ngram).partition("-")
+        return int(min_n), int(max_n or min_n)
+
+    @classmethod
+    def spec_for(cls, dim=512, ngram="3-4"):
+        min_n, max_n = cls._ngram_range(ngram)
+        return f"{cls.name}:dim={int(dim)},ngram={min_n}-{max_n}"
+
+    @staticmethod
+    def available():
+        return True
+
+    def embed(self, text):
+        counts = {}
+        for word in self._WORD_RE.findall(text.lower()):
+            padded = f" {word} "
+            for n in range(self.min_n, self.max_n + 1):
+                for i in range(len(padded) - n + 1):
+                    h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+                    # Low bits pick the bucket, the top bit the sign
+                    bucket = h % self.dim
+                    counts[bucket] = counts.get(bucket, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+
+        vector = [0.0] * self.dim
+        for bucket, count in counts.items():
+            if count:
+                vector[bucket] = math.copysign(1.0 + math.log(abs(count)), count)
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm > 0.0:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def __call__(self, texts):
+        return [self.embed(text) for text in texts]
+
+
+BACKENDS = {
+    MiniLMEmbedder.name: MiniLMEmbedder,
+    HashedNgramEmbedder.name: HashedNgramEmbedder
+}
+
+
+def parse_spec(spec):
+    """
+    "name:key=value,key=value" -> (name, {key: value}).
+    """
+    name, _, params = (spec or LEGACY_BACKEND).strip().lower().partition(":")
+    options = {}
+    for item in params.split(","):
+        if item:
+            key, _, value = item.partition("=")
+            options[key.strip()] = value.strip()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return name, options
+
+
+def backend_available(spec):
+    name, _ = parse_spec(spec)
+    return BACKENDS[name].available()
+
+
+def canonical_spec(spec=None):
+    """
+    Full spec string (as recorded in an index) without loading the backend.
+    """
+    name, options = parse_spec(spec or EMBEDDING_BACKEND)
+    return BACKENDS[name].spec_for(**options)
+
+
+def get_embedder(spec=None):
+    """
+    Builds the embedder for spec (default: SPROUT_EMBEDDING_BACKEND).
+    Its .spec attribute is the canonical form to record in an index.
+    """
+    name, options = parse_spec(spec or EMBEDDING_BACKEND)
+    return BACKENDS[name](**options)
@@ -1,45 +1,53 @@
 import json
+from knowledge_base import load_emergency_symptoms, load_knowledge_base
+from matcher import PhraseMatcher
+from normalizer import SymptomCanonicalizer
 
 class EmergencyDetector:
     def __init__(self, data_path):
         self.emergency_symptoms = []
+        self.canonicalizer = SymptomCanonicalizer([])
         self._load_data(data_path)
+        # Compile the phrase list once; every request is then a single scan per symptom
+        self.matcher = PhraseMatcher(self.emergency_symptoms)
+        # Canonical dictionary phrase -> emergency phrases it contains, filled on
+        # first use: canonicalized input skips the scan
+        self._phrase_emergencies = {}
 
     def _load_data(self, data_path):
         try:
-            with open(data_path, 'r') as f:
-                data = json.load(f)
-                self.emergency_symptoms = [s.lower() for s in data.get("emergency_symptoms", [])]
-                
-                # Fallback if empty (new json structure might miss this)
-                if not self.emergency_symptoms:
-                    self.emergency_symptoms = [
-                        "chest pain", "difficulty breathing", "heart attack", 
-                        "severe fever", "unconsciousness", "severe bleeding", 
-                        "sudden severe headache"
-                    ]
+            # Lower-cased, with the default list as fallback (see knowledge_base.py).
+            # Shared with the analyzer: both use the process-wide knowledge base.
+            kb = load_knowledge_base(data_path)
+            self.emergency_symptoms = kb.emergency_symptoms
+            self.canonicalizer = kb.canonicalizer
         except FileNotFoundError:
             print(f"Error: Data file not found at {data_path}")
             self.emergency_symptoms = []
         except json.JSONDecodeError:
             print(f"Error: Invalid JSON format in {data_path}")
             self.emergency_symptoms = []
+        except Exception as e:
+            # The rest of the knowledge base is broken: still screen with the
+            # emergency list of symptoms.json
+            print(f"Error loading knowledge base from {data_path}: {e}; using its emergency list only")
+            self.emergency_symptoms = load_emergency_symptoms(data_path)
 
     def check_emergency(self, user_symptoms):
         """
         Checks if any user-provided symptoms are emergency indicators.
         Returns a list of detected emergency symptoms.
         """
-        detected_emergencies = []
+        detected_emergencies = set()
         for symptom in user_symptoms:
             symptom_lower = symptom.lower().strip()
             
-            # check if any emergency symptom is a substring of the user symptom
-            # or if the user symptom is a substring of an emergency symptom (e.g. "pain" in "chest pain" - careful!)
-            # Better: Check if the emergency phrase is present in the input
-            
-            for emergency in self.emergency_symptoms:
-                if emergency in symptom_lower:
-                     detected_emergencies.append(emergency)
+            found = self._phrase_emergencies.get(symptom_lower)
+            if found is None:
+                # Check if any emergency phrase is present in the input
+                found = self.matcher.find_all(symptom_lower)
+                if symptom_lower in self.canonicalizer:
+                    self._phrase_emergencies[symptom_lower] = tuple(found)
+            detected_emergencies.update(found)
         
-        return list(set(detected_emergencies))
+        return list(detected_emergencies)
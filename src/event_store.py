@@ -0,0 +1,531 @@
+"""
+Append-only, time-indexed event store (emergency events).
+
+Events are JSON objects with an epoch "ts" and a "kind". Each writing
+process appends them as JSON lines to its own active segment:
+
+    events-<created_ms>-<pid>.jsonl             active segment
+    events-<created_ms>-<pid>.jsonl.idx         its block index
+
+Every `block_records` events a block is closed and one line describing it
+(min/max ts, byte offset and length, count per kind) is appended to the
+index. A segment is closed once it reaches `max_segment_bytes` or is
+`max_segment_seconds` old (checked on append, before queries and by a
+timer, so an idle process closes it too): each block is recompressed as
+its own gzip member (the file is still a valid .gz for zcat) and the
+segment is renamed with its time range, so range queries skip it by name:
+
+    events-<min_ms>-<max_ms>-<created_ms>-<pid>.jsonl.gz (+ .idx)
+
+Queries read the index of the overlapping segments only, then just the
+blocks that overlap the range; count() does not even read blocks that lie
+fully inside it. Active segments of other processes (gunicorn workers)
+are read too; their unindexed tail is scanned.
+
+A segment left active by a process that died is closed by the next store
+opened on the directory. The recovering process first claims it by
+renaming it to <segment>.recover-<pid>; a claim whose process died too is
+finished (or, if its closed segment was already written, removed) the
+same way.
+"""
+import atexit
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+
+DEFAULT_EVENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'events')
+
+SEGMENT_PREFIX = "events-"
+_ACTIVE_RE = re.compile(r"^events-(\d+)-(\d+)\.jsonl$")
+_CLOSED_RE = re.compile(r"^events-(\d+)-(\d+)-(\d+)-(\d+)\.jsonl(\.gz)?$")
+# An active segment claimed for recovery by process <recoverer>
+_RECOVER_RE = re.compile(r"^(events-(\d+)-(\d+)\.jsonl)\.recover-(\d+)(\.idx)?$")
+
+# Active segments written by stores of this process (never "stale")
+_writing = set()
+# Last created_ms given to a segment of this process: segments are keyed by
+# (created_ms, pid), so quick rotations must not share a millisecond
+_last_created_ms = 0
+_created_lock = threading.Lock()
+
+
+def _ms(ts):
+    return int(ts * 1000)
+
+
+def _next_created_ms(now):
+    global _last_created_ms
+    with _created_lock:
+        _last_created_ms = max(_ms(now), _last_created_ms + 1)
+        return _last_created_ms
+
+
+def _overlaps(min_ts, max_ts, start, end):
+    """
+    [min_ts, max_ts] intersects [start, end) (None = unbounded).
+    """
+    return (start is None or max_ts >= start) and (end is None or min_ts < end)
+
+
+def _in_range(ts, start, end):
+    return (start is None or ts >= start) and (end is None or ts < end)
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Segment:
+    """
+    A segment file found on disk. min_ts/max_ts are only known (from the
+    name) once it is closed.
+    """
+    __slots__ = ("path", "created_ms", "pid", "min_ts", "max_ts", "compressed")
+
+    def __init__(self, path, created_ms, pid, min_ts=None, max_ts=None, compressed=False):
+        self.path = path
+        self.created_ms = created_ms
+        self.pid = pid
+        self.min_ts = min_ts
+        self.max_ts = max_ts
+        self.compressed = compressed
+
+    @property
+    def closed(self):
+        return self.min_ts is not None
+
+    @property
+    def index_path(self):
+        return self.path + ".idx"
+
+    def read_index(self):
+        blocks = []
+        try:
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    try:
+                        blocks.append(json.loads(line))
+                    except ValueError:
+                        # Partially written last line of an active index
+                        break
+        except FileNotFoundError:
+            pass
+        return blocks
+
+    def read_block(self, f, block):
+        f.seek(block["offset"])
+        data = f.read(block["length"])
+        if self.compressed:
+            data = gzip.decompress(data)
+        return data
+
+    def tail(self, f, blocks):
+        """
+        Events after the last indexed block of an active segment.
+        """
+        f.seek(blocks[-1]["offset"] + blocks[-1]["length"] if blocks else 0)
+        return _parse_lines(f.read())
+
+
+def _parse_lines(data):
+    events = []
+    for line in data.splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            # A line still being written by another process
+            continue
+    return events
+
+
+class EventStore:
+    def __init__(self, directory, max_segment_bytes=16 * 1024 * 1024, max_segment_seconds=3600.0,
+                 block_records=256, compress=True):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.block_records = block_records
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset_writer()
+        if os.path.isdir(directory):
+            # Make what crashed writers left behind queryable right away
+            self._recover_stale()
+        atexit.register(self.close)
+
+    def _reset_writer(self):
+        self._file = None
+        self._path = None
+        self._created = None
+        self._created_ms = None
+        self._size = 0
+        self._blocks = []
+        self._block = None
+        self._age_timer = None
+
+    # Writing
+
+    def _ensure_writer(self):
+        # A forked child must not append to its parent's segment
+        if self._pid != os.getpid():
+            self._reset_writer()
+            self._pid = os.getpid()
+            os.makedirs(self.directory, exist_ok=True)
+            self._recover_stale()
+
+    def _recover_stale(self):
+        """
+        Closes active segments left behind by processes that are gone, and
+        finishes recoveries that such a process had started (.recover-<pid>).
+        """
+        segments = self.segments()
+        for segment in segments:
+            if segment.closed or segment.path in _writing:
+                continue
+            if segment.pid != os.getpid() and _pid_alive(segment.pid):
+                continue
+            self._recover(segment.path, segment.path, segment.created_ms, segment.pid)
+
+        closed = {(segment.created_ms, segment.pid) for segment in segments if segment.closed}
+        for name in sorted(os.listdir(self.directory)):
+            match = _RECOVER_RE.match(name)
+            if not match:
+                continue
+            created_ms, pid, recoverer = int(match.group(2)), int(match.group(3)), int(match.group(4))
+            if recoverer != os.getpid() and _pid_alive(recoverer):
+                continue
+            path = os.path.join(self.directory, name)
+            if match.group(5):
+                # An index whose segment was handled above (or was already
+                # removed after closing): nothing left to recover
+                if not os.path.exists(path[:-len(".idx")]):
+                    _remove_if_exists(path)
+            elif (created_ms, pid) in closed:
+                # Interrupted after the closed segment was written
+                _remove_if_exists(path)
+                _remove_if_exists(path + ".idx")
+            else:
+                original = os.path.join(self.directory, match.group(1))
+                self._recover(path, original, created_ms, pid)
+
+    def _recover(self, path, original, created_ms, pid):
+        # Claim it first: another worker may be recovering it too
+        claimed = original + f".recover-{os.getpid()}"
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            return
+        if os.path.exists(path + ".idx"):
+            os.replace(path + ".idx", claimed + ".idx")
+        blocks = Segment(claimed, created_ms, pid).read_index()
+        with open(claimed, "rb") as f:
+            covered = blocks[-1]["offset"] + blocks[-1]["length"] if blocks else 0
+            f.seek(covered)
+            tail = f.read()
+        # Index the unindexed tail (dropping a torn last line) as one more block
+        complete = tail[:tail.rfind(b"\n") + 1]
+        events = _parse_lines(complete)
+        if events:
+            blocks.append(self._describe_block(events, covered, len(complete)))
+        self._close_segment(claimed, created_ms, pid, blocks)
+        print(f"Event store: recovered segment {os.path.basename(original)} ({len(blocks)} blocks)")
+
+    @staticmethod
+    def _describe_block(events, offset, length):
+        kinds = {}
+        for event in events:
+            kind = event.get("kind")
+            kinds[kind] = kinds.get(kind, 0) + 1
+        ts = [event["ts"] for event in events]
+        return {"min_ts": min(ts), "max_ts": max(ts), "offset": offset, "length": length,
+                "count": len(events), "kinds": kinds}
+
+    def append(self, event):
+        self.append_many([event])
+
+    def append_many(self, events):
+        """
+        Appends events (dicts; "ts" defaults to now, "kind" to "event").
+        """
+        with self._lock:
+            self._ensure_writer()
+            now = time.time()
+            for event in events:
+                event = dict(event)
+                event.setdefault("ts", now)
+                event.setdefault("kind", "event")
+                data = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+
+                if self._file is not None and (self._size + len(data) > self.max_segment_bytes
+                                               or now - self._created >= self.max_segment_seconds):
+                    self._rotate()
+                if self._file is None:
+                    self._open_segment(now)
+
+                self._file.write(data)
+                block = self._block
+                if block is None:
+                    block = self._block = {"min_ts": event["ts"], "max_ts": event["ts"], "offset": self._size,
+                                           "length": 0, "count": 0, "kinds": {}}
+                block["min_ts"] = min(block["min_ts"], event["ts"])
+                block["max_ts"] = max(block["max_ts"], event["ts"])
+                block["length"] += len(data)
+                block["count"] += 1
+                block["kinds"][event["kind"]] = block["kinds"].get(event["kind"], 0) + 1
+                self._size += len(data)
+                if block["count"] >= self.block_records:
+                    self._finish_block()
+            if self._file is not None:
+                self._file.flush()
+
+    def _open_segment(self, now):
+        self._created = now
+        self._created_ms = _next_created_ms(now)
+        name = f"{SEGMENT_PREFIX}{self._created_ms}-{os.getpid()}.jsonl"
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, "ab")
+        _writing.add(self._path)
+        self._size = self._file.tell()
+        self._blocks = []
+        self._block = None
+        self._schedule_age_rotation(now)
+
+    def _schedule_age_rotation(self, now):
+        # An idle process must not keep an old segment open (unindexed,
+        # uncompressed) until its next append
+        if not math.isfinite(self.max_segment_seconds):
+            return
+        delay = max(0.0, self._created + self.max_segment_seconds - now)
+        self._age_timer = threading.Timer(delay, self._on_age_timer, (self._path,))
+        self._age_timer.daemon = True
+        self._age_timer.start()
+
+    def _on_age_timer(self, path):
+        with self._lock:
+            if self._path != path or self._pid != os.getpid():
+                return
+            now = time.time()
+            if not self._rotate_if_old(now):
+                self._schedule_age_rotation(now)
+
+    def _rotate_if_old(self, now):
+        if self._file is not None and now - self._created >= self.max_segment_seconds:
+            self._rotate()
+            return True
+        return False
+
+    def _finish_block(self):
+        # The segment data must reach the file before the index points at it
+        self._file.flush()
+        with open(self._path + ".idx", "a") as f:
+            f.write(json.dumps(self._block, separators=(",", ":")) + "\n")
+        self._blocks.append(self._block)
+        self._block = None
+
+    def _rotate(self):
+        if self._age_timer is not None:
+            self._age_timer.cancel()
+        if self._block is not None:
+            self._finish_block()
+        self._file.close()
+        self._close_segment(self._path, self._created_ms, os.getpid(), self._blocks)
+        _writing.discard(self._path)
+        self._reset_writer()
+
+    def _close_segment(self, path, created_ms, pid, blocks):
+        """
+        Writes the closed (compressed, time-ranged) form of a segment and
+        removes the active files.
+        """
+        if not blocks:
+            for leftover in (path, path + ".idx"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            return
+
+        min_ts = min(b["min_ts"] for b in blocks)
+        max_ts = max(b["max_ts"] for b in blocks)
+        name = f"{SEGMENT_PREFIX}{_ms(min_ts)}-{_ms(max_ts)}-{created_ms}-{pid}.jsonl"
+        if self.compress:
+            name += ".gz"
+        target = os.path.join(self.directory, name)
+
+        closed_blocks = []
+        with open(path, "rb") as src, open(target + ".tmp", "wb") as dst:
+            for block in blocks:
+                src.seek(block["offset"])
+                data = src.read(block["length"])
+                if self.compress:
+                    # One gzip member per block, so each can be read on its own
+                    data = gzip.compress(data)
+                closed_blocks.append(dict(block, offset=dst.tell(), length=len(data)))
+                dst.write(data)
+        with open(target + ".idx.tmp", "w") as f:
+            f.writelines(json.dumps(b, separators=(",", ":")) + "\n" for b in closed_blocks)
+        # Index first: a reader that sees the closed file can always use it
+        os.replace(target + ".idx.tmp", target + ".idx")
+        os.replace(target + ".tmp", target)
+        os.remove(path)
+        if os.path.exists(path + ".idx"):
+            os.remove(path + ".idx")
+
+    def close(self):
+        """
+        Closes (and compresses) this process's active segment.
+        """
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._rotate()
+
+    # Reading
+
+    def segments(self):
+        """
+        Segment files in the store, closed ones before active ones, each group by start time.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        closed, active = {}, {}
+        for name in names:
+            path = os.path.join(self.directory, name)
+            match = _CLOSED_RE.match(name)
+            if match:
+                min_ms, max_ms, created_ms, pid = (int(g) for g in match.groups()[:4])
+                closed[(created_ms, pid)] = Segment(path, created_ms, pid, min_ms / 1000.0,
+                                                    max_ms / 1000.0, compressed=bool(match.group(5)))
+                continue
+            match = _ACTIVE_RE.match(name)
+            if match:
+                created_ms, pid = int(match.group(1)), int(match.group(2))
+                active[(created_ms, pid)] = Segment(path, created_ms, pid)
+        # Mid-rotation both forms can exist; the closed one is complete
+        for key in closed:
+            active.pop(key, None)
+        return (sorted(closed.values(), key=lambda s: (s.min_ts, s.created_ms))
+                + sorted(active.values(), key=lambda s: s.created_ms))
+
+    def _candidates(self, start, end):
+        # Closed segments are pruned by name (ms bounds, truncated: widen by
+        # 1 ms); the few active ones are pruned per block
+        for segment in self.segments():
+            if not segment.closed or _overlaps(segment.min_ts, segment.max_ts + 0.001, start, end):
+                yield segment
+
+    def _segment_events(self, segment, start, end, kind):
+        blocks = segment.read_index()
+        try:
+            f = open(segment.path, "rb")
+        except FileNotFoundError:
+            # Closed (renamed) between listing and opening
+            return
+        with f:
+            for block in blocks:
+                if not _overlaps(block["min_ts"], block["max_ts"], start, end):
+                    continue
+                if kind is not None and not block["kinds"].get(kind):
+                    continue
+                for event in _parse_lines(segment.read_block(f, block)):
+                    if _in_range(event.get("ts", 0), start, end) and (kind is None or event.get("kind") == kind):
+                        yield event
+            if not segment.closed:
+                for event in segment.tail(f, blocks):
+                    if _in_range(event.get("ts", 0), start, end) and (kind is None or event.get("kind") == kind):
+                        yield event
+
+    def query(self, start=None, end=None, kind=None, limit=None):
+        """
+        Events with start <= ts < end (epoch seconds; None = unbounded),
+        optionally of one kind, in ts order. Lazily reads only the segments
+        and blocks that overlap the range.
+        """
+        self._flush()
+        streams = [self._segment_events(segment, start, end, kind) for segment in self._candidates(start, end)]
+        merged = heapq.merge(*streams, key=lambda event: event.get("ts", 0))
+        for n, event in enumerate(merged):
+            if limit is not None and n >= limit:
+                return
+            yield event
+
+    def count(self, start=None, end=None, kind=None):
+        """
+        Number of matching events. Blocks that lie entirely inside the range
+        are counted from the index without being read.
+        """
+        self._flush()
+        total = 0
+        for segment in self._candidates(start, end):
+            blocks = segment.read_index()
+            partial = []
+            for block in blocks:
+                if not _overlaps(block["min_ts"], block["max_ts"], start, end):
+                    continue
+                if _in_range(block["min_ts"], start, end) and _in_range(block["max_ts"], start, end):
+                    total += block["count"] if kind is None else block["kinds"].get(kind, 0)
+                elif kind is None or block["kinds"].get(kind):
+                    partial.append(block)
+            if not partial and segment.closed:
+                continue
+            try:
+                f = open(segment.path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                events = [e for block in partial for e in _parse_lines(segment.read_block(f, block))]
+                if not segment.closed:
+                    events.extend(segment.tail(f, blocks))
+            total += sum(1 for e in events
+                         if _in_range(e.get("ts", 0), start, end) and (kind is None or e.get("kind") == kind))
+        return total
+
+    def _flush(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid() and not self._rotate_if_old(time.time()):
+                self._file.flush()
+
+    def stats(self):
+        segments = self.segments()
+        size = 0
+        for segment in segments:
+            try:
+                size += os.path.getsize(segment.path)
+            except OSError:
+                pass
+        return {
+            "segments": len(segments),
+            "active_segments": sum(1 for s in segments if not s.closed),
+            "bytes": size
+        }
+
+
+def event_store_from_env():
+    """
+    EventStore configured by SPROUT_EVENT_DIR (default data/events),
+    SPROUT_EVENT_SEGMENT_MB (default 16) and SPROUT_EVENT_SEGMENT_SECONDS
+    (default 3600).
+    """
+    return EventStore(
+        os.environ.get("SPROUT_EVENT_DIR", DEFAULT_EVENT_DIR),
+        max_segment_bytes=int(float(os.environ.get("SPROUT_EVENT_SEGMENT_MB", "16")) * 1024 * 1024),
+        max_segment_seconds=float(os.environ.get("SPROUT_EVENT_SEGMENT_SECONDS", "3600"))
+    )
@@ -1,87 +1,74 @@
+import argparse
+import hashlib
 import json
 import os
+import re
+import shutil
+import sqlite3
+import time
+from contextlib import closing
 # Disable ChromaDB Telemetry
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 os.environ["CHROMA_ANONYMIZED_TELEMETRY"] = "False"
 import chromadb
-from chromadb.utils import embedding_functions
 from chromadb.config import Settings
+from embeddings import LEGACY_BACKEND, canonical_spec, get_embedder
+from knowledge_base import load_knowledge_base
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'symptoms.json')
 REMEDIES_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'remedies.json')
 DB_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'chroma_db')
+# In-process vector index (see vector_index.NumpyVectorIndex)
+EMBEDDINGS_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'condition_embeddings.npy')
+INDEX_TABLE_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'condition_index.json')
 
-def ingest_data():
-    print("Loading data...")
-    conditions = []
-    
-    # 1. Load Original Dataset
-    try:
-        with open(DATA_PATH, 'r') as f:
-            data = json.load(f)
-            raw_conditions = data.get("disease_symptoms", {})
-            
-            # Load Validation/Remedy Map if available to cross-reference
-            remedy_map = {}
-            try:
-                with open(REMEDIES_PATH, 'r') as rf:
-                    rdata = json.load(rf)
-                    remedy_map = rdata.get("disease_remedies", {})
-                    additional = rdata.get("additional_conditions", [])
-            except FileNotFoundError:
-                additional = []
-
-            # Process Original Diseases
-            if raw_conditions:
-                 for name, symptoms in raw_conditions.items():
-                     # Fix name keys being capitalized or not matching perfectly
-                     name_clean = name.lower().strip()
-                     remedies = remedy_map.get(name_clean, ["Consult a doctor"])
-                     
-                     conditions.append({
-                         "name": name, 
-                         "symptoms": symptoms,
-                         "remedies": remedies,
-                         "severity": "Unknown"
-                     })
-            
-            # 2. Add Additional Conditions (Nose Bleed, etc.)
-            for item in additional:
-                conditions.append(item)
-                
-    except FileNotFoundError:
-        print(f"Error: Data file not found at {DATA_PATH}")
-        return
-        print(f"Error: Data file not found at {DATA_PATH}")
-        return
+def export_numpy_index(embeddings, ids, metadatas, kb_content_hash=None, embedding_backend=None):
+    """
+    Writes the embeddings as one contiguous float32 matrix plus a row -> condition
+    table, so NumpyVectorIndex can memory-map them instead of going through Chroma.
+    """
+    import numpy as np
 
-    print(f"Initializing ChromaDB at {DB_PATH}...")
-    client = chromadb.PersistentClient(path=DB_PATH, settings=Settings(anonymized_telemetry=False))
-    
-    # Use a standard embedding model
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-    
-    # Create or get collection
-    collection_name = "health_conditions"
-    try:
-        client.delete_collection(name=collection_name) # Clear existing for fresh ingest
-        print(f"Deleted existing collection '{collection_name}'")
-    except ValueError:
-        pass
-        
-    collection = client.create_collection(
-        name=collection_name, 
-        embedding_function=sentence_transformer_ef
-    )
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
 
-    documents = []
-    metadatas = []
-    ids = []
+    tmp_path = EMBEDDINGS_PATH + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_path, EMBEDDINGS_PATH)
 
-    print(f"Processing {len(conditions)} conditions...")
-    for idx, condition in enumerate(conditions):
+    tmp_path = INDEX_TABLE_PATH + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            "kb_content_hash": kb_content_hash,
+            "embedding_backend": embedding_backend,
+            "ids": ids,
+            "metadatas": metadatas
+        }, f)
+    os.replace(tmp_path, INDEX_TABLE_PATH)
+
+    print(f"Exported {matrix.shape[0]}x{matrix.shape[1]} embedding matrix to {EMBEDDINGS_PATH}")
+
+COLLECTION_NAME = "health_conditions"
+# Chroma stores each HNSW segment in a directory named after its UUID
+SEGMENT_DIR_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+def condition_id(name):
+    """Stable vector-store ID derived from the condition name."""
+    return "cond_" + hashlib.sha1(name.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def build_records(conditions):
+    """
+    Returns {id: (document, metadata)} for every condition. The metadata
+    carries a hash of the embedded document and of the full record, so a
+    later run can tell what changed without re-embedding anything.
+    """
+    records = {}
+    for condition in conditions:
         # We want to match based on symptoms, but retrieve the condition info.
         # So the 'document' we embed is the list of symptoms joined together.
         symptoms_text = ", ".join(condition["symptoms"])
@@ -93,20 +80,131 @@ def ingest_data():
             "severity": condition["severity"],
             "symptoms_list": symptoms_text
         }
-        
-        documents.append(symptoms_text)
-        metadatas.append(meta)
-        ids.append(f"condition_{idx}")
-
-    if documents:
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-        print("Success! Data ingested into Vector DB.")
-    else:
-        print("No data found to ingest.")
+        meta["document_hash"] = _hash(symptoms_text)
+        meta["content_hash"] = _hash(meta)
+        records[condition_id(condition["name"])] = (symptoms_text, meta)
+    return records
+
+def cleanup_orphaned_segments(db_path):
+    """
+    Removes segment directories under db_path that Chroma's catalog
+    (chroma.sqlite3) no longer references, e.g. left behind by deleted
+    collections. Run it while no other process is writing to the store.
+    """
+    sqlite_path = os.path.join(db_path, "chroma.sqlite3")
+    if not os.path.exists(sqlite_path):
+        return []
+
+    with closing(sqlite3.connect(sqlite_path)) as conn:
+        live = {row[0] for row in conn.execute("SELECT id FROM segments")}
+
+    removed = []
+    for entry in os.listdir(db_path):
+        path = os.path.join(db_path, entry)
+        if os.path.isdir(path) and SEGMENT_DIR_PATTERN.match(entry) and entry not in live:
+            shutil.rmtree(path)
+            removed.append(entry)
+    return removed
+
+def ingest_data(batch_size=64, rebuild=False, cleanup=True, backend=None):
+    """
+    Incrementally syncs the knowledge base into the vector store: only new
+    conditions and conditions whose symptoms changed are embedded (in batches
+    of batch_size); remedy/severity-only changes update metadata in place;
+    conditions no longer in the knowledge base are deleted.
+    backend is an embedding spec (default: SPROUT_EMBEDDING_BACKEND); it is
+    recorded in the collection and the NumPy table, and switching it
+    re-embeds everything.
+    """
+    backend = canonical_spec(backend)
+    started = time.perf_counter()
+    print("Loading data...")
+    try:
+        kb = load_knowledge_base(DATA_PATH, REMEDIES_PATH)
+    except FileNotFoundError:
+        print(f"Error: Data file not found at {DATA_PATH}")
+        return
+    records = build_records(kb.conditions)
+
+    print(f"Initializing ChromaDB at {DB_PATH}...")
+    client = chromadb.PersistentClient(path=DB_PATH, settings=Settings(anonymized_telemetry=False))
+
+    if rebuild:
+        try:
+            client.delete_collection(name=COLLECTION_NAME) # Clear existing for fresh ingest
+            print(f"Deleted existing collection '{COLLECTION_NAME}'")
+        except ValueError:
+            pass
+
+    # Embeddings are always computed here and passed explicitly, so the
+    # collection does not need (or load) its own embedding function.
+    collection = client.get_or_create_collection(name=COLLECTION_NAME, embedding_function=None)
+
+    # Vectors from different backends are not comparable (or even the same size)
+    stored_backend = (collection.metadata or {}).get("embedding_backend")
+    if collection.count() and (stored_backend or LEGACY_BACKEND) != backend:
+        print(f"Embedding backend changed ({stored_backend or LEGACY_BACKEND} -> {backend}); re-embedding everything")
+        client.delete_collection(name=COLLECTION_NAME)
+        collection = client.get_or_create_collection(name=COLLECTION_NAME, embedding_function=None)
+        stored_backend = None
+
+    existing = collection.get(include=["metadatas"])
+    stored = {id_: meta or {} for id_, meta in zip(existing["ids"], existing["metadatas"])}
+
+    to_embed = [id_ for id_, (_, meta) in records.items()
+                if stored.get(id_, {}).get("document_hash") != meta["document_hash"]]
+    embed_set = set(to_embed)
+    to_update = [id_ for id_, (_, meta) in records.items()
+                 if id_ not in embed_set and stored[id_].get("content_hash") != meta["content_hash"]]
+    to_delete = [id_ for id_ in stored if id_ not in records]
+
+    print(f"{len(records)} conditions: {len(to_embed)} to embed, {len(to_update)} metadata updates, "
+          f"{len(to_delete)} to delete, {len(records) - len(to_embed) - len(to_update)} unchanged")
+
+    if to_embed:
+        # The embedding model is only loaded when something changed
+        embedder = get_embedder(backend)
+        for start in range(0, len(to_embed), batch_size):
+            batch = to_embed[start:start + batch_size]
+            documents = [records[id_][0] for id_ in batch]
+            collection.upsert(
+                ids=batch,
+                documents=documents,
+                embeddings=embedder(documents),
+                metadatas=[records[id_][1] for id_ in batch]
+            )
+            print(f"Embedded {min(start + batch_size, len(to_embed))}/{len(to_embed)}")
+
+    if to_update:
+        collection.update(ids=to_update, metadatas=[records[id_][1] for id_ in to_update])
+
+    if to_delete:
+        collection.delete(ids=to_delete)
+
+    changed = bool(to_embed or to_update or to_delete) or stored_backend != backend
+    if changed:
+        collection.modify(metadata={"kb_content_hash": kb.content_hash, "embedding_backend": backend})
+
+    if changed or not os.path.exists(EMBEDDINGS_PATH):
+        synced = collection.get(include=["embeddings", "metadatas"])
+        if synced["ids"]:
+            export_numpy_index(synced["embeddings"], synced["ids"], synced["metadatas"],
+                               kb.content_hash, embedding_backend=backend)
+
+    if cleanup:
+        removed = cleanup_orphaned_segments(DB_PATH)
+        if removed:
+            print(f"Removed {len(removed)} orphaned segment directories")
+
+    print(f"Success! Vector DB in sync ({time.perf_counter() - started:.3f}s).")
 
 if __name__ == "__main__":
-    ingest_data()
+    parser = argparse.ArgumentParser(description="Sync the knowledge base into the vector store.")
+    parser.add_argument('--batch-size', type=int, default=64, help="Documents embedded per batch.")
+    parser.add_argument('--rebuild', action='store_true', help="Drop the collection and re-embed everything.")
+    parser.add_argument('--no-cleanup', action='store_true', help="Keep orphaned segment directories.")
+    parser.add_argument('--backend', help="Embedding backend spec, e.g. minilm or hashed-ngram "
+                                          "(default: SPROUT_EMBEDDING_BACKEND or minilm).")
+    args = parser.parse_args()
+    ingest_data(batch_size=args.batch_size, rebuild=args.rebuild, cleanup=not args.no_cleanup,
+                backend=args.backend)
@@ -0,0 +1,517 @@
+"""
+Knowledge-base compiler.
+
+symptoms.json and remedies.json stay the editable source of truth. This
+module merges and normalizes them once into a KnowledgeBase, and caches the
+result as a versioned binary snapshot (data/kb_snapshot.pkl) that every
+component (SymptomAnalyzer, EmergencyDetector, train_model, ingest_data)
+loads in one read. The snapshot records a hash of the source files, so it is
+recompiled automatically whenever they change, and a content hash of the
+compiled data that caches and model artifacts use as a version key.
+
+Usage:
+    python src/knowledge_base.py    # (re)compile the snapshot
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+from array import array
+
+from matcher import PhraseMatcher
+from normalizer import SymptomCanonicalizer
+
+# Bump when the snapshot payload layout changes
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_NAME = "kb_snapshot.pkl"
+
+DEFAULT_REMEDIES = ["Consult a doctor."]
+DEFAULT_EMERGENCY_SYMPTOMS = [
+    "chest pain", "difficulty breathing", "heart attack",
+    "severe fever", "unconsciousness", "severe bleeding",
+    "sudden severe headache"
+]
+DEFAULT_EXPLANATION = "Natural aid for symptom relief."
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class SymptomVocabulary:
+    """
+    Normalized (lower-cased, whitespace-collapsed) symptom and emergency
+    phrases, each stored once per process and addressed by integer ID.
+    """
+    __slots__ = ("phrases", "_ids")
+
+    def __init__(self):
+        self.phrases = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def __getitem__(self, symptom_id):
+        return self.phrases[symptom_id]
+
+    def add(self, phrase):
+        symptom_id = self._ids.get(phrase)
+        if symptom_id is None:
+            symptom_id = self._ids[phrase] = len(self.phrases)
+            self.phrases.append(sys.intern(phrase))
+        return symptom_id
+
+    def id_of(self, phrase):
+        return self._ids.get(phrase)
+
+
+class ConditionTable:
+    """
+    Column store for the compiled conditions: parallel lists of names,
+    severities and remedy tuples (identical remedy lists share one tuple),
+    and every condition's symptom IDs in one flat array delimited by an
+    offsets array. A condition costs a few pointers plus 4 bytes per
+    symptom, with no per-condition containers. Indexing and iteration yield
+    lightweight Condition views.
+    """
+    __slots__ = ("vocabulary", "names", "severities", "remedies", "symptom_ids", "offsets")
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.names = []
+        self.severities = []
+        self.remedies = []
+        self.symptom_ids = array("I")
+        self.offsets = array("I", [0])
+
+    def append(self, name, symptom_ids, remedies, severity):
+        self.names.append(name)
+        self.severities.append(severity)
+        self.remedies.append(remedies)
+        self.symptom_ids.extend(symptom_ids)
+        self.offsets.append(len(self.symptom_ids))
+
+    def symptom_ids_of(self, idx):
+        return self.symptom_ids[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [Condition(self, i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("condition index out of range")
+        return Condition(self, idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield Condition(self, idx)
+
+
+class Condition:
+    """
+    View of one row of a ConditionTable. Read-only mapping access
+    (condition["symptoms"], .get()) is kept for code written against the
+    former dict records.
+    """
+    __slots__ = ("table", "index")
+
+    FIELDS = ("name", "symptoms", "remedies", "severity")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def name(self):
+        return self.table.names[self.index]
+
+    @property
+    def severity(self):
+        return self.table.severities[self.index]
+
+    @property
+    def remedies(self):
+        return self.table.remedies[self.index]
+
+    @property
+    def symptom_ids(self):
+        return self.table.symptom_ids_of(self.index)
+
+    @property
+    def symptoms(self):
+        phrases = self.table.vocabulary.phrases
+        return tuple(phrases[i] for i in self.symptom_ids)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __repr__(self):
+        return f"Condition({self.name!r})"
+
+
+class KnowledgeBase:
+    """
+    Merged, normalized view of the knowledge base.
+    conditions: ConditionTable (a sequence of Condition views)
+    vocabulary: SymptomVocabulary shared by the conditions and emergency phrases
+    emergency_symptoms: lower-cased emergency phrases (vocabulary strings)
+    symptom_map: normalized symptom -> condition name (from symptoms.json)
+    explanations: explanation corpus, remedy name -> text, in priority order
+    remedy_explanations: every knowledge-base remedy name (with and without
+        its " (...)" suffix) -> resolved explanation
+    content_hash: sha256 of the compiled content (stable version key)
+    canonicalizer: SymptomCanonicalizer over the vocabulary and symptom_map
+        keys, compiled on first use (not part of the snapshot)
+    """
+    def __init__(self, conditions, emergency_symptoms, symptom_map, content_hash,
+                 explanations=None, remedy_explanations=None, vocabulary=None):
+        self.conditions = conditions
+        self.vocabulary = vocabulary if vocabulary is not None else SymptomVocabulary()
+        self.emergency_symptoms = emergency_symptoms
+        self.symptom_map = symptom_map
+        self.content_hash = content_hash
+        self.explanations = explanations or {}
+        self.remedy_explanations = remedy_explanations or {}
+        self._canonicalizer = None
+
+    @property
+    def version(self):
+        return self.content_hash[:12]
+
+    @property
+    def canonicalizer(self):
+        # Shared by every component using this knowledge base; a concurrent
+        # first use may compile it twice, which is harmless
+        if self._canonicalizer is None:
+            self._canonicalizer = SymptomCanonicalizer.from_knowledge_base(self)
+        return self._canonicalizer
+
+    def to_payload(self):
+        return {
+            "conditions": self.conditions,
+            "emergency_symptoms": self.emergency_symptoms,
+            "symptom_map": self.symptom_map,
+            "content_hash": self.content_hash,
+            "explanations": self.explanations,
+            "remedy_explanations": self.remedy_explanations,
+            "vocabulary": self.vocabulary
+        }
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(payload["conditions"], payload["emergency_symptoms"],
+                   payload["symptom_map"], payload["content_hash"],
+                   payload["explanations"], payload["remedy_explanations"],
+                   payload["vocabulary"])
+
+
+class ExplanationIndex:
+    """
+    Explanation lookup over a corpus: exact name first, otherwise the
+    first-listed corpus key contained in the name, otherwise a default.
+    The partial match is one Aho-Corasick scan of the name, not a scan of
+    the corpus.
+    """
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self._rank = {key: rank for rank, key in enumerate(corpus)}
+        self._matcher = PhraseMatcher(list(corpus))
+
+    def resolve(self, remedy_name):
+        explanation = self.corpus.get(remedy_name)
+        if explanation is not None:
+            return explanation
+        found = self._matcher.find_all(remedy_name)
+        if found:
+            return self.corpus[min(found, key=self._rank.__getitem__)]
+        return DEFAULT_EXPLANATION
+
+
+def remedies_path_for(data_path):
+    return os.path.join(os.path.dirname(os.path.dirname(data_path)), 'data', 'remedies.json')
+
+
+def snapshot_path_for(data_path):
+    return os.path.join(os.path.dirname(data_path), SNAPSHOT_NAME)
+
+
+def _normalize_text(text):
+    # Strip and collapse runs of whitespace ("dischromic  patches")
+    return sys.intern(" ".join(str(text).split()))
+
+
+def _dedupe(items):
+    return list(dict.fromkeys(items))
+
+
+def _remedy_name(entry, attached):
+    """
+    Remedy entries are plain strings or {"name", "explanation"} objects;
+    explanations found on the latter are collected into attached.
+    """
+    if isinstance(entry, dict):
+        name = sys.intern(str(entry["name"]).strip())
+        if entry.get("explanation"):
+            attached.setdefault(name, entry["explanation"])
+        return name
+    return sys.intern(str(entry).strip())
+
+
+def _normalize_condition(name, symptoms, remedies, severity, attached):
+    return {
+        "name": sys.intern(str(name).strip()),
+        "symptoms": _dedupe(s for s in (_normalize_text(str(s).lower()) for s in symptoms) if s),
+        "remedies": _dedupe(_remedy_name(r, attached) for r in remedies),
+        "severity": sys.intern(str(severity))
+    }
+
+
+def _resolve_explanations(conditions, corpus, attached):
+    """
+    Resolves the explanation of every remedy ahead of time, under both its
+    full name and its name without the " (...)" details, which is how the
+    web app looks it up.
+    """
+    index = ExplanationIndex(corpus)
+    resolved = {}
+    for condition in conditions:
+        for remedy in condition["remedies"]:
+            for name in (remedy, remedy.split(" (")[0]):
+                if name not in resolved:
+                    resolved[name] = attached.get(name) or attached.get(remedy) or index.resolve(name)
+    return resolved
+
+
+def _emergency_phrases(data):
+    emergency = _dedupe(_normalize_text(str(s).lower()) for s in data.get("emergency_symptoms", []))
+    emergency = [s for s in emergency if s]
+    if not emergency:
+        # Fallback if empty (new json structure might miss this)
+        emergency = [sys.intern(s) for s in DEFAULT_EMERGENCY_SYMPTOMS]
+    return emergency
+
+
+def load_emergency_symptoms(data_path):
+    """
+    The emergency phrases of data_path (symptoms.json) alone, normalized as
+    in the knowledge base: the emergency screen must not depend on
+    remedies.json or on the rest of the knowledge base compiling.
+    Raises FileNotFoundError / json.JSONDecodeError for a bad data_path.
+    """
+    with open(data_path, "rb") as f:
+        return _emergency_phrases(json.loads(f.read()))
+
+
+def compile_knowledge_base(data, remedies_data):
+    """
+    Merges parsed symptoms.json / remedies.json content into a KnowledgeBase.
+    """
+    remedy_map = remedies_data.get("disease_remedies", {})
+    conditions = []
+    seen_names = set()
+    attached = {}
+
+    def add(condition):
+        # First definition of a condition name wins
+        key = condition["name"].lower()
+        if key not in seen_names:
+            seen_names.add(key)
+            conditions.append(condition)
+
+    raw_conditions = data.get("disease_symptoms", {})
+    if raw_conditions:
+        for name, symptoms in raw_conditions.items():
+            add(_normalize_condition(
+                name, symptoms,
+                remedy_map.get(name.lower().strip(), DEFAULT_REMEDIES),
+                "Unknown", attached
+            ))
+    else:
+        for item in data.get("conditions", []):
+            add(_normalize_condition(item["name"], item.get("symptoms", []),
+                                     item.get("remedies", []), item.get("severity", "Unknown"), attached))
+
+    # Additional Conditions (Nose Bleed, etc.)
+    for item in remedies_data.get("additional_conditions", []):
+        if not isinstance(item, dict) or not item.get("name"):
+            print(f"Warning: skipping additional condition without a name in remedies.json: {item!r}")
+            continue
+        add(_normalize_condition(item["name"], item.get("symptoms", []),
+                                 item.get("remedies", []), item.get("severity", "Unknown"), attached))
+
+    emergency = _emergency_phrases(data)
+
+    symptom_map = {}
+    for symptom, name in data.get("symptom_map", {}).items():
+        symptom = _normalize_text(symptom.lower())
+        if symptom:
+            symptom_map.setdefault(symptom, sys.intern(str(name).strip()))
+
+    # Explanation corpus: the shared dictionary first, then explanations
+    # attached directly to remedy entries
+    explanations = {sys.intern(k.strip()): v for k, v in remedies_data.get("remedy_explanations", {}).items()}
+    for name, explanation in attached.items():
+        explanations.setdefault(name, explanation)
+    remedy_explanations = _resolve_explanations(conditions, explanations, attached)
+
+    content = {"conditions": conditions, "emergency_symptoms": emergency, "symptom_map": symptom_map,
+               "explanations": explanations, "attached_explanations": attached}
+    content_hash = hashlib.sha256(
+        json.dumps(content, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    vocabulary = SymptomVocabulary()
+    records = _build_records(conditions, vocabulary)
+    emergency = [vocabulary[vocabulary.add(s)] for s in emergency]
+    return KnowledgeBase(records, emergency, symptom_map, content_hash,
+                         explanations, remedy_explanations, vocabulary)
+
+
+def _build_records(conditions, vocabulary):
+    remedy_lists = {}
+    table = ConditionTable(vocabulary)
+    for condition in conditions:
+        remedies = tuple(condition["remedies"])
+        table.append(
+            condition["name"],
+            [vocabulary.add(s) for s in condition["symptoms"]],
+            remedy_lists.setdefault(remedies, remedies),
+            condition["severity"]
+        )
+    return table
+
+
+def _read_sources(data_path, remedies_path):
+    with open(data_path, "rb") as f:
+        data_bytes = f.read()
+    try:
+        with open(remedies_path, "rb") as f:
+            remedies_bytes = f.read()
+    except FileNotFoundError:
+        remedies_bytes = b""
+    source_hash = hashlib.sha256(data_bytes + b"\0" + remedies_bytes).hexdigest()
+    return data_bytes, remedies_bytes, source_hash
+
+
+def _parse_remedies(remedies_bytes, remedies_path):
+    """
+    remedies.json is optional: a missing or unreadable file only costs the
+    remedies and additional conditions, never the symptoms data.
+    """
+    if not remedies_bytes:
+        return {}
+    try:
+        remedies_data = json.loads(remedies_bytes)
+    except ValueError as e:
+        print(f"Warning: ignoring {remedies_path}: invalid JSON ({e})")
+        return {}
+    if not isinstance(remedies_data, dict):
+        print(f"Warning: ignoring {remedies_path}: expected a JSON object")
+        return {}
+    return remedies_data
+
+
+def _source_stats(*paths):
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stats.append(None)
+    return tuple(stats)
+
+
+def _read_snapshot(snapshot_path):
+    try:
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, ImportError):
+        # Unreadable, truncated, or pickled against moved/renamed classes: recompile
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return snapshot
+
+
+def write_snapshot(kb, snapshot_path, source_hash, source_stats):
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "source_hash": source_hash,
+        "source_stats": source_stats,
+        "kb": kb.to_payload()
+    }
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def _load_uncached(data_path, remedies_path, snapshot_path, stats, use_snapshot):
+    snapshot = _read_snapshot(snapshot_path) if use_snapshot else None
+
+    # Fast path: source files untouched since the snapshot was written
+    if snapshot is not None and snapshot.get("source_stats") == stats:
+        return KnowledgeBase.from_payload(snapshot["kb"])
+
+    data_bytes, remedies_bytes, source_hash = _read_sources(data_path, remedies_path)
+    if snapshot is not None and snapshot.get("source_hash") == source_hash:
+        kb = KnowledgeBase.from_payload(snapshot["kb"])
+    else:
+        data = json.loads(data_bytes)
+        kb = compile_knowledge_base(data, _parse_remedies(remedies_bytes, remedies_path))
+
+    if use_snapshot:
+        try:
+            write_snapshot(kb, snapshot_path, source_hash, stats)
+        except OSError as e:
+            # Read-only deployments still work, they just compile at startup
+            print(f"Warning: could not write KB snapshot {snapshot_path}: {e}")
+    return kb
+
+
+def load_knowledge_base(data_path, remedies_path=None, use_snapshot=True):
+    """
+    Returns the compiled KnowledgeBase for data_path (symptoms.json) and its
+    sibling remedies.json. Loads the binary snapshot when it is up to date,
+    otherwise compiles from JSON and refreshes the snapshot. Within a process
+    the result is shared, so every component sees the same objects.
+    Raises FileNotFoundError / json.JSONDecodeError for a bad data_path.
+    """
+    data_path = os.path.abspath(data_path)
+    remedies_path = os.path.abspath(remedies_path or remedies_path_for(data_path))
+    snapshot_path = snapshot_path_for(data_path)
+    stats = _source_stats(data_path, remedies_path)
+    if stats[0] is None:
+        raise FileNotFoundError(data_path)
+
+    key = (data_path, remedies_path, use_snapshot)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == stats:
+            return cached[1]
+
+        kb = _load_uncached(data_path, remedies_path, snapshot_path, stats, use_snapshot)
+        _cache[key] = (stats, kb)
+        return kb
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(base_dir, 'data', 'symptoms.json')
+    snapshot = snapshot_path_for(path)
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    kb = load_knowledge_base(path)
+    print(f"Compiled {len(kb.conditions)} conditions, {len(kb.emergency_symptoms)} emergency phrases "
+          f"into {snapshot} (content hash {kb.content_hash})")
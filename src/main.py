@@ -1,5 +1,29 @@
+"""
+Sprout AI command line.
+
+Interactive (one query from a prompt):
+    python src/main.py
+
+Batch: reads JSONL records ({"symptoms": "fever, cough", "profile": {...}},
+optionally with an "id") from a file or stdin and streams one JSONL result
+per record to stdout, in input order:
+    python src/main.py --batch triage.jsonl --workers 8 > results.jsonl
+    zcat triage.jsonl.gz | python src/main.py --batch - > results.jsonl
+
+Each result has the /analyze response shape plus "line" (1-based input line)
+and the record's "id". Emergencies are reported in the output but not sent
+to the notification sinks (SPROUT_NOTIFY_SINKS) as /analyze does. Records are
+processed in chunks by a process pool whose workers load the models once;
+at most --max-pending chunks are in flight, so memory stays flat whatever
+the input size. Throughput is reported on stderr.
+"""
+import argparse
+import json
 import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Add src to path so imports work if run from project root
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -7,9 +31,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from diagnosis import SymptomAnalyzer
 from emergency import EmergencyDetector
 from remedies import RemedyRecommender
+from responses import canonical_symptoms, diagnosis_response, emergency_body
 
 DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'symptoms.json')
 
+# Seconds between progress lines on stderr in batch mode
+PROGRESS_INTERVAL = 10.0
+
 def main():
     print("==================================================")
     print("   Sprout AI - Intelligent Health Assistance")
@@ -27,7 +55,8 @@ def main():
     # Initialize modules
     emergency_detector = EmergencyDetector(DATA_PATH)
     analyzer = SymptomAnalyzer(DATA_PATH)
-    remedy_recommender = RemedyRecommender()
+    remedy_recommender = RemedyRecommender(DATA_PATH)
+    symptoms = analyzer.canonicalizer.canonicalize(symptoms) or symptoms
     
     # 1. Check for Emergency
     emergencies = emergency_detector.check_emergency(symptoms)
@@ -63,5 +92,180 @@ def main():
     print("DISCLAIMER: Sprout AI is a support tool and DOES NOT replace professional medical advice.")
     print("==================================================")
 
+# Components of a batch worker process, loaded once by _init_worker
+_worker = {}
+
+def _init_worker(data_path):
+    # The components print debug lines; stdout carries the results
+    sys.stdout = sys.stderr
+    _worker["emergency_detector"] = EmergencyDetector(data_path)
+    _worker["analyzer"] = SymptomAnalyzer(data_path)
+    _worker["remedy_recommender"] = RemedyRecommender(data_path)
+
+def _parse_record(line, canonicalizer):
+    """
+    Returns (record, symptoms, profile, error); error is None for a valid record.
+    "symptoms" is a comma-separated string (as for /analyze) or a list; the
+    returned symptoms are canonicalized.
+    """
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return {}, None, None, f"Invalid JSON: {e}"
+    if not isinstance(record, dict):
+        return {}, None, None, "Expected a JSON object"
+
+    user_input = record.get('symptoms', '')
+    if isinstance(user_input, list):
+        user_input = ', '.join(str(s) for s in user_input)
+    if not isinstance(user_input, str) or not user_input.strip():
+        return record, None, None, "No symptoms provided"
+    profile = record.get('profile') or {}
+    if not isinstance(profile, dict):
+        return record, None, None, "Expected profile to be a JSON object"
+    symptoms = canonical_symptoms(user_input, canonicalizer)
+    if not symptoms:
+        return record, None, None, "No symptoms provided"
+    return record, symptoms, profile, None
+
+def process_chunk(chunk):
+    """
+    Runs one chunk of (line number, raw line) pairs through the pipeline, like
+    /analyze/batch: emergency screening per record, then one batched
+    diagnose_many() call. Returns the encoded result lines and counts.
+    """
+    detector = _worker["emergency_detector"]
+    recommender = _worker["remedy_recommender"]
+    canonicalizer = _worker["analyzer"].canonicalizer
+
+    results = []
+    to_diagnose = []
+    for line_number, line in chunk:
+        record, symptoms, profile, error = _parse_record(line, canonicalizer)
+        result = {'line': line_number}
+        if 'id' in record:
+            result['id'] = record['id']
+        results.append(result)
+
+        if error:
+            result['error'] = error
+            continue
+        emergencies = detector.check_emergency(symptoms)
+        if emergencies:
+            result.update(emergency_body(emergencies))
+        else:
+            to_diagnose.append((result, symptoms, profile))
+
+    if to_diagnose:
+        batch_predictions = _worker["analyzer"].diagnose_many(
+            [symptoms for _, symptoms, _ in to_diagnose],
+            [profile for _, _, profile in to_diagnose]
+        )
+        for (result, _, profile), predictions in zip(to_diagnose, batch_predictions):
+            result.update(diagnosis_response(predictions, profile, recommender))
+
+    counts = {
+        'records': len(results),
+        'errors': sum(1 for r in results if 'error' in r),
+        'emergencies': sum(1 for r in results if r.get('status') == 'emergency')
+    }
+    return [json.dumps(r) + "\n" for r in results], counts
+
+def read_chunks(stream, chunk_size):
+    """
+    Yields lists of up to chunk_size (line number, line) pairs, skipping blank lines.
+    """
+    chunk = []
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        chunk.append((line_number, line))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_batch(stream, out, workers, chunk_size, max_pending, data_path=DATA_PATH):
+    """
+    Streams results to out in input order and returns the totals.
+    A chunk's results are written once it and every chunk before it are
+    done; no new chunk is submitted while max_pending are in flight.
+    """
+    totals = {'records': 0, 'errors': 0, 'emergencies': 0}
+    started = time.perf_counter()
+    next_report = started + PROGRESS_INTERVAL
+
+    def write(result):
+        nonlocal next_report
+        lines, counts = result
+        out.writelines(lines)
+        for key, value in counts.items():
+            totals[key] += value
+        now = time.perf_counter()
+        if now >= next_report:
+            next_report = now + PROGRESS_INTERVAL
+            elapsed = now - started
+            print(f"{totals['records']} records in {elapsed:.1f}s ({totals['records'] / elapsed:.0f} records/s)",
+                  file=sys.stderr)
+
+    if workers <= 1:
+        # In-process, e.g. for debugging or tiny inputs
+        stdout = sys.stdout
+        try:
+            _init_worker(data_path)
+            for chunk in read_chunks(stream, chunk_size):
+                write(process_chunk(chunk))
+        finally:
+            sys.stdout = stdout
+    else:
+        # Avoid tokenizer thread pools that do not survive fork()
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(data_path,)) as pool:
+            pending = deque()
+            for chunk in read_chunks(stream, chunk_size):
+                if len(pending) >= max_pending:
+                    write(pending.popleft().result())
+                pending.append(pool.submit(process_chunk, chunk))
+            while pending:
+                write(pending.popleft().result())
+
+    out.flush()
+    totals['seconds'] = round(time.perf_counter() - started, 3)
+    totals['records_per_second'] = round(totals['records'] / totals['seconds'], 1) if totals['seconds'] else None
+    return totals
+
+def batch_main(args):
+    stream = sys.stdin if args.batch == '-' else open(args.batch, 'r', encoding='utf-8')
+    max_pending = args.max_pending or 2 * args.workers
+    try:
+        totals = run_batch(stream, sys.stdout, args.workers, args.chunk_size, max_pending)
+    except BrokenPipeError:
+        # Output closed early (e.g. piped into head): stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.__stdout__.fileno())
+        sys.exit(1)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(f"Done: {totals['records']} records ({totals['errors']} errors, {totals['emergencies']} emergencies) "
+          f"in {totals['seconds']}s, {totals['records_per_second']} records/s with {args.workers} worker(s)",
+          file=sys.stderr)
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Sprout AI command line (interactive or JSONL batch).")
+    parser.add_argument('--batch', metavar='PATH',
+                        help="JSONL input file ('-' for stdin); results are written to stdout as JSONL. "
+                             "Emergencies are flagged in the results (status \"emergency\") but, unlike "
+                             "/analyze, not sent to the notification sinks.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes, each loading the models once (1 = in-process).")
+    parser.add_argument('--chunk-size', type=int, default=256, help="Records per task sent to a worker.")
+    parser.add_argument('--max-pending', type=int, default=0,
+                        help="Chunks in flight at once (default: 2 per worker); bounds memory.")
+    args = parser.parse_args()
+
+    if args.batch:
+        batch_main(args)
+    else:
+        main()
@@ -0,0 +1,77 @@
+from collections import deque
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a fixed list of phrases.
+    The automaton is compiled once; find_all() then scans a text in a single
+    pass, in time linear in the text length (plus the number of matches),
+    regardless of how many phrases were compiled in.
+    """
+    def __init__(self, phrases):
+        self.phrases = []
+        self._goto = [{}]   # state -> {char: next_state}
+        self._fail = [0]    # state -> longest proper suffix state
+        self._out = [()]    # state -> indices of phrases ending here
+
+        seen = set()
+        for phrase in phrases:
+            # Empty phrases would match every input; skip them.
+            if not phrase or phrase in seen:
+                continue
+            seen.add(phrase)
+            self._add(phrase)
+
+        self._build()
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _add(self, phrase):
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] = self._out[state] + (len(self.phrases),)
+        self.phrases.append(phrase)
+
+    def _build(self):
+        # Breadth-first so every fail target is finalized before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target
+
+                # Inherit matches from the suffix state
+                if self._out[target]:
+                    self._out[next_state] = self._out[next_state] + self._out[target]
+
+    def find_all(self, text):
+        """
+        Returns the distinct phrases that occur as substrings of text,
+        in order of first occurrence.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        found = {}
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for idx in out[state]:
+                if idx not in found:
+                    found[idx] = self.phrases[idx]
+        return list(found.values())
@@ -0,0 +1,226 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Instrumentation is disabled unless SPROUT_METRICS=1; while disabled, timed()
+returns a shared no-op context manager and the record_* helpers return
+immediately, so instrumented code pays only a function call.
+Metrics are per process (under serve.py, per worker).
+"""
+import bisect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("SPROUT_METRICS", "0").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds, from 50us (rule matching) up to seconds (cold model calls)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose value is read from a callback at scrape time. With
+    metric_type="counter" it exposes a monotonic count kept elsewhere.
+    """
+    def __init__(self, name, help_text, callback, metric_type="gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}",
+                f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, callback):
+        return self._register(Gauge(name, help_text, callback))
+
+    def counter_callback(self, name, help_text, callback):
+        return self._register(Gauge(name, help_text, callback, metric_type="counter"))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "sprout_stage_duration_seconds",
+    "Time spent in each stage of the /analyze pipeline.",
+    ["stage"]
+)
+TIER_HITS = registry.counter(
+    "sprout_diagnosis_tier_total",
+    "Diagnoses answered by each tier (none = no condition found).",
+    ["tier"]
+)
+FALLBACKS = registry.counter(
+    "sprout_diagnosis_fallback_total",
+    "Times a tier could not answer and diagnosis fell through to the next one.",
+    ["tier", "reason"]
+)
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def timed(stage):
+    """Context manager recording the duration of a pipeline stage."""
+    if not METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _StageTimer(stage)
+
+
+def record_tier(tier, count=1):
+    if METRICS_ENABLED and count:
+        TIER_HITS.inc(tier, amount=count)
+
+
+def record_fallback(tier, reason, count=1):
+    if METRICS_ENABLED and count:
+        FALLBACKS.inc(tier, reason, amount=count)
+
+
+def register_notification_metrics(get_dispatcher):
+    """
+    Exposes the counters of the NotificationDispatcher returned by
+    get_dispatcher() (read at scrape time, so it can be replaced).
+    """
+    def stat(key):
+        return lambda: get_dispatcher().stats()[key]
+
+    registry.gauge("sprout_notifications_queued", "Notifications waiting in the dispatcher queue.",
+                   stat("queued"))
+    registry.counter_callback("sprout_notifications_delivered_total",
+                              "Notifications handed to the sinks.", stat("delivered"))
+    registry.counter_callback("sprout_notifications_dropped_total",
+                              "Notifications dropped because the queue stayed full.", stat("dropped"))
+    registry.counter_callback("sprout_notifications_spilled_total",
+                              "Critical notifications written to the fallback sink because the queue was full.",
+                              stat("spilled"))
+    registry.counter_callback("sprout_notification_sink_errors_total",
+                              "Failed sink writes (including the fallback sink).", stat("sink_errors"))
+
+
+def render():
+    return registry.render()
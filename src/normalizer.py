@@ -0,0 +1,237 @@
+"""
+Symptom canonicalizer.
+
+Maps each user-entered symptom to one canonical spelling, once per request
+before the emergency screen and the diagnosis tiers, so that "Skin  Rsh",
+"skin rash." and "skin_rash" all reach every tier (and the response
+cache) as "skin rash". The dictionary is the knowledge base's symptom
+vocabulary (condition and emergency phrases) plus the symptom_map keys of
+symptoms.json, which add common synonyms such as "fever" or "loose motion".
+
+Per symptom, in order:
+1. normalize: lower-case, "_" as a space, whitespace collapsed, surrounding
+   punctuation stripped
+2. exact: a dictionary phrase, or a whole-word part of one ("chest"), is kept
+3. prefix: a truncated last word ("abdominal pa") is completed when exactly
+   one dictionary phrase starts with it and only that word is missing
+   (trie walk)
+4. typo: otherwise the closest dictionary entry within MAX_EDIT_DISTANCE
+   edits, when there is exactly one (SymSpell: the deletes of every entry
+   are indexed up front, so a lookup only generates the deletes of the
+   input)
+A completion or correction is only taken when it still contains every
+dictionary phrase the input contained and no emergency phrase the input
+did not: a guess must never trigger (or hide) an emergency, so "ches" and
+"chest pian" stay as typed. Anything else is kept as normalized: the
+tiers still match it by substring.
+"""
+import re
+import sys
+
+from matcher import PhraseMatcher
+
+# Largest edit distance indexed; lookups use _max_distance(len(text))
+MAX_EDIT_DISTANCE = 2
+# Deletes are generated from this many leading characters only (as in
+# SymSpell), which bounds the index size without losing candidates
+PREFIX_LENGTH = 7
+# Shortest input that is completed from a unique prefix
+MIN_COMPLETION_LENGTH = 4
+
+# Column headers of the source dataset that ended up as symptom_map keys
+_HEADER_KEY = re.compile(r"^(symptom|precaution) \d+$")
+_STRIP_CHARS = " .,;:!?\"'"
+
+_AMBIGUOUS = -2
+
+
+def normalize_symptom(text):
+    text = " ".join(str(text).lower().replace("_", " ").split())
+    return text.strip(_STRIP_CHARS)
+
+
+def _max_distance(length):
+    if length < 5:
+        return 0
+    if length < 10:
+        return 1
+    return MAX_EDIT_DISTANCE
+
+
+def _deletes(word, max_distance):
+    """
+    Every string obtained by deleting up to max_distance characters of word.
+    """
+    found = {word}
+    frontier = [word]
+    for _ in range(max_distance):
+        next_frontier = []
+        for item in frontier:
+            for i in range(len(item)):
+                deleted = item[:i] + item[i + 1:]
+                if deleted not in found:
+                    found.add(deleted)
+                    next_frontier.append(deleted)
+        frontier = next_frontier
+    return found
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions
+    and adjacent transpositions), or max_distance + 1 once it is exceeded.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class SymptomCanonicalizer:
+    """
+    Compiled symptom dictionary: a character trie over the phrases (exact
+    and unique-prefix lookups), the whole-word parts of every phrase, and a
+    SymSpell deletion index over both for typo correction. Completions and
+    corrections never add one of emergency_phrases.
+    """
+    def __init__(self, phrases, emergency_phrases=()):
+        self.phrases = []
+        self._children = [{}]     # trie node -> {char: child node}
+        self._completion = [-1]   # node -> index of the only phrase below it, or _AMBIGUOUS
+        self._terminal = [False]  # node -> a phrase ends here
+        self._known = set()       # phrases and their whole-word parts
+
+        for phrase in phrases:
+            phrase = normalize_symptom(phrase)
+            if phrase and phrase not in self:
+                self._add(phrase)
+            for part in self._word_parts(phrase):
+                self._known.add(sys.intern(part))
+
+        self._matcher = PhraseMatcher(self.phrases)
+        self._emergency_matcher = PhraseMatcher([normalize_symptom(p) for p in emergency_phrases])
+        self._targets = sorted(self._known)
+        self._deletes = {}
+        for target_id, target in enumerate(self._targets):
+            for deleted in _deletes(target[:PREFIX_LENGTH], MAX_EDIT_DISTANCE):
+                self._deletes.setdefault(deleted, []).append(target_id)
+
+    @classmethod
+    def from_knowledge_base(cls, kb):
+        keys = [key for key in kb.symptom_map if not _HEADER_KEY.match(key)]
+        return cls(list(kb.vocabulary.phrases) + keys, kb.emergency_symptoms)
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def __contains__(self, phrase):
+        node = self._node(phrase)
+        return node is not None and self._terminal[node]
+
+    @staticmethod
+    def _word_parts(phrase):
+        words = phrase.split(" ")
+        for start in range(len(words)):
+            for end in range(start + 1, len(words) + 1):
+                yield " ".join(words[start:end])
+
+    def _add(self, phrase):
+        phrase_id = len(self.phrases)
+        self.phrases.append(sys.intern(phrase))
+        node = 0
+        for char in phrase:
+            child = self._children[node].get(char)
+            if child is None:
+                child = self._children[node][char] = len(self._children)
+                self._children.append({})
+                self._completion.append(phrase_id)
+                self._terminal.append(False)
+            elif self._completion[child] != phrase_id:
+                self._completion[child] = _AMBIGUOUS
+            node = child
+        self._terminal[node] = True
+
+    def _node(self, text):
+        node = 0
+        for char in text:
+            node = self._children[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def complete(self, prefix):
+        """
+        The only dictionary phrase starting with prefix, or None.
+        """
+        node = self._node(prefix)
+        if node is None or node == 0:
+            return None
+        completion = self._completion[node]
+        return self.phrases[completion] if completion >= 0 else None
+
+    def correct(self, text):
+        """
+        The dictionary entry closest to text within its edit-distance budget,
+        or None if there is none or several are equally close.
+        """
+        max_distance = _max_distance(len(text))
+        if not max_distance:
+            return None
+        best, best_distance = None, max_distance + 1
+        seen = set()
+        for deleted in _deletes(text[:PREFIX_LENGTH], max_distance):
+            for target_id in self._deletes.get(deleted, ()):
+                if target_id in seen:
+                    continue
+                seen.add(target_id)
+                target = self._targets[target_id]
+                distance = edit_distance(text, target, max_distance)
+                if distance < best_distance:
+                    best, best_distance = target, distance
+                elif distance == best_distance and distance <= max_distance:
+                    best = None
+        return best
+
+    def _accepts(self, text, candidate):
+        """
+        A completion or correction may add dictionary matches ("hig fever" ->
+        "high fever" keeps "fever") but never lose one, and never add an
+        emergency phrase.
+        """
+        if not all(p in candidate for p in self._matcher.find_all(text)):
+            return False
+        typed = set(self._emergency_matcher.find_all(text))
+        return all(p in typed for p in self._emergency_matcher.find_all(candidate))
+
+    def canonical(self, symptom):
+        text = normalize_symptom(symptom)
+        if not text or text in self._known:
+            return text
+        if len(text) >= MIN_COMPLETION_LENGTH:
+            completed = self.complete(text)
+            # Only the word being typed is completed
+            if completed is not None and " " not in completed[len(text):]:
+                return completed if self._accepts(text, completed) else text
+        corrected = self.correct(text)
+        if corrected is None or not self._accepts(text, corrected):
+            return text
+        return corrected
+
+    def canonicalize(self, symptoms):
+        """
+        Canonical form of a symptom list: each entry canonicalized, empty
+        entries and repeats dropped, first-seen order kept.
+        """
+        return list(dict.fromkeys(s for s in (self.canonical(s) for s in symptoms) if s))
@@ -1,19 +1,291 @@
+import atexit
 import datetime
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from email.message import EmailMessage
+
+
+class ConsoleSink:
+    """Prints notifications to stdout (the original mock behaviour)."""
+    def write_batch(self, entries):
+        for entry in entries:
+            print(f"📧 SENDING NOTIFICATION: {entry['message']}")
+
+
+class FileSink:
+    """Appends formatted log lines to a file, one open/write per batch."""
+    def __init__(self, path="emergency_logs.txt"):
+        self.path = path
+
+    def write_batch(self, entries):
+        with open(self.path, "a") as f:
+            f.write("".join(entry["log_entry"] + "\n" for entry in entries))
+
+
+class EventStoreSink:
+    """
+    Appends notifications as structured events to an event_store.EventStore
+    (everything but the preformatted log line).
+    """
+    def __init__(self, store):
+        self.store = store
+
+    def write_batch(self, entries):
+        self.store.append_many({k: v for k, v in entry.items() if k != "log_entry"} for entry in entries)
+
+
+class SMTPSink:
+    """
+    Sends one digest email per batch. Defaults to a local SMTP stand-in,
+    e.g. `python -m aiosmtpd -n -l localhost:1025`.
+    """
+    def __init__(self, host="localhost", port=1025, sender="sprout@localhost", recipients=("oncall@localhost",), timeout=5):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.timeout = timeout
+
+    def write_batch(self, entries):
+        msg = EmailMessage()
+        msg["Subject"] = f"[Sprout AI] {len(entries)} notification(s)"
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(self.recipients)
+        msg.set_content("\n".join(entry["log_entry"] for entry in entries))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(msg)
+
+
+class WebhookSink:
+    """POSTs each batch as a JSON array to a webhook URL."""
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def write_batch(self, entries):
+        body = json.dumps(entries).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class NotificationDispatcher:
+    """
+    Queue-backed background dispatcher.
+    Request threads only enqueue; a worker thread drains the queue and hands
+    entries to every sink in batches, at most every flush_interval seconds
+    or as soon as batch_size entries are waiting. The queue is bounded: when
+    it is full, enqueue() waits up to put_timeout and then drops the entry,
+    unless it is critical: critical entries are never dropped, they are
+    written synchronously to fallback_sink instead (also after close()).
+    """
+    _STOP = object()
+
+    def __init__(self, sinks, max_queue_size=10000, batch_size=100, flush_interval=0.5, put_timeout=0.05,
+                 fallback_sink=None):
+        self.sinks = list(sinks)
+        self.fallback_sink = fallback_sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.spilled = 0
+        self.delivered = 0
+        self.sink_errors = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        # Counters are updated by request threads and the worker concurrently
+        self._counter_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork(): restart the worker in a forked child
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._thread = threading.Thread(target=self._run, name="sprout-notifier", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def enqueue(self, entry, critical=False):
+        """
+        Returns False if the entry was not queued: dropped because the queue
+        stayed full (or the dispatcher is closed), or, if critical, spilled
+        to the fallback sink.
+        """
+        if not self._closed:
+            self._ensure_worker()
+            try:
+                self._queue.put(entry, timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                pass
+        if critical and self._spill(entry):
+            return False
+        self._count("dropped")
+        return False
+
+    def _count(self, counter, n=1):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def _spill(self, entry):
+        # Runs on the caller's thread; the fallback sink should be local and fast
+        if self.fallback_sink is None:
+            return False
+        try:
+            self.fallback_sink.write_batch([entry])
+        except Exception as e:
+            self._count("sink_errors")
+            print(f"Notification fallback sink {type(self.fallback_sink).__name__} failed: {e}")
+            return False
+        self._count("spilled")
+        return True
+
+    def _run(self):
+        q = self._queue
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = q.get(timeout=max(timeout, 0)) if timeout > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if stopping:
+                # Drain whatever is still queued before exiting
+                while True:
+                    try:
+                        item = q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not self._STOP:
+                        batch.append(item)
+
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        for start in range(0, len(batch), self.batch_size):
+            chunk = batch[start:start + self.batch_size]
+            for sink in self.sinks:
+                try:
+                    sink.write_batch(chunk)
+                except Exception as e:
+                    self._count("sink_errors")
+                    print(f"Notification sink {type(sink).__name__} failed: {e}")
+            self._count("delivered", len(chunk))
+
+    def close(self, timeout=5.0):
+        """Stops accepting entries and drains the queue (called at exit)."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._pid == os.getpid():
+            # Block here if needed: shutdown must not lose queued entries
+            self._queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._counter_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "sink_errors": self.sink_errors
+            }
+
+
+def sinks_from_env(event_store=None):
+    """
+    Builds sinks from SPROUT_NOTIFY_SINKS (comma separated: console, events,
+    file, smtp, webhook). Defaults to console + events. The events sink
+    writes to event_store, or to an EventStore in SPROUT_EVENT_DIR.
+    """
+    names = os.environ.get("SPROUT_NOTIFY_SINKS", "console,events")
+    sinks = []
+    for name in (n.strip().lower() for n in names.split(",")):
+        if name == "console":
+            sinks.append(ConsoleSink())
+        elif name == "events":
+            if event_store is None:
+                from event_store import event_store_from_env
+                event_store = event_store_from_env()
+            sinks.append(EventStoreSink(event_store))
+        elif name == "file":
+            sinks.append(FileSink(os.environ.get("SPROUT_NOTIFY_LOG", "emergency_logs.txt")))
+        elif name == "smtp":
+            sinks.append(SMTPSink(
+                host=os.environ.get("SPROUT_SMTP_HOST", "localhost"),
+                port=int(os.environ.get("SPROUT_SMTP_PORT", "1025"))
+            ))
+        elif name == "webhook":
+            sinks.append(WebhookSink(os.environ["SPROUT_WEBHOOK_URL"]))
+        elif name:
+            raise ValueError(f"Unknown notification sink: {name}")
+    return sinks
+
+
+def fallback_sink_from_env():
+    """
+    Local file that critical notifications are written to when they cannot
+    be queued (SPROUT_NOTIFY_FALLBACK_LOG, default emergency_fallback.log).
+    """
+    return FileSink(os.environ.get("SPROUT_NOTIFY_FALLBACK_LOG", "emergency_fallback.log"))
+
 
 class NotificationManager:
-    def send_notification(self, message, level="info"):
+    def __init__(self, sinks=None, flush_interval=None, fallback_sink=None, **dispatcher_options):
+        if sinks is None:
+            sinks = sinks_from_env()
+        if flush_interval is None:
+            flush_interval = float(os.environ.get("SPROUT_NOTIFY_FLUSH_INTERVAL", "0.5"))
+        if fallback_sink is None:
+            fallback_sink = fallback_sink_from_env()
+        self.dispatcher = NotificationDispatcher(sinks, flush_interval=flush_interval,
+                                                 fallback_sink=fallback_sink, **dispatcher_options)
+
+    def send_notification(self, message, level="info", kind="notification", **fields):
         """
         Mock notification sender.
         In a real app, this would send SMS or Email.
+        Only formats and enqueues; delivery happens on the dispatcher thread.
+        kind and any extra fields are kept as structured data by the events sink.
+        Critical notifications are never dropped (see NotificationDispatcher).
         """
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = time.time()
+        timestamp = datetime.datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] [{level.upper()}] {message}"
-        
-        # Simulate sending
-        print(f"📧 SENDING NOTIFICATION: {message}")
-        
-        # Log to file
-        with open("emergency_logs.txt", "a") as f:
-            f.write(log_entry + "\n")
-            
+
+        entry = dict(fields)
+        entry.update({
+            "ts": now,
+            "kind": kind,
+            "timestamp": timestamp,
+            "level": level,
+            "message": message,
+            "log_entry": log_entry
+        })
+        self.dispatcher.enqueue(entry, critical=(level == "critical"))
         return log_entry
+
+    def close(self):
+        self.dispatcher.close()
@@ -0,0 +1,33 @@
+import os
+
+
+def _read_kb_fields(path, fields):
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[fields[key]] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def memory_usage():
+    """
+    Memory of the current process in KiB (Linux /proc; empty elsewhere).
+    rss counts shared copy-on-write pages in full; pss splits them between
+    the processes sharing them, so summing pss across workers gives the
+    real footprint of a pre-forked server.
+    """
+    usage = {"pid": os.getpid()}
+    usage.update(_read_kb_fields("/proc/self/status", {"VmRSS": "rss_kb", "VmHWM": "peak_rss_kb"}))
+    usage.update(_read_kb_fields("/proc/self/smaps_rollup", {
+        "Pss": "pss_kb",
+        "Shared_Clean": "shared_clean_kb",
+        "Shared_Dirty": "shared_dirty_kb",
+        "Private_Clean": "private_clean_kb",
+        "Private_Dirty": "private_dirty_kb"
+    }))
+    return usage
@@ -0,0 +1,173 @@
+"""
+Zero-downtime reload of the serving components.
+
+The diagnosis tiers, the emergency matcher and the remedy tables are bundled
+in one Components snapshot. A reload builds a complete new snapshot (every
+tier loaded, so there is no cold-start latency after the swap) in a
+background thread while requests keep using the current one, then publishes
+it with a single reference assignment. A request reads `reloader.current`
+once and uses that snapshot throughout, so in-flight requests finish on the
+version they started with; the old snapshot is freed when the last of them
+completes. While a reload is building, both snapshots are resident.
+
+Reloads are triggered with reload() (the /admin/reload endpoint) or by
+polling the data and model files (start_watching()).
+"""
+import datetime
+import threading
+import time
+
+from response_cache import file_fingerprint
+
+
+class Components:
+    """
+    One immutable generation of the serving components.
+    """
+    __slots__ = ("analyzer", "emergency_detector", "remedy_recommender",
+                 "generation", "loaded_at", "load_seconds")
+
+    def __init__(self, analyzer, emergency_detector, remedy_recommender, generation=1, load_seconds=None):
+        self.analyzer = analyzer
+        self.emergency_detector = emergency_detector
+        self.remedy_recommender = remedy_recommender
+        self.generation = generation
+        self.loaded_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+        self.load_seconds = load_seconds
+
+    @property
+    def canonicalizer(self):
+        # Compiled from the same knowledge base as the analyzer
+        return self.analyzer.canonicalizer
+
+    def version(self):
+        return {
+            "generation": self.generation,
+            "kb_version": self.analyzer.kb_version,
+            "embedding_backend": self.analyzer.embedding_backend,
+            "model_sha256": getattr(self.analyzer.ml_model, "model_sha256", None),
+            "loaded_at": self.loaded_at,
+            "load_seconds": None if self.load_seconds is None else round(self.load_seconds, 3)
+        }
+
+
+class HotReloader:
+    """
+    Holds the current Components and replaces them on reload.
+
+    build_fn() returns a fresh (analyzer, emergency_detector,
+    remedy_recommender) triple. A new snapshot is only published if its
+    rule-based tier is ready and no tier that is ready now failed to load;
+    otherwise the current one keeps serving and the error is reported.
+    on_swap(components) runs after each successful swap.
+    """
+    def __init__(self, initial, build_fn, watched_paths=(), watch_interval=0.0, on_swap=None):
+        self.current = initial
+        self.watched_paths = list(watched_paths)
+        self.watch_interval = watch_interval
+        self.on_swap = on_swap
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_reload_at = None
+        self._build_fn = build_fn
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._fingerprint = file_fingerprint(self.watched_paths)
+
+    @property
+    def reloading(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def reload(self, wait=False, reason="manual"):
+        """
+        Starts a background reload, or joins the one already running.
+        Returns its thread; with wait=True, returns once it has finished.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                thread = self._thread = threading.Thread(
+                    target=self._reload, args=(reason,), name="sprout-reload", daemon=True)
+                thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def _rejection(self, analyzer):
+        if analyzer.tier_status["rule_based"] != "ready":
+            return "the knowledge base could not be loaded"
+        for tier, state in analyzer.tier_status.items():
+            if state == "failed" and self.current.analyzer.tier_status.get(tier) == "ready":
+                return f"the {tier} tier failed to load"
+        return None
+
+    def _reload(self, reason):
+        # Taken before building: files changed during the build trigger another reload
+        fingerprint = file_fingerprint(self.watched_paths)
+        started = time.perf_counter()
+        try:
+            analyzer, emergency_detector, remedy_recommender = self._build_fn()
+            rejection = self._rejection(analyzer)
+            if rejection:
+                raise RuntimeError(rejection)
+        except Exception as e:
+            # Not retried until the files change again
+            self._fingerprint = fingerprint
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"Reload ({reason}) failed, still serving generation {self.current.generation}: {e}")
+            return
+
+        components = Components(analyzer, emergency_detector, remedy_recommender,
+                                generation=self.current.generation + 1,
+                                load_seconds=time.perf_counter() - started)
+        # The swap: requests that already hold the old snapshot keep it
+        self.current = components
+        self._fingerprint = fingerprint
+        self.reloads += 1
+        self.last_error = None
+        self.last_reload_at = components.loaded_at
+        if self.on_swap:
+            self.on_swap(components)
+        print(f"Reloaded ({reason}) in {components.load_seconds:.2f}s: generation {components.generation}, "
+              f"knowledge base {analyzer.kb_version}")
+
+    def start_watching(self):
+        """
+        Polls the watched files every watch_interval seconds (0 disables)
+        and reloads once they have changed and then stayed unchanged for
+        one more interval, so a multi-file update lands in a single reload.
+        Threads do not survive fork(): call again in each forked worker.
+        """
+        if self.watch_interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return None
+        self._watcher = threading.Thread(target=self._watch, name="sprout-reload-watch", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.watch_interval)
+            fingerprint = file_fingerprint(self.watched_paths)
+            if fingerprint == self._fingerprint:
+                pending = None
+            elif fingerprint != pending:
+                pending = fingerprint
+            else:
+                pending = None
+                self.reload(wait=True, reason="files changed")
+
+    def status(self):
+        return {
+            "version": self.current.version(),
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_reload_at": self.last_reload_at,
+            "watch_interval": self.watch_interval if self._watcher is not None and self._watcher.is_alive() else 0
+        }
@@ -1,4 +1,115 @@
+import json
+import os
+import re
+
+from knowledge_base import ExplanationIndex, load_knowledge_base
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DEFAULT_DATA_PATH = os.path.join(DATA_DIR, 'symptoms.json')
+DEFAULT_RULES_PATH = os.path.join(DATA_DIR, 'personalization_rules.json')
+
+
 class RemedyRecommender:
+    # Cap on memoized results for remedies that were not precomputed
+    MAX_EXTRA_ENTRIES = 10000
+
+    def __init__(self, data_path=DEFAULT_DATA_PATH, rules_path=None):
+        """
+        Compiles the age/body-type ruleset (data/personalization_rules.json) and
+        precomputes the personalized form of every remedy in the knowledge base
+        for every (age band, body type) segment, so personalization on the
+        request path is a dictionary lookup per remedy.
+        """
+        if rules_path is None:
+            # Prefer a ruleset shipped next to the knowledge base
+            rules_path = os.path.join(os.path.dirname(data_path), 'personalization_rules.json')
+            if not os.path.exists(rules_path):
+                rules_path = DEFAULT_RULES_PATH
+        self.rules_path = rules_path
+        # Safety rules must not silently disappear: a missing file is an error
+        with open(rules_path, 'r') as f:
+            self._compile_rules(json.load(f))
+
+        self._table = {}
+        self._explanations = {}
+        explanation_corpus = {}
+        try:
+            kb = load_knowledge_base(data_path)
+            for condition in kb.conditions:
+                for remedy in condition.get("remedies", []):
+                    for segment in self.segments:
+                        self._table[(remedy,) + segment] = self._apply_rules(remedy, *segment)
+            self._explanations = dict(kb.remedy_explanations)
+            explanation_corpus = kb.explanations
+        except Exception as e:
+            print(f"Error loading remedies: {e}")
+        self._table_limit = len(self._table) + self.MAX_EXTRA_ENTRIES
+        self._explanation_index = ExplanationIndex(explanation_corpus)
+        self._explanations_limit = len(self._explanations) + self.MAX_EXTRA_ENTRIES
+
+    def _compile_rules(self, ruleset):
+        self.default_age = ruleset.get("default_age", 25)
+        self.default_body_type = ruleset.get("default_body_type", "neutral")
+        self.age_bands = [(band["name"], band.get("below")) for band in ruleset["age_bands"]]
+        self.body_types = frozenset(ruleset.get("body_types", []))
+
+        # One regex per rule: a single scan per remedy instead of one "in" per keyword
+        self.rules = []
+        for rule in ruleset["rules"]:
+            pattern = re.compile("|".join(re.escape(k.lower()) for k in rule["keywords"]))
+            self.rules.append((rule["class"], frozenset(rule["segments"]), pattern,
+                               rule.get("warning"), rule.get("remove", False)))
+
+        self.segments = [(band, body)
+                         for band, _ in self.age_bands
+                         for body in sorted(self.body_types) + [self.default_body_type]]
+
+    def segment(self, profile):
+        """
+        Maps a user profile to its (age band, body type) segment.
+        """
+        profile = profile or {}
+        body_type = str(profile.get("body_type") or self.default_body_type).lower()
+        if body_type not in self.body_types:
+            body_type = self.default_body_type
+
+        age = profile.get("age")
+        try:
+            age = int(age)
+        except (ValueError, TypeError):
+            age = self.default_age # Default to adult if unknown
+
+        for band, below in self.age_bands:
+            if below is None or age < below:
+                return band, body_type
+        return self.age_bands[-1][0], body_type
+
+    def personalization_key(self, profile):
+        """
+        Everything get_remedies_for_condition's output depends on besides
+        the remedies: the segment, or () when no profile is supplied (the
+        remedies are then not personalized at all, which differs from the
+        default segment's rules). Used in response cache keys.
+        """
+        return self.segment(profile) if profile else ()
+
+    def _apply_rules(self, remedy, age_band, body_type):
+        """
+        Returns the remedy with its warning, or None if it is unsafe for the segment.
+        Rules run in file order; a later warning replaces an earlier one.
+        """
+        remedy_lower = remedy.lower()
+        warning = None
+        for rule_class, segments, pattern, rule_warning, remove in self.rules:
+            segment_value = age_band if rule_class == "age" else body_type
+            if segment_value not in segments or not pattern.search(remedy_lower):
+                continue
+            if remove:
+                return None
+            if rule_warning:
+                warning = rule_warning
+        return remedy + warning if warning else remedy
+
     def get_remedies_for_condition(self, condition_data, user_profile=None):
         """
         Extracts and formats remedies for a given condition, filtering by user profile.
@@ -13,81 +124,33 @@ class RemedyRecommender:
         return remedies
 
     def _personalize_remedies(self, remedies, profile):
-        body_type = profile.get("body_type", "neutral").lower()
-        age = profile.get("age")
-        
-        try:
-            age = int(age)
-        except (ValueError, TypeError):
-            age = 25 # Default to adult if unknown
+        age_band, body_type = self.segment(profile)
+        table = self._table
 
         filtered_remedies = []
-        
         for remedy in remedies:
-            remedy_lower = remedy.lower()
-            warning = None
-            is_unsafe = False
-            
-            # 1. AGE-BASED FILTERING (Pediatric/Geriatric Safety)
-            if age < 12: # Child
-                if any(x in remedy_lower for x in ["aspirin", "intense exercise", "steam inhalation", "essential oil"]):
-                    warning = " (Consult Pediatrician first)"
-                if "honey" in remedy_lower and age < 1:
-                    is_unsafe = True # Botulism risk for infants
-            
-            elif age > 65: # Senior
-                if any(x in remedy_lower for x in ["strenuous", "heavy lifting", "nsaids"]):
-                    warning = " (Use caution or consult doctor)"
-
-            # 2. BODY TYPE (Ayurvedic/Constitution)
-            # Heat Body Rules (Avoid heating elements)
-            if body_type == "heat":
-                if any(x in remedy_lower for x in ["ginger", "pepper", "spicy", "hot", "garlic", "sauna"]):
-                    warning = " (Caution: May increase body heat)"
-            
-            # Cold Body Rules (Avoid cooling elements)
-            if body_type == "cold":
-                if any(x in remedy_lower for x in ["cold", "mint", "cucumber", "ice", "raw salad"]):
-                    warning = " (Caution: May be too cooling)"
-
-            if not is_unsafe:
-                if warning:
-                    filtered_remedies.append(remedy + warning)
-                else:
-                    filtered_remedies.append(remedy)
+            key = (remedy, age_band, body_type)
+            try:
+                personalized = table[key]
+            except KeyError:
+                # Remedy outside the precomputed knowledge base
+                personalized = self._apply_rules(remedy, age_band, body_type)
+                if len(table) < self._table_limit:
+                    table[key] = personalized
+            if personalized is not None:
+                filtered_remedies.append(personalized)
                 
         return filtered_remedies
 
     def explain_remedy(self, remedy_name):
         """
-        Placeholder for future logic to explain why a remedy works.
+        Explains why a remedy works. Explanations are resolved per remedy when
+        the knowledge base is compiled (see knowledge_base.py), so this is a
+        single dictionary hit; unknown names are resolved once and memoized.
         """
-        # In a real system, this would query a knowledge base of mechanism of action.
-        explanations = {
-            "Ginger tea": "Ginger has anti-inflammatory properties and helps soothe the throat.",
-            "Honey and lemon": "Honey coats the throat and lemon provides Vitamin C.",
-            "Steam inhalation": "Helps clear nasal congestion.",
-            "Rest": "Allows the body to focus energy on fighting the infection.",
-            "Hydration": "Essential for bodily functions and recovery.",
-            "Hydration with electrolytes": "Replenishes essential minerals lost due to dehydration.",
-            "Brat diet": "Bland foods (Banana, Rice, Apple, Toast) that are easy on the stomach.",
-            "Probiotics": "Restores healthy gut bacteria to aid digestion.",
-            "Aloe vera gel": "Soothes inflammation and provides a cooling effect for skin.",
-            "Cool bath": "Helps lower body temperature and soothe skin irritation.",
-            "Lean forward (do NOT tilt head back)": "Prevents blood from flowing down the throat.",
-            "Pinch the soft part of the nose": "Applies pressure to stop bleeding vessels.",
-            "Ice pack": "Constricts blood vessels to reduce swelling or bleeding.",
-            "Look at the horizon": "Helps reorient the brain's balance system.",
-            "Ginger": "Natural anti-nauseant that soothes the stomach.",
-            "Cold compress": "Reduces swelling and numbs pain.",
-            "Coffee": "Caffeine can constrict blood vessels to relieve headache."
-        }
-        # Check for partial matches if exact match fails
-        if remedy_name in explanations:
-            return explanations[remedy_name]
-            
-        for key, value in explanations.items():
-            if key in remedy_name:
-                return value
-                
-        return "Natural aid for symptom relief."
+        explanation = self._explanations.get(remedy_name)
+        if explanation is None:
+            explanation = self._explanation_index.resolve(remedy_name)
+            if len(self._explanations) < self._explanations_limit:
+                self._explanations[remedy_name] = explanation
+        return explanation
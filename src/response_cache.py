@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from cache import LRUCache
+
+
+def _approx_size(entry):
+    """
+    Rough footprint of a cached response: its JSON encoding plus the
+    per-entry container overhead. Good enough for trend/capacity reporting.
+    """
+    return len(json.dumps(entry, separators=(",", ":"))) + sys.getsizeof(entry)
+
+
+def file_fingerprint(paths):
+    """
+    (mtime_ns, size) per path, None for a missing file. Cheap enough to poll.
+    """
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stats.append(None)
+    return tuple(stats)
+
+
+class ResponseCache:
+    """
+    Caches full /analyze responses.
+
+    The key is the normalized symptom list plus the profile segment
+    (age band, body type; empty when no profile was supplied, see
+    RemedyRecommender.personalization_key), which is everything the response depends on
+    besides the knowledge base and model artifacts. Those are covered by a
+    fingerprint of the watched files (mtime/size, re-checked at most every
+    `check_interval` seconds) and a caller-supplied version: when either
+    changes, every entry is dropped.
+
+    Symptom order is part of the key (not a set): the vector and ML tiers
+    embed the joined symptom text, so reordering can change the answer.
+    """
+    def __init__(self, watched_paths, version_fn=None, maxsize=4096, ttl=300.0,
+                 check_interval=2.0):
+        self.watched_paths = list(watched_paths)
+        self.version_fn = version_fn
+        self.check_interval = check_interval
+        self.invalidations = 0
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl, sizeof=_approx_size)
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._fingerprint = self._current_fingerprint()
+
+    @property
+    def enabled(self):
+        return self._cache.maxsize > 0
+
+    @staticmethod
+    def make_key(symptoms, segment, generation=None):
+        # The web app passes canonicalized symptoms (see normalizer.py), so
+        # spelling variants already share a key. Only lowercase/strip here:
+        # normalizing further could merge inputs that screen differently.
+        # generation (of the serving components, see reloader.py) keeps a
+        # response computed by a replaced snapshot from being cached as current.
+        normalized = (s.strip().lower() for s in symptoms)
+        return tuple(s for s in normalized if s), tuple(segment), generation
+
+    def _current_fingerprint(self):
+        version = self.version_fn() if self.version_fn else None
+        return file_fingerprint(self.watched_paths), version
+
+    def _check_fresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            fingerprint = self._current_fingerprint()
+            if fingerprint != self._fingerprint:
+                self._fingerprint = fingerprint
+                self._cache.clear()
+                self.invalidations += 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        self._check_fresh()
+        return self._cache.get(key)
+
+    def put(self, key, response):
+        if self.enabled:
+            self._cache.put(key, response)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["invalidations"] = self.invalidations
+        return stats
@@ -0,0 +1,80 @@
+"""
+/analyze request parsing and response bodies, shared by the web app
+(app.py, asgi.py) and the CLI batch mode (main.py) so they produce
+identical results. No side effects: notifications are the caller's job.
+"""
+from metrics import timed
+
+EMERGENCY_MESSAGE = ('CRITICAL WARNING: High-risk symptoms detected. Seek immediate medical attention. '
+                     'Chat has been disabled for safety.')
+
+
+def parse_request(data):
+    """
+    Validates an /analyze body (or /analyze/batch item). Returns
+    (user_input, profile, error); error is None for a valid body.
+    """
+    if not isinstance(data, dict):
+        return None, None, 'Expected a JSON object'
+    user_input = data.get('symptoms', '')
+    profile = data.get('profile')
+    if profile is None:
+        profile = {}
+    if not user_input:
+        return None, None, 'No symptoms provided'
+    if not isinstance(user_input, str):
+        return None, None, 'Expected symptoms to be a comma-separated string'
+    if not isinstance(profile, dict):
+        return None, None, 'Expected profile to be a JSON object'
+    return user_input, profile, None
+
+
+def parse_symptoms(user_input):
+    return [s.strip() for s in user_input.split(',')]
+
+
+def canonical_symptoms(user_input, canonicalizer):
+    """
+    The parsed symptom list in canonical spelling (see normalizer.py), with
+    empty entries and repeats dropped; may be empty.
+    """
+    with timed("canonicalize"):
+        return canonicalizer.canonicalize(parse_symptoms(user_input))
+
+
+def emergency_body(emergencies):
+    return {
+        'status': 'emergency',
+        'emergencies': emergencies,
+        'message': EMERGENCY_MESSAGE,
+        'lockdown': True
+    }
+
+
+def diagnosis_response(predictions, user_profile, remedy_recommender):
+    if not predictions:
+        return {
+            'status': 'unknown',
+            'message': 'Could not identify a specific condition. Please consult a doctor.'
+        }
+
+    top_prediction = predictions[0]
+    # Pass profile to remedies
+    with timed("remedy_personalization"):
+        remedies = remedy_recommender.get_remedies_for_condition(top_prediction, user_profile)
+    remedy_details = []
+
+    with timed("explanation_lookup"):
+        for remedy in remedies:
+            # Clean remedy name for explanation lookup (remove warnings/details in brackets)
+            # e.g. "Rest (Consult Doctor)" -> "Rest"
+            clean_name = remedy.split(" (")[0]
+            explanation = remedy_recommender.explain_remedy(clean_name)
+            remedy_details.append({'name': remedy, 'explanation': explanation})
+
+    return {
+        'status': 'success',
+        'condition': top_prediction['name'],
+        'severity': top_prediction['severity'],
+        'remedies': remedy_details
+    }
@@ -0,0 +1,139 @@
+"""
+Production entry point for the Sprout AI web app.
+
+Loads the knowledge base, the pickled sklearn pipeline and the embedding
+index once in the gunicorn master, then pre-forks the workers so they share
+those objects copy-on-write instead of each loading its own copy.
+
+Usage:
+    python src/serve.py --workers 4 --threads 4 --bind 0.0.0.0:8000
+
+Send SIGHUP to the master for a graceful restart of the workers, or use
+--max-requests to recycle them periodically. To pick up data or model
+updates without a restart, set SPROUT_RELOAD_WATCH_INTERVAL: every worker
+then rebuilds its components in the background and swaps them in (reloaded
+objects are private to the worker, no longer shared with the master).
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+
+# Add src to path so imports work if run from project root
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from gunicorn.app.base import BaseApplication
+
+from process_stats import memory_usage
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def _log_memory(log, event):
+    usage = memory_usage()
+    log.info(
+        "worker %s %s: rss=%s KiB pss=%s KiB shared=%s KiB private=%s KiB",
+        usage["pid"], event,
+        usage.get("rss_kb", "?"), usage.get("pss_kb", "?"),
+        usage.get("shared_clean_kb", 0) + usage.get("shared_dirty_kb", 0),
+        usage.get("private_clean_kb", 0) + usage.get("private_dirty_kb", 0)
+    )
+
+
+def post_fork(server, worker):
+    # Objects loaded by the master were frozen out of the GC before forking
+    gc.enable()
+    # Threads do not survive fork(): each worker polls for data/model changes
+    # itself (SPROUT_RELOAD_WATCH_INTERVAL)
+    from app import reloader
+    reloader.start_watching()
+
+
+def post_worker_init(worker):
+    _log_memory(worker.log, "ready")
+
+
+def worker_exit(server, worker):
+    _log_memory(server.log, "exiting")
+
+
+class SproutApplication(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set("post_fork", post_fork)
+        self.cfg.set("post_worker_init", post_worker_init)
+        self.cfg.set("worker_exit", worker_exit)
+
+    def load(self):
+        # Everything must be resident before forking: no background warm-up
+        os.environ["SPROUT_STARTUP_MODE"] = "eager"
+        # Reload watchers are started per worker (post_fork), not in the master
+        os.environ["SPROUT_PREFORK"] = "1"
+        # Avoid tokenizer thread pools that do not survive fork()
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+        # Keep the GC from touching (and so un-sharing) the preloaded objects
+        gc.disable()
+        from app import app
+        gc.freeze()
+        return app
+
+
+def check_vector_backend():
+    """
+    Returns an error message if the vector tier would be loaded from
+    ChromaDB. A memory-mapped matrix is fork-safe and shared through the page
+    cache; Chroma's SQLite handles must not be opened in the master and
+    inherited by every worker.
+    """
+    backend = os.environ.setdefault("SPROUT_VECTOR_BACKEND", "numpy").lower()
+    if backend != "numpy":
+        return (f"SPROUT_VECTOR_BACKEND={backend} is not supported by serve.py: the pre-forked workers "
+                f"must share the NumPy vector index (unset it or set it to numpy).")
+    if (not os.path.exists(os.path.join(DATA_DIR, 'condition_embeddings.npy'))
+            and os.path.exists(os.path.join(DATA_DIR, 'chroma_db', 'chroma.sqlite3'))):
+        return ("The NumPy vector index (data/condition_embeddings.npy) has not been exported. "
+                "Run python src/ingest_data.py to build it, then start serve.py again.")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Sprout AI with pre-forked gunicorn workers.")
+    parser.add_argument('--bind', default=os.environ.get("SPROUT_BIND", "0.0.0.0:8000"))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get("SPROUT_WORKERS", multiprocessing.cpu_count())))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get("SPROUT_THREADS", "4")))
+    parser.add_argument('--timeout', type=int, default=30, help="Seconds before a silent worker is killed.")
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help="Seconds workers get to finish in-flight requests on restart/shutdown.")
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help="Recycle a worker after this many requests (0 disables).")
+    parser.add_argument('--max-requests-jitter', type=int, default=0)
+    args = parser.parse_args()
+
+    error = check_vector_backend()
+    if error:
+        sys.exit(f"Error: {error}")
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "preload_app": True,
+        "accesslog": "-"
+    }
+    SproutApplication(options).run()
+
+
+if __name__ == '__main__':
+    main()
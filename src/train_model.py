@@ -1,51 +1,25 @@
+import argparse
+import hashlib
 import json
 import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 import joblib
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 from sklearn.linear_model import SGDClassifier
+from diagnosis import LINEAR_MODEL_FORMAT
+from knowledge_base import load_knowledge_base
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'symptoms.json')
 MODEL_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'symptom_model.pkl')
+MODEL_META_PATH = os.path.join(os.path.dirname(BASE_DIR), 'data', 'symptom_model.meta.json')
 
-def train_model():
-    print("Loading data...")
-    try:
-        # Load main data
-        with open(DATA_PATH, 'r') as f:
-            data = json.load(f)
-            
-        # Load additional data
-        remedies_path = os.path.join(os.path.dirname(BASE_DIR), 'data', 'remedies.json')
-        additional = []
-        try:
-            with open(remedies_path, 'r') as rf:
-                additional = json.load(rf).get("additional_conditions", [])
-        except:
-            pass
-            
-        # Handle new structure
-        raw_conditions = data.get("disease_symptoms", {})
-        conditions = []
-        if raw_conditions:
-                for name, symptoms in raw_conditions.items():
-                    conditions.append({
-                        "name": name, 
-                        "symptoms": symptoms
-                    })
-        else:
-                conditions = data.get("conditions", [])
-        
-        # Merge
-        conditions.extend(additional)
-
-    except FileNotFoundError:
-        print(f"Error: {DATA_PATH} not found.")
-        return
-
+def build_training_set(conditions):
     # Prepare dataset
     # Since we have very few examples, we will "explode" the data a bit 
     # or just use the combined symptoms string as one sample per condition.
@@ -68,11 +42,12 @@ def train_model():
             X.append(symptom)
             y.append(condition["name"])
 
-    print(f"Training on {len(X)} samples...")
+    return X, y
 
+def build_pipeline():
     # Create a wrapper pipeline
     # We use SGDClassifier (SVM) or MultinomialNB. SVM is often good for text text.
-    text_clf = Pipeline([
+    return Pipeline([
         ('vect', CountVectorizer(stop_words='english')),
         ('tfidf', TfidfTransformer()),
         ('clf', SGDClassifier(loss='hinge', penalty='l2',
@@ -80,11 +55,271 @@ def train_model():
                               max_iter=5, tol=None)),
     ])
 
+def linear_model_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".linear.json"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_linear_model(pipeline, path, model_path=None):
+    """
+    Writes a fitted CountVectorizer -> TfidfTransformer -> linear classifier
+    pipeline as plain JSON (vocabulary, stop words, IDF vector, dense weight
+    matrix, intercepts, class labels), so serving can predict with
+    diagnosis.LinearPredictor without importing sklearn.
+    model_path links the export to the pickle it was taken from, so a
+    retrained pickle is never shadowed by a stale export.
+    Returns False for pipelines it cannot represent, e.g. the hashing
+    pipeline of streaming mode.
+    """
+    steps = pipeline.named_steps
+    vect, tfidf, clf = steps.get('vect'), steps.get('tfidf'), steps.get('clf')
+    if (not isinstance(vect, CountVectorizer) or vect.analyzer != 'word'
+            or vect.preprocessor is not None or vect.tokenizer is not None
+            or vect.strip_accents is not None or not hasattr(clf, 'coef_')):
+        return False
+    if tfidf is not None and not isinstance(tfidf, TfidfTransformer):
+        return False
+
+    stop_words = vect.get_stop_words()
+    model = {
+        "format": LINEAR_MODEL_FORMAT,
+        "lowercase": bool(vect.lowercase),
+        "token_pattern": vect.token_pattern,
+        "ngram_range": list(vect.ngram_range),
+        "stop_words": sorted(stop_words) if stop_words else [],
+        "vocabulary": {term: int(col) for term, col in vect.vocabulary_.items()},
+        "idf": tfidf.idf_.tolist() if tfidf is not None and tfidf.use_idf else None,
+        "norm": tfidf.norm if tfidf is not None else None,
+        "sublinear_tf": bool(tfidf.sublinear_tf) if tfidf is not None else False,
+        "coef": clf.coef_.toarray().tolist() if hasattr(clf.coef_, "toarray") else clf.coef_.tolist(),
+        "intercept": clf.intercept_.tolist(),
+        "classes": [str(c) for c in clf.classes_],
+        "model_sha256": file_sha256(model_path) if model_path else None
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(model, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return True
+
+def train_model():
+    print("Loading data...")
+    try:
+        kb = load_knowledge_base(DATA_PATH)
+    except FileNotFoundError:
+        print(f"Error: {DATA_PATH} not found.")
+        return
+    conditions = kb.conditions
+
+    X, y = build_training_set(conditions)
+
+    print(f"Training on {len(X)} samples...")
+
+    text_clf = build_pipeline()
     text_clf.fit(X, y)
 
     print(f"Saving model to {MODEL_PATH}...")
     joblib.dump(text_clf, MODEL_PATH)
+    linear_path = linear_model_path_for(MODEL_PATH)
+    if export_linear_model(text_clf, linear_path, model_path=MODEL_PATH):
+        print(f"Saved compact inference model to {linear_path}.")
+    # Record which knowledge base version the model was trained on
+    with open(MODEL_META_PATH, 'w') as f:
+        json.dump({"kb_content_hash": kb.content_hash, "samples": len(X)}, f, indent=2)
     print("Model training complete.")
 
+# Streaming mode --------------------------------------------------------------
+
+# Hyperparameters explored by the parallel search in streaming mode
+PARAM_GRID = [
+    {"alpha": alpha, "loss": loss, "penalty": penalty}
+    for alpha in (1e-5, 1e-4, 1e-3)
+    for loss in ("hinge", "log_loss", "modified_huber")
+    for penalty in ("l2", "elasticnet")
+]
+
+def iter_samples(samples_path=None, conditions=None):
+    """
+    Yields (symptoms_text, condition_name) pairs, either streamed from a JSONL
+    file of {"symptoms": str | [str], "condition": str} records, or derived
+    from the knowledge base like build_training_set().
+    """
+    if samples_path is None:
+        for condition in conditions:
+            yield " ".join(condition["symptoms"]), condition["name"]
+            for symptom in condition["symptoms"]:
+                yield symptom, condition["name"]
+        return
+
+    with open(samples_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            symptoms = record["symptoms"]
+            if isinstance(symptoms, list):
+                symptoms = " ".join(symptoms)
+            yield symptoms, record["condition"]
+
+def is_holdout(text, holdout_percent):
+    # Deterministic split, so every pass and every worker agrees on it
+    return zlib.crc32(text.encode("utf-8")) % 100 < holdout_percent
+
+def iter_chunks(samples, chunk_size):
+    chunk = []
+    for sample in samples:
+        chunk.append(sample)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _split_samples(settings, holdout):
+    """
+    Streams the samples of one split: holdout=True (evaluation), False
+    (training) or None (everything, for the final fit).
+    """
+    conditions = None
+    if settings["samples_path"] is None:
+        conditions = load_knowledge_base(DATA_PATH).conditions
+    known = settings["known_labels"]
+    for text, label in iter_samples(settings["samples_path"], conditions):
+        if label not in known:
+            continue
+        if holdout is None or is_holdout(text, settings["holdout_percent"]) == holdout:
+            yield text, label
+
+def build_streaming_pipeline(params, n_features):
+    # Stateless vectorizer: nothing to fit, nothing to store
+    return Pipeline([
+        ('vect', HashingVectorizer(stop_words='english', alternate_sign=False,
+                                   norm='l2', n_features=n_features)),
+        ('clf', SGDClassifier(loss=params["loss"], penalty=params["penalty"],
+                              alpha=params["alpha"], random_state=42)),
+    ])
+
+def fit_streaming(params, settings, holdout=False):
+    pipeline = build_streaming_pipeline(params, settings["n_features"])
+    vect, clf = pipeline.named_steps['vect'], pipeline.named_steps['clf']
+    for _ in range(settings["epochs"]):
+        for chunk in iter_chunks(_split_samples(settings, holdout), settings["chunk_size"]):
+            texts, labels = zip(*chunk)
+            clf.partial_fit(vect.transform(texts), labels, classes=settings["classes"])
+    return pipeline
+
+def evaluate_streaming(pipeline, settings):
+    correct = total = 0
+    for chunk in iter_chunks(_split_samples(settings, True), settings["chunk_size"]):
+        texts, labels = zip(*chunk)
+        predictions = pipeline.predict(texts)
+        correct += sum(p == l for p, l in zip(predictions, labels))
+        total += len(labels)
+    return correct / total if total else 0.0
+
+def _search_worker(task):
+    params, settings = task
+    pipeline = fit_streaming(params, settings, holdout=False)
+    return params, evaluate_streaming(pipeline, settings)
+
+def train_streaming_model(samples_path=None, output_path=MODEL_PATH, jobs=None, chunk_size=10000,
+                          epochs=5, n_features=2 ** 18, holdout_percent=10):
+    """
+    Out-of-core training: samples are streamed in chunks through a
+    HashingVectorizer into SGDClassifier.partial_fit, so memory stays flat
+    however many intake records there are. A process pool evaluates
+    PARAM_GRID on a held-out split; the best setting is refit on all data.
+    """
+    print("Loading data...")
+    try:
+        kb = load_knowledge_base(DATA_PATH)
+    except FileNotFoundError:
+        print(f"Error: {DATA_PATH} not found.")
+        return
+
+    classes = sorted({c["name"] for c in kb.conditions})
+    settings = {
+        "samples_path": samples_path,
+        "known_labels": frozenset(classes),
+        "classes": classes,
+        "chunk_size": chunk_size,
+        "epochs": epochs,
+        "n_features": n_features,
+        "holdout_percent": holdout_percent
+    }
+
+    print(f"Searching {len(PARAM_GRID)} settings on a {holdout_percent}% held-out split...")
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(_search_worker, [(params, settings) for params in PARAM_GRID]))
+    for params, accuracy in results:
+        print(f"  {params} -> {accuracy:.3f}")
+    # Highest accuracy; ties keep grid order
+    best_params, best_accuracy = max(results, key=lambda r: r[1])
+    print(f"Best: {best_params} (held-out accuracy {best_accuracy:.3f})")
+
+    pipeline = fit_streaming(best_params, settings, holdout=None)
+    # Store only the non-zero weights; hashed feature space is mostly empty
+    pipeline.named_steps['clf'].sparsify()
+
+    print(f"Saving model to {output_path}...")
+    joblib.dump(pipeline, output_path, compress=3)
+    # The hashing pipeline has no compact form; drop the previous one
+    linear_path = linear_model_path_for(output_path)
+    if os.path.exists(linear_path):
+        os.remove(linear_path)
+    meta_path = os.path.splitext(output_path)[0] + ".meta.json"
+    with open(meta_path, 'w') as f:
+        json.dump({
+            "kb_content_hash": kb.content_hash,
+            "mode": "streaming",
+            "params": best_params,
+            "holdout_accuracy": best_accuracy,
+            "n_features": n_features
+        }, f, indent=2)
+
+    started = time.perf_counter()
+    joblib.load(output_path)
+    print(f"Model size {os.path.getsize(output_path) / 1024:.1f} KB, "
+          f"loads in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    print("Model training complete.")
+
+def export_existing_model(model_path=MODEL_PATH):
+    """
+    Writes the compact inference model for an already trained pickle.
+    """
+    pipeline = joblib.load(model_path)
+    linear_path = linear_model_path_for(model_path)
+    if export_linear_model(pipeline, linear_path, model_path=model_path):
+        print(f"Saved compact inference model to {linear_path}.")
+    else:
+        print("Error: this model cannot be exported (only CountVectorizer/TF-IDF linear pipelines are supported).")
+
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the Sprout AI symptom classifier.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Out-of-core training with a hashing vectorizer and parallel hyperparameter search.")
+    parser.add_argument('--samples', help="JSONL file of {symptoms, condition} records (streaming mode; default: the knowledge base).")
+    parser.add_argument('--output', default=MODEL_PATH)
+    parser.add_argument('--jobs', type=int, default=None, help="Search worker processes (default: CPU count).")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--n-features', type=int, default=2 ** 18)
+    parser.add_argument('--holdout-percent', type=int, default=10)
+    parser.add_argument('--export-linear', action='store_true',
+                        help="Only write the compact inference model for the existing --output pickle.")
+    args = parser.parse_args()
+
+    if args.export_linear:
+        export_existing_model(args.output)
+    elif args.streaming:
+        train_streaming_model(samples_path=args.samples, output_path=args.output, jobs=args.jobs,
+                              chunk_size=args.chunk_size, epochs=args.epochs,
+                              n_features=args.n_features, holdout_percent=args.holdout_percent)
+    else:
+        train_model()
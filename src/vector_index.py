@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+
+
+class NumpyVectorIndex:
+    """
+    Exact nearest-neighbour search over the condition embeddings exported by
+    ingest_data.py. The float32 matrix is memory-mapped, so every worker
+    process shares one page-cached copy of the vectors.
+
+    Implements the subset of chromadb's Collection.query() used by
+    SymptomAnalyzer, and returns squared L2 distances like Chroma's default
+    "l2" space so scores are comparable between backends.
+    """
+    def __init__(self, embeddings_path, table_path):
+        self.embeddings = np.load(embeddings_path, mmap_mode="r")
+        with open(table_path, "r") as f:
+            table = json.load(f)
+
+        self.ids = table["ids"]
+        # Backend the rows were embedded with (None for older exports: MiniLM)
+        self.embedding_backend = table.get("embedding_backend")
+        self.metadatas = table["metadatas"]
+        if len(self.ids) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"Index table has {len(self.ids)} rows but the embedding matrix has {self.embeddings.shape[0]}"
+            )
+
+        # ||x||^2 per row, for distance = ||q||^2 + ||x||^2 - 2 q.x
+        self._row_sq_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+
+    def count(self):
+        return len(self.ids)
+
+    def query(self, query_embeddings, n_results=5):
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        k = min(n_results, len(self.ids))
+
+        # One product against the whole matrix scores every condition at once
+        dots = queries @ self.embeddings.T
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+            + self._row_sq_norms[np.newaxis, :]
+            - 2.0 * dots
+        )
+        np.maximum(distances, 0.0, out=distances)
+
+        result = {"ids": [], "metadatas": [], "distances": []}
+        for row in distances:
+            if k <= 0:
+                top = []
+            else:
+                top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+                top = top[np.argsort(row[top], kind="stable")]
+            result["ids"].append([self.ids[i] for i in top])
+            result["metadatas"].append([self.metadatas[i] for i in top])
+            result["distances"].append([float(row[i]) for i in top])
+        return result
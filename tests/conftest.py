@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules import each other as top-level modules (as when run from src/)
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+DATA_PATH = os.path.join(ROOT_DIR, "data", "symptoms.json")
+
+
+@pytest.fixture(scope="session")
+def data_path():
+    return DATA_PATH
+
+
+@pytest.fixture(scope="session")
+def kb(data_path):
+    from knowledge_base import load_knowledge_base
+    return load_knowledge_base(data_path)
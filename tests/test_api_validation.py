@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from responses import parse_request
+
+INVALID_BODIES = [
+    ([1, 2], 'Expected a JSON object'),
+    ({}, 'No symptoms provided'),
+    ({"symptoms": ""}, 'No symptoms provided'),
+    ({"symptoms": 5}, 'Expected symptoms to be a comma-separated string'),
+    ({"symptoms": ["fever", "cough"]}, 'Expected symptoms to be a comma-separated string'),
+    ({"symptoms": "fever", "profile": "adult"}, 'Expected profile to be a JSON object'),
+    ({"symptoms": "fever", "profile": [30]}, 'Expected profile to be a JSON object'),
+]
+
+
+@pytest.mark.parametrize("body, error", INVALID_BODIES)
+def test_parse_request_rejects_invalid_bodies(body, error):
+    assert parse_request(body) == (None, None, error)
+
+
+def test_parse_request_defaults_a_missing_profile():
+    assert parse_request({"symptoms": "fever", "profile": None}) == ("fever", {}, None)
+    assert parse_request({"symptoms": "fever", "profile": {"age": 5}}) == ("fever", {"age": 5}, None)
+
+
+@pytest.fixture(scope="module")
+def web(tmp_path_factory):
+    # The web apps load the serving components at import: keep them off
+    # ChromaDB and the repo's event directory
+    import diagnosis
+
+    mp = pytest.MonkeyPatch()
+    # diagnosis reads the backend at import, which may precede this fixture
+    mp.setattr(diagnosis, "VECTOR_BACKEND", "numpy")
+    mp.setenv("SPROUT_STARTUP_MODE", "lazy")
+    mp.setenv("SPROUT_EVENT_DIR", str(tmp_path_factory.mktemp("events")))
+    mp.setenv("SPROUT_NOTIFY_SINKS", "events")
+    import app
+    import asgi
+    yield app, asgi
+    mp.undo()
+
+
+def call_asgi(asgi_app, payload):
+    sent = []
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/analyze"}
+    asyncio.run(asgi_app(scope, receive, send))
+    assert sent and sent[0]["type"] == "http.response.start"
+    return sent[0]["status"], json.loads(sent[1]["body"])
+
+
+@pytest.mark.parametrize("body, error", INVALID_BODIES + [(b"{not json", 'Invalid JSON')])
+def test_asgi_analyze_answers_400(web, body, error):
+    _, asgi = web
+    assert call_asgi(asgi.app, body) == (400, {"error": error})
+
+
+@pytest.mark.parametrize("body, error", INVALID_BODIES)
+def test_flask_analyze_answers_400(web, body, error):
+    app, _ = web
+    response = app.app.test_client().post("/analyze", json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": error}
+
+
+def test_flask_batch_reports_invalid_items(web):
+    app, _ = web
+    items = [body for body, _ in INVALID_BODIES] + [{"symptoms": "itching, skin rash"}]
+    results = app.app.test_client().post("/analyze/batch", json={"items": items}).get_json()["results"]
+    assert [r.get("error") for r in results[:-1]] == [error for _, error in INVALID_BODIES]
+    assert results[-1]["status"] == "success"
+    assert app.app.test_client().post("/analyze/batch", json=[1]).status_code == 400
+
+
+def test_asgi_answers_500_when_the_handler_fails(web, monkeypatch):
+    _, asgi = web
+
+    async def broken(data):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(asgi, "analyze", broken)
+    assert call_asgi(asgi.app, {"symptoms": "fever"}) == (500, {"error": "Internal server error"})
+
+
+def test_asgi_notifies_off_the_event_loop(web, monkeypatch):
+    _, asgi = web
+    threads = []
+    monkeypatch.setattr(asgi, "notify_emergency", lambda emergencies: threads.append(threading.current_thread().name))
+    asgi.response_cache.clear()
+
+    async def twice():
+        # The second request is answered from the response cache
+        return [await asgi.analyze({"symptoms": "chest pain, itching"}) for _ in range(2)]
+
+    for body, status in asyncio.run(twice()):
+        assert status == 200 and body["status"] == "emergency"
+    assert len(threads) == 2
+    assert all(name.startswith("sprout-notify") for name in threads)
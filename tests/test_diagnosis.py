@@ -0,0 +1,29 @@
+import pytest
+
+import diagnosis
+from diagnosis import SymptomAnalyzer
+
+
+@pytest.fixture
+def fallbacks(monkeypatch):
+    calls = []
+    monkeypatch.setattr(diagnosis, "record_fallback",
+                        lambda tier, reason, count=1: calls.append((tier, reason, count)))
+    return calls
+
+
+@pytest.fixture(scope="module")
+def analyzer(data_path):
+    # Rule-based tier only: the vector and ML tiers are never loaded
+    return SymptomAnalyzer(data_path, load_models=False)
+
+
+def test_unloaded_tiers_are_recorded_once_per_pending_item(analyzer, fallbacks):
+    results = analyzer.diagnose_many([["itching", "skin rash"], ["headache"]])
+    assert all(results)
+    assert fallbacks == [("vector", "not_loaded", 2), ("ml", "not_loaded", 2)]
+
+
+def test_no_fallback_is_recorded_without_pending_items(analyzer, fallbacks):
+    assert analyzer.diagnose_many([]) == []
+    assert fallbacks == []
@@ -0,0 +1,44 @@
+import random
+
+from emergency import EmergencyDetector
+from matcher import PhraseMatcher
+
+
+def scan_emergencies(emergency_symptoms, user_symptoms):
+    # The per-phrase substring scan the matcher replaced
+    detected = []
+    for symptom in user_symptoms:
+        symptom_lower = symptom.lower().strip()
+        for emergency in emergency_symptoms:
+            if emergency in symptom_lower:
+                detected.append(emergency)
+    return set(detected)
+
+
+def test_matcher_finds_every_contained_phrase():
+    rng = random.Random(1)
+    phrases = ["he", "she", "his", "hers", "a", "ab", "bab", "abab", "c"]
+    matcher = PhraseMatcher(phrases)
+    for _ in range(2000):
+        text = "".join(rng.choice("abcehirs ") for _ in range(rng.randint(0, 12)))
+        assert set(matcher.find_all(text)) == {p for p in phrases if p in text}
+
+
+def test_matcher_skips_empty_and_duplicate_phrases():
+    matcher = PhraseMatcher(["", "pain", "pain"])
+    assert len(matcher) == 1
+    assert matcher.find_all("chest pain") == ["pain"]
+    assert matcher.find_all("") == []
+
+
+def test_check_emergency_matches_substring_scan(data_path):
+    detector = EmergencyDetector(data_path)
+    rng = random.Random(2)
+    words = ["chest", "pain", "severe", "fever", "difficulty", "breathing", "bleeding", "mild", "Sudden",
+             "headache", "  ", "heart", "attack"] + list(detector.emergency_symptoms)
+    for _ in range(3000):
+        query = [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(rng.randint(1, 3))]
+        expected = scan_emergencies(detector.emergency_symptoms, query)
+        # Twice: the second call is served from the per-phrase memo
+        assert set(detector.check_emergency(query)) == expected
+        assert set(detector.check_emergency(query)) == expected
@@ -0,0 +1,173 @@
+import gzip
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import event_store
+from event_store import EventStore
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def dead_pid():
+    # The pid of a process that has exited (and been reaped)
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def make_events(n, step=1.0):
+    kinds = ["emergency", "notification", "emergency"]
+    return [{"ts": T0 + i * step, "kind": kinds[i % 3], "n": i} for i in range(n)]
+
+
+def expected(events, start=None, end=None, kind=None):
+    return [e for e in events
+            if (start is None or e["ts"] >= start) and (end is None or e["ts"] < end)
+            and (kind is None or e["kind"] == kind)]
+
+
+def check_store(store, events):
+    ranges = [(None, None), (T0 + 5, T0 + 40), (T0 + 3.5, T0 + 3.6), (T0 + 1000, None), (None, T0)]
+    for start, end in ranges:
+        for kind in (None, "emergency", "notification", "missing"):
+            want = expected(events, start, end, kind)
+            assert list(store.query(start, end, kind=kind)) == want
+            assert store.count(start, end, kind=kind) == len(want)
+    assert list(store.query(limit=7)) == events[:7]
+
+
+def segment_names(directory):
+    return sorted(name for name in os.listdir(directory) if not name.endswith(".idx"))
+
+
+def test_round_trip_across_blocks(tmp_path):
+    store = EventStore(str(tmp_path), block_records=4)
+    events = make_events(50)
+    store.append_many(events[:30])
+    for event in events[30:]:
+        store.append(event)
+    # Indexed blocks plus the unindexed tail of the active segment
+    check_store(store, events)
+    store.close()
+    check_store(store, events)
+    check_store(EventStore(str(tmp_path)), events)
+
+
+def test_defaults_ts_and_kind(tmp_path):
+    store = EventStore(str(tmp_path))
+    store.append({"message": "hello"})
+    (event,) = store.query()
+    assert event["kind"] == "event" and event["message"] == "hello"
+    store.close()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_rotates_by_size(tmp_path, compress):
+    store = EventStore(str(tmp_path), max_segment_bytes=1024, block_records=4, compress=compress)
+    events = make_events(60)
+    store.append_many(events)
+    store.close()
+
+    names = segment_names(tmp_path)
+    assert len(names) >= 3
+    assert all(name.endswith(".jsonl.gz" if compress else ".jsonl") for name in names)
+    assert all(os.path.getsize(tmp_path / name) <= 1024 for name in names if not compress)
+    if compress:
+        # Each closed segment is still a plain .gz file
+        lines = [line for name in names for line in gzip.open(tmp_path / name).read().splitlines()]
+        assert len(lines) == len(events)
+    check_store(store, events)
+
+
+def test_rotates_by_age(tmp_path, monkeypatch):
+    clock = [T0]
+    monkeypatch.setattr(event_store.time, "time", lambda: clock[0])
+    store = EventStore(str(tmp_path), max_segment_seconds=10.0)
+    events = make_events(30)
+    for event in events:
+        clock[0] = event["ts"]
+        store.append(event)
+    assert len(segment_names(tmp_path)) == 3
+    store.close()
+    assert len(segment_names(tmp_path)) == 3
+    check_store(store, events)
+
+
+def test_idle_segment_is_rotated_by_queries(tmp_path, monkeypatch):
+    clock = [T0]
+    monkeypatch.setattr(event_store.time, "time", lambda: clock[0])
+    store = EventStore(str(tmp_path), max_segment_seconds=10.0)
+    events = make_events(3)
+    store.append_many(events)
+    assert segment_names(tmp_path)[0].endswith(".jsonl")
+
+    clock[0] = T0 + 10
+    assert store.count() == 3
+    (name,) = segment_names(tmp_path)
+    assert name.endswith(".jsonl.gz")
+    check_store(store, events)
+
+
+def test_idle_segment_is_rotated_by_its_timer(tmp_path):
+    store = EventStore(str(tmp_path), max_segment_seconds=0.2)
+    store.append({"kind": "emergency"})
+    deadline = time.time() + 5
+    while not segment_names(tmp_path)[0].endswith(".gz") and time.time() < deadline:
+        time.sleep(0.05)
+    (name,) = segment_names(tmp_path)
+    assert name.endswith(".jsonl.gz")
+    assert store.count(kind="emergency") == 1
+    store.close()
+
+
+def write_active_segment(directory, pid, events, torn=True):
+    path = directory / f"events-{int(T0 * 1000)}-{pid}.jsonl"
+    data = b"".join(b'{"ts":%r,"kind":"%s","n":%d}\n' % (e["ts"], e["kind"].encode(), e["n"]) for e in events)
+    path.write_bytes(data + (b'{"ts":' if torn else b""))
+    return path
+
+
+def test_recovers_the_segment_of_a_dead_process(tmp_path, dead_pid):
+    events = make_events(20)
+    path = write_active_segment(tmp_path, dead_pid, events)
+    store = EventStore(str(tmp_path))
+    assert not path.exists()
+    (name,) = segment_names(tmp_path)
+    assert name.endswith(f"-{dead_pid}.jsonl.gz")
+    check_store(store, events)
+
+
+def test_finishes_an_interrupted_recovery(tmp_path, dead_pid):
+    events = make_events(20)
+    path = write_active_segment(tmp_path, dead_pid, events)
+    os.rename(path, f"{path}.recover-{dead_pid}")
+    store = EventStore(str(tmp_path))
+    assert segment_names(tmp_path) == [f"events-{int(T0 * 1000)}-{int((T0 + 19) * 1000)}-{int(T0 * 1000)}-{dead_pid}.jsonl.gz"]
+    check_store(store, events)
+
+
+def test_removes_a_recovery_claim_that_was_already_closed(tmp_path, dead_pid):
+    events = make_events(20)
+    path = write_active_segment(tmp_path, dead_pid, events)
+    EventStore(str(tmp_path))
+    closed = segment_names(tmp_path)
+    # The recovering process died after writing the closed segment
+    write_active_segment(tmp_path, dead_pid, events)
+    os.rename(path, f"{path}.recover-{dead_pid}")
+    (tmp_path / f"{path.name}.recover-{dead_pid}.idx").write_text("")
+    store = EventStore(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted(closed + [name + ".idx" for name in closed])
+    check_store(store, events)
+
+
+def test_leaves_claims_of_live_processes_alone(tmp_path):
+    path = write_active_segment(tmp_path, os.getppid(), make_events(5))
+    claimed = f"{path}.recover-{os.getppid()}"
+    os.rename(path, claimed)
+    EventStore(str(tmp_path))
+    assert os.path.exists(claimed)
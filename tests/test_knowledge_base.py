@@ -0,0 +1,73 @@
+import json
+import pickle
+import shutil
+
+import pytest
+
+from diagnosis import SymptomAnalyzer
+from emergency import EmergencyDetector
+from knowledge_base import load_knowledge_base, snapshot_path_for
+
+
+@pytest.fixture
+def data_dir(tmp_path, data_path):
+    # symptoms.json and remedies.json in a data/ directory, as in the repo
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    shutil.copy(data_path, data_dir / "symptoms.json")
+    shutil.copy(data_path.replace("symptoms.json", "remedies.json"), data_dir / "remedies.json")
+    return data_dir
+
+
+# GLOBAL opcode naming a module that no longer exists (a renamed or moved class)
+STALE_PICKLE = b"csprout_removed_module\nKnowledgeBase\n."
+
+
+@pytest.mark.parametrize("content", [STALE_PICKLE, b"", b"not a pickle", b"\x80\x05truncated"])
+def test_bad_snapshot_is_recompiled(data_dir, kb, content):
+    symptoms_path = str(data_dir / "symptoms.json")
+    snapshot_path = snapshot_path_for(symptoms_path)
+    with open(snapshot_path, "wb") as f:
+        f.write(content)
+
+    rebuilt = load_knowledge_base(symptoms_path)
+    assert rebuilt.content_hash == kb.content_hash
+    # ...and the snapshot was rewritten in the current format
+    with open(snapshot_path, "rb") as f:
+        assert pickle.load(f)["kb"]["content_hash"] == kb.content_hash
+
+
+@pytest.mark.parametrize("content", ["{not json", "[1, 2]"])
+def test_bad_remedies_file_keeps_the_symptoms_data(data_dir, kb, content):
+    (data_dir / "remedies.json").write_text(content)
+    symptoms_path = str(data_dir / "symptoms.json")
+
+    assert EmergencyDetector(symptoms_path).check_emergency(["chest pain"]) == ["chest pain"]
+    rebuilt = load_knowledge_base(symptoms_path)
+    assert rebuilt.emergency_symptoms == kb.emergency_symptoms
+    # Only the remedies.json-only (additional) conditions are lost
+    assert 0 < len(rebuilt.conditions) <= len(kb.conditions)
+    analyzer = SymptomAnalyzer(symptoms_path, load_models=False)
+    assert len(analyzer.conditions) == len(rebuilt.conditions)
+
+
+def test_additional_condition_without_a_name_is_skipped(data_dir, kb):
+    remedies_path = data_dir / "remedies.json"
+    remedies = json.loads(remedies_path.read_text())
+    remedies.setdefault("additional_conditions", []).insert(0, {"symptoms": ["nosebleed"]})
+    remedies["additional_conditions"].insert(0, "Nose Bleed")
+    remedies_path.write_text(json.dumps(remedies))
+
+    rebuilt = load_knowledge_base(str(data_dir / "symptoms.json"))
+    assert [c["name"] for c in rebuilt.conditions] == [c["name"] for c in kb.conditions]
+
+
+def test_emergency_screen_survives_a_broken_knowledge_base(data_dir, monkeypatch):
+    import emergency
+
+    def broken(data_path):
+        raise KeyError("name")
+
+    monkeypatch.setattr(emergency, "load_knowledge_base", broken)
+    detector = EmergencyDetector(str(data_dir / "symptoms.json"))
+    assert detector.check_emergency(["Chest Pain"]) == ["chest pain"]
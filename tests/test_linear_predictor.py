@@ -0,0 +1,84 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import joblib
+import pytest
+
+from conftest import ROOT_DIR
+from diagnosis import LINEAR_MODEL_FORMAT, LinearPredictor
+from train_model import build_pipeline, build_training_set, export_linear_model, file_sha256
+
+EXTRA_WORDS = ["the", "and", "severe", "mild", "since", "yesterday", "very", "painful", "xyzzy"]
+MODEL_PATH = os.path.join(ROOT_DIR, "data", "symptom_model.pkl")
+LINEAR_PATH = os.path.join(ROOT_DIR, "data", "symptom_model.linear.json")
+
+
+def make_queries(conditions, n, seed=7):
+    rng = random.Random(seed)
+    vocab = sorted({s for c in conditions for s in c["symptoms"]})
+    queries = ["", "xyzzy", "the and", "HEADACHE, Fever!", "itching itching itching"]
+    for _ in range(n):
+        parts = rng.sample(vocab, min(len(vocab), rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            parts.append(rng.choice(EXTRA_WORDS))
+        queries.append(" ".join(parts))
+    return queries
+
+
+def assert_parity(pipeline, predictor, queries):
+    assert predictor.predict(queries) == [str(p) for p in pipeline.predict(queries)]
+    reference = pipeline.decision_function(queries)
+    if reference.ndim == 1:
+        reference = [[-s, s] for s in reference]
+    for query, expected in zip(queries, reference):
+        assert predictor.decision_function(query) == pytest.approx(list(expected), abs=1e-12)
+
+
+@pytest.fixture(scope="module")
+def trained(kb, tmp_path_factory):
+    X, y = build_training_set(kb.conditions)
+    pipeline = build_pipeline()
+    pipeline.fit(X, y)
+    linear_path = str(tmp_path_factory.mktemp("model") / "symptom_model.linear.json")
+    assert export_linear_model(pipeline, linear_path)
+    return pipeline, LinearPredictor(linear_path), linear_path
+
+
+def test_matches_the_pipeline_on_the_repo_kb(kb, trained):
+    pipeline, predictor, _ = trained
+    assert predictor.classes == [str(c) for c in pipeline.classes_]
+    assert_parity(pipeline, predictor, make_queries(kb.conditions, 2000))
+
+
+@pytest.mark.skipif(not os.path.exists(LINEAR_PATH), reason="no exported model in data/")
+def test_shipped_artifact_matches_the_shipped_pipeline(kb):
+    predictor = LinearPredictor(LINEAR_PATH)
+    if predictor.model_sha256 != file_sha256(MODEL_PATH):
+        pytest.skip("data/symptom_model.linear.json was exported from another pickle")
+    assert_parity(joblib.load(MODEL_PATH), predictor, make_queries(kb.conditions, 500))
+
+
+def test_rejects_an_unknown_format(trained, tmp_path):
+    _, _, linear_path = trained
+    with open(linear_path) as f:
+        model = json.load(f)
+    model["format"] = LINEAR_MODEL_FORMAT + 1
+    path = tmp_path / "future.linear.json"
+    path.write_text(json.dumps(model))
+    with pytest.raises(ValueError):
+        LinearPredictor(str(path))
+
+
+def test_serving_does_not_import_sklearn(trained):
+    _, _, linear_path = trained
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "from diagnosis import LinearPredictor\n"
+        "LinearPredictor(%r).predict(['headache fever'])\n"
+        "print('sklearn' in sys.modules)\n"
+    ) % (os.path.join(ROOT_DIR, "src"), linear_path)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "False"
@@ -0,0 +1,63 @@
+import pytest
+
+from emergency import EmergencyDetector
+from normalizer import SymptomCanonicalizer
+
+
+@pytest.fixture(scope="module")
+def canonicalizer(kb):
+    return kb.canonicalizer
+
+
+@pytest.fixture(scope="module")
+def detector(data_path):
+    return EmergencyDetector(data_path)
+
+
+@pytest.mark.parametrize("typed, canonical", [
+    ("headach", "headache"),
+    ("hig fever", "high fever"),
+    ("abdominal pa", "abdominal pain"),
+    ("skin rsh", "skin rash"),
+    ("  Chest_Pain. ", "chest pain"),
+    ("chest", "chest"),
+])
+def test_canonical(canonicalizer, typed, canonical):
+    assert canonicalizer.canonical(typed) == canonical
+
+
+@pytest.mark.parametrize("typed", [
+    # Unique prefixes of emergency phrases
+    "ches", "sudd", "unco", "severe b", "difficulty b",
+    # Within the edit budget of one
+    "chest pian", "heart attak", "severe bleding",
+])
+def test_never_guesses_an_emergency(canonicalizer, detector, typed):
+    assert canonicalizer.canonical(typed) == typed
+    assert detector.check_emergency(canonicalizer.canonicalize([typed])) == []
+
+
+def test_completes_the_last_word_only():
+    canonicalizer = SymptomCanonicalizer(["stomach ache", "stomach pain in the morning"])
+    assert canonicalizer.canonical("stomach a") == "stomach ache"
+    assert canonicalizer.canonical("stomach p") == "stomach p"
+    assert canonicalizer.canonical("stomach pain in the m") == "stomach pain in the morning"
+
+
+def test_keeps_every_match_of_the_input():
+    canonicalizer = SymptomCanonicalizer(["fever", "feverish chills", "chills"])
+    # The completion "feverish chills" contains "fever"; "chills" must survive too
+    assert canonicalizer.canonical("fever chil") == "fever chil"
+    assert canonicalizer.canonical("feverish chil") == "feverish chills"
+
+
+def test_emergency_phrases_typed_in_full_are_kept():
+    canonicalizer = SymptomCanonicalizer(["chest pain", "chest tightness"], emergency_phrases=["Chest Pain"])
+    assert canonicalizer.canonical("chest pain") == "chest pain"
+    assert canonicalizer.canonical("chest pai") == "chest pai"
+    assert canonicalizer.canonical("chest tigh") == "chest tightness"
+
+
+def test_canonicalize_drops_empty_entries_and_repeats(canonicalizer):
+    assert canonicalizer.canonicalize(["headach", "", " ", "Headache", "hig fever", "headache"]) == [
+        "headache", "high fever"]
@@ -0,0 +1,97 @@
+import threading
+
+import metrics
+from notifications import NotificationDispatcher, NotificationManager
+
+
+class ListSink:
+    def __init__(self):
+        self.entries = []
+
+    def write_batch(self, entries):
+        self.entries.extend(entries)
+
+
+class FailingSink:
+    def write_batch(self, entries):
+        raise OSError("disk full")
+
+
+def stalled_dispatcher(fallback_sink):
+    # No worker thread: the one-slot queue stays full after the first entry
+    dispatcher = NotificationDispatcher([ListSink()], max_queue_size=1, put_timeout=0.01,
+                                        fallback_sink=fallback_sink)
+    dispatcher._ensure_worker = lambda: None
+    return dispatcher
+
+
+def test_full_queue_drops_ordinary_entries_but_spills_critical_ones():
+    fallback = ListSink()
+    dispatcher = stalled_dispatcher(fallback)
+    assert dispatcher.enqueue({"message": "first"})
+    assert not dispatcher.enqueue({"message": "ordinary"})
+    assert not dispatcher.enqueue({"message": "emergency"}, critical=True)
+
+    assert [e["message"] for e in fallback.entries] == ["emergency"]
+    assert dispatcher.stats()["dropped"] == 1
+    assert dispatcher.stats()["spilled"] == 1
+
+
+def test_critical_entries_are_spilled_after_close():
+    fallback = ListSink()
+    dispatcher = stalled_dispatcher(fallback)
+    dispatcher.close()
+    assert not dispatcher.enqueue({"message": "emergency"}, critical=True)
+    assert len(fallback.entries) == 1
+
+
+def test_failed_spill_counts_as_dropped_and_sink_error():
+    dispatcher = stalled_dispatcher(FailingSink())
+    dispatcher.enqueue({"message": "first"})
+    dispatcher.enqueue({"message": "emergency"}, critical=True)
+    stats = dispatcher.stats()
+    assert (stats["dropped"], stats["spilled"], stats["sink_errors"]) == (1, 0, 1)
+
+
+def test_manager_marks_critical_levels(monkeypatch):
+    manager = NotificationManager(sinks=[], fallback_sink=ListSink())
+    calls = []
+    monkeypatch.setattr(manager.dispatcher, "enqueue", lambda entry, critical=False: calls.append(critical))
+    manager.send_notification("Emergency detected", level="critical", kind="emergency")
+    manager.send_notification("hello")
+    assert calls == [True, False]
+    manager.close()
+
+
+def test_dispatcher_counters_are_exported():
+    dispatcher = stalled_dispatcher(ListSink())
+    dispatcher.enqueue({"message": "first"})
+    dispatcher.enqueue({"message": "ordinary"})
+    metrics.register_notification_metrics(lambda: dispatcher)
+    text = metrics.render()
+    assert "# TYPE sprout_notifications_dropped_total counter" in text
+    assert "sprout_notifications_dropped_total 1" in text
+    assert "sprout_notifications_spilled_total 0" in text
+    assert "sprout_notification_sink_errors_total 0" in text
+
+
+def test_counters_are_exact_under_concurrent_drops():
+    dispatcher = NotificationDispatcher([ListSink()], max_queue_size=1, put_timeout=0,
+                                        fallback_sink=FailingSink())
+    dispatcher._ensure_worker = lambda: None
+    dispatcher.enqueue({"message": "fills the queue"})
+
+    def flood():
+        for _ in range(2000):
+            dispatcher.enqueue({"message": "ordinary"})
+            dispatcher.enqueue({"message": "emergency"}, critical=True)
+
+    threads = [threading.Thread(target=flood) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = dispatcher.stats()
+    # Each failed spill is a sink error and then a drop
+    assert stats["dropped"] == 8 * 2000 * 2
+    assert stats["sink_errors"] == 8 * 2000
@@ -0,0 +1,126 @@
+import itertools
+
+import pytest
+
+from remedies import RemedyRecommender
+
+# The explanations that were hard-coded in explain_remedy before they moved
+# to remedy_explanations in data/remedies.json
+FORMER_EXPLANATIONS = {
+    "Ginger tea": "Ginger has anti-inflammatory properties and helps soothe the throat.",
+    "Honey and lemon": "Honey coats the throat and lemon provides Vitamin C.",
+    "Steam inhalation": "Helps clear nasal congestion.",
+    "Rest": "Allows the body to focus energy on fighting the infection.",
+    "Hydration": "Essential for bodily functions and recovery.",
+    "Hydration with electrolytes": "Replenishes essential minerals lost due to dehydration.",
+    "Brat diet": "Bland foods (Banana, Rice, Apple, Toast) that are easy on the stomach.",
+    "Probiotics": "Restores healthy gut bacteria to aid digestion.",
+    "Aloe vera gel": "Soothes inflammation and provides a cooling effect for skin.",
+    "Cool bath": "Helps lower body temperature and soothe skin irritation.",
+    "Lean forward (do NOT tilt head back)": "Prevents blood from flowing down the throat.",
+    "Pinch the soft part of the nose": "Applies pressure to stop bleeding vessels.",
+    "Ice pack": "Constricts blood vessels to reduce swelling or bleeding.",
+    "Look at the horizon": "Helps reorient the brain's balance system.",
+    "Ginger": "Natural anti-nauseant that soothes the stomach.",
+    "Cold compress": "Reduces swelling and numbs pain.",
+    "Coffee": "Caffeine can constrict blood vessels to relieve headache."
+}
+
+# Remedies outside the knowledge base that trigger every rule
+EXTRA_REMEDIES = ["Aspirin", "Intense exercise", "Essential oil massage", "Honey and ginger tea",
+                  "Strenuous walks", "Heavy lifting", "NSAIDs", "Black pepper", "Hot sauna", "Garlic",
+                  "Spicy soup", "Cold shower", "Mint tea", "Cucumber slices", "Ice water", "Raw salad"]
+
+AGES = [0, 1, 5, 11, 12, 30, 65, 66, 90, "40", "unknown", None]
+BODY_TYPES = ["heat", "cold", "neutral", "HEAT", "other"]
+
+
+def personalize_by_scan(remedies, profile):
+    # Per-request keyword rules as they were before the precomputed table
+    body_type = profile.get("body_type", "neutral").lower()
+    try:
+        age = int(profile.get("age"))
+    except (ValueError, TypeError):
+        age = 25
+
+    filtered = []
+    for remedy in remedies:
+        remedy_lower = remedy.lower()
+        warning = None
+        is_unsafe = False
+        if age < 12:
+            if any(x in remedy_lower for x in ["aspirin", "intense exercise", "steam inhalation", "essential oil"]):
+                warning = " (Consult Pediatrician first)"
+            if "honey" in remedy_lower and age < 1:
+                is_unsafe = True
+        elif age > 65:
+            if any(x in remedy_lower for x in ["strenuous", "heavy lifting", "nsaids"]):
+                warning = " (Use caution or consult doctor)"
+        if body_type == "heat":
+            if any(x in remedy_lower for x in ["ginger", "pepper", "spicy", "hot", "garlic", "sauna"]):
+                warning = " (Caution: May increase body heat)"
+        if body_type == "cold":
+            if any(x in remedy_lower for x in ["cold", "mint", "cucumber", "ice", "raw salad"]):
+                warning = " (Caution: May be too cooling)"
+        if not is_unsafe:
+            filtered.append(remedy + warning if warning else remedy)
+    return filtered
+
+
+def explain_by_scan(corpus, remedy_name):
+    if remedy_name in corpus:
+        return corpus[remedy_name]
+    for key, value in corpus.items():
+        if key in remedy_name:
+            return value
+    return "Natural aid for symptom relief."
+
+
+@pytest.fixture(scope="module")
+def recommender(data_path):
+    return RemedyRecommender(data_path)
+
+
+def test_personalization_table_matches_keyword_rules(kb, recommender):
+    remedy_lists = [list(c.remedies) for c in kb.conditions] + [EXTRA_REMEDIES]
+    for remedies, age, body_type in itertools.product(remedy_lists, AGES, BODY_TYPES):
+        profile = {"age": age, "body_type": body_type}
+        condition = {"remedies": remedies}
+        expected = personalize_by_scan(remedies, profile)
+        # Twice: the second call hits the entries memoized for unknown remedies
+        assert recommender.get_remedies_for_condition(condition, profile) == expected
+        assert recommender.get_remedies_for_condition(condition, profile) == expected
+
+
+def test_empty_profile_is_not_personalized(recommender):
+    condition = {"remedies": ["Ginger tea", "Ice pack"]}
+    assert recommender.get_remedies_for_condition(condition, {}) == ["Ginger tea", "Ice pack"]
+    assert recommender.get_remedies_for_condition(condition) == ["Ginger tea", "Ice pack"]
+
+
+def test_former_explanations_are_in_the_corpus(kb):
+    for name, explanation in FORMER_EXPLANATIONS.items():
+        assert kb.explanations.get(name) == explanation
+
+
+def test_precomputed_explanations_match_corpus_scan(kb, recommender):
+    names = set(FORMER_EXPLANATIONS) | {"Unknown remedy", "Ginger tea with honey", "Rest (Consult Doctor)"}
+    for condition in kb.conditions:
+        for remedy in condition.remedies:
+            names.update((remedy, remedy.split(" (")[0]))
+    for name in sorted(names):
+        # Twice: unknown names are resolved once and memoized
+        assert recommender.explain_remedy(name) == explain_by_scan(kb.explanations, name)
+        assert recommender.explain_remedy(name) == explain_by_scan(kb.explanations, name)
+
+
+def test_attached_explanation_takes_precedence():
+    from knowledge_base import compile_knowledge_base
+
+    kb = compile_knowledge_base(
+        {"disease_symptoms": {"cold": ["sneezing"]}},
+        {"disease_remedies": {"cold": [{"name": "Ginger tea", "explanation": "Attached."}, "Ginger shot"]},
+         "remedy_explanations": {"Ginger tea": "Shared.", "Ginger": "Root."}}
+    )
+    assert kb.remedy_explanations["Ginger tea"] == "Attached."
+    assert kb.remedy_explanations["Ginger shot"] == "Root."
@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+from remedies import RemedyRecommender
+from response_cache import ResponseCache
+
+PROFILES = [None, {}] + [
+    {"age": age, "body_type": body_type}
+    for age, body_type in itertools.product([0, 5, 30, "30", None, 70], ["heat", "cold", "neutral", "other", None])
+] + [{"age": 30}, {"body_type": "neutral"}]
+
+
+@pytest.fixture(scope="module")
+def recommender(data_path):
+    return RemedyRecommender(data_path)
+
+
+def test_missing_profile_does_not_share_a_key_with_the_default_segment(recommender):
+    explicit = {"age": 30, "body_type": "neutral"}
+    assert recommender.personalization_key({}) == recommender.personalization_key(None) == ()
+    assert recommender.personalization_key(explicit) == recommender.segment({})
+    assert (ResponseCache.make_key(["fever"], recommender.personalization_key({}), 1)
+            != ResponseCache.make_key(["fever"], recommender.personalization_key(explicit), 1))
+
+
+def test_profiles_sharing_a_key_get_the_same_remedies(kb, recommender):
+    # The key must capture everything the remedies depend on
+    remedy_lists = [list(c.remedies) for c in kb.conditions] + [["Ginger tea", "Ice pack", "Aspirin", "Honey"]]
+    by_key = {}
+    for profile in PROFILES:
+        key = recommender.personalization_key(profile)
+        remedies = [recommender.get_remedies_for_condition({"remedies": r}, profile) for r in remedy_lists]
+        assert by_key.setdefault(key, remedies) == remedies, profile
+
+
+def test_make_key_ignores_case_and_padding_but_not_order():
+    key = ResponseCache.make_key([" Fever", "cough ", ""], ("adult", "neutral"), 3)
+    assert key == ResponseCache.make_key(["fever", "cough"], ["adult", "neutral"], 3)
+    assert key != ResponseCache.make_key(["cough", "fever"], ("adult", "neutral"), 3)
+    assert key != ResponseCache.make_key(["fever", "cough"], ("adult", "neutral"), 4)
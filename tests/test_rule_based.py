@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR
+from diagnosis import SymptomAnalyzer
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+from kb_generator import write_kb  # noqa: E402
+
+
+def scan_rule_based(conditions, user_symptoms):
+    # The full scan the inverted index replaced: every condition, both
+    # substring directions, stable sort by match count
+    user_symptoms_lower = [s.lower().strip() for s in user_symptoms]
+    potential = []
+    for condition in conditions:
+        match_count = 0
+        for user_symptom in user_symptoms_lower:
+            for cond_symptom in condition["symptoms"]:
+                if cond_symptom in user_symptom or user_symptom in cond_symptom:
+                    match_count += 1
+                    break
+        if match_count > 0:
+            potential.append((condition["name"], match_count))
+    potential.sort(key=lambda x: x[1], reverse=True)
+    return potential
+
+
+def random_queries(analyzer, n, seed):
+    rng = random.Random(seed)
+    phrases = list(analyzer.vocabulary.phrases)
+    words = sorted({w for p in phrases for w in p.split()})
+    queries = []
+    for _ in range(n):
+        query = []
+        for _ in range(rng.randint(1, 4)):
+            kind = rng.random()
+            if kind < 0.4:
+                query.append(rng.choice(phrases))
+            elif kind < 0.7:
+                query.append(" ".join(rng.sample(words, rng.randint(1, 2))))
+            elif kind < 0.9:
+                # Fragments, including ones shorter than the n-gram size
+                phrase = rng.choice(phrases)
+                start = rng.randrange(len(phrase))
+                query.append(phrase[start:start + rng.randint(1, 8)])
+            else:
+                query.append(" " + rng.choice(phrases).upper() + " x")
+        queries.append(query)
+    return queries
+
+
+def assert_matches_scan(analyzer, queries):
+    conditions = list(analyzer.conditions)
+    for query in queries:
+        expected = scan_rule_based(conditions, query)[:analyzer.RULE_TOP_K]
+        # Twice: the second call is served from the per-phrase memo
+        for _ in range(2):
+            got = [(p["name"], p["match_count"]) for p in analyzer._diagnose_rule_based(query)]
+            assert got == expected, query
+
+
+def test_rule_based_matches_full_scan(data_path):
+    analyzer = SymptomAnalyzer(data_path, load_models=False)
+    assert_matches_scan(analyzer, random_queries(analyzer, 3000, seed=3))
+
+
+@pytest.mark.parametrize("size", [2000])
+def test_rule_based_matches_full_scan_on_generated_kb(tmp_path, size):
+    analyzer = SymptomAnalyzer(write_kb(str(tmp_path), size, seed=5), load_models=False)
+    assert_matches_scan(analyzer, random_queries(analyzer, 300, seed=4))
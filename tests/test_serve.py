@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("gunicorn")
+
+import serve
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(serve, "DATA_DIR", str(tmp_path))
+    monkeypatch.delenv("SPROUT_VECTOR_BACKEND", raising=False)
+    return tmp_path
+
+
+def test_defaults_to_the_numpy_index(data_dir):
+    (data_dir / "condition_embeddings.npy").write_bytes(b"")
+    assert serve.check_vector_backend() is None
+    assert serve.os.environ["SPROUT_VECTOR_BACKEND"] == "numpy"
+
+
+def test_no_vector_index_at_all_is_allowed(data_dir):
+    assert serve.check_vector_backend() is None
+
+
+def test_refuses_chroma_only_data(data_dir):
+    (data_dir / "chroma_db").mkdir()
+    (data_dir / "chroma_db" / "chroma.sqlite3").write_bytes(b"")
+    assert "ingest_data.py" in serve.check_vector_backend()
+
+
+def test_refuses_the_chroma_backend(data_dir, monkeypatch):
+    monkeypatch.setenv("SPROUT_VECTOR_BACKEND", "chroma")
+    assert "SPROUT_VECTOR_BACKEND=chroma" in serve.check_vector_backend()